@@ -3,19 +3,31 @@
 This file creates null version of all systems. This module is loaded via the plugin mechanism.
 """
 import io
+import shlex
+from functools import partial
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Optional, Tuple, Type
 
 import click
 from click import Context
 from serial import Serial
 
 from pyetta.cli.cli import add_command_to_cli
-from pyetta.cli.utils import PyettaCommand, ExecutionCallable, execution_config, ExecutionPipeline
-from pyetta.collectors import IOBaseCollector
-from pyetta.loaders import Loader, PyOCDDeviceLoader
-from pyetta.parsers import UnityParser
-from pyetta.reporters import JUnitXmlReporter, ExitCodeReporter
+from pyetta.cli.utils import PyettaCommand, ExecutionCallable, execution_config, \
+    ExecutionPipeline, BASED_INT
+from pyetta.aggregation import AggregatingParser
+from pyetta.benchmarks import BenchmarkParser, BenchmarkReporter
+from pyetta.capture import CaptureReader, CaptureCollector
+from pyetta import discovery
+from pyetta.collectors import IOBaseCollector, SocketCollector, RTTCollector, EmulatorCollector
+from pyetta.flash_cache import IMAGE_CACHE
+from pyetta.loaders import Loader, PyOCDDeviceLoader, EmulatorLoader
+from pyetta.merge import MergeReporter
+from pyetta.parsers import Parser, UnityParser, ParallelParser, TableParser, GoogleTestParser, \
+    CppUTestParser, TapParser
+from pyetta.reporters import JUnitXmlReporter, ExitCodeReporter, JsonLinesReporter, \
+    ColumnarReporter
+from pyetta.streaming import ResultStreamServer
 
 
 @click.command("lnull", help="Dummy loader used in place where no loader is required.",
@@ -58,17 +70,55 @@ def cfile(file: Path) -> ExecutionCallable:
     return configure_pipeline
 
 
+@click.command("ccapture", cls=PyettaCommand, category='Collectors',
+               plugin_name="_builtins",
+               help="Collector that replays output from a capture file created with --capture.")
+@click.option("--file", help="Path to the capture file.",
+              type=click.Path(exists=True, path_type=Path, dir_okay=False),
+              required=True)
+@click.option("--label", "labels", help="Only replay the output of the test with this label. "
+                                        "Can be repeated.",
+              type=str, multiple=True, metavar="LABEL")
+def ccapture(file: Path, labels: Tuple[str, ...] = ()) -> ExecutionCallable:
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        pipeline.collector = CaptureCollector(CaptureReader(file), labels=labels)
+
+    return configure_pipeline
+
+
+def _resolve_board(context: Context, name: str) -> discovery.Board:
+    """Resolves a board given to a --board option, using the board discovery cache."""
+    state = context.obj
+    try:
+        aliases = None
+        if state.board_aliases_path is not None:
+            aliases = discovery.read_aliases(state.board_aliases_path)
+        cache = discovery.DiscoveryCache(discovery.DEFAULT_CACHE_PATH,
+                                         ttl_s=state.discovery_ttl_s, aliases=aliases)
+        return cache.resolve(name)
+    except (OSError, ValueError) as ec:
+        raise click.ClickException(f"Unable to resolve board '{name}': {ec}") from ec
+
+
 @click.command("lpyocd", cls=PyettaCommand, category='Loaders', plugin_name='_builtins',
                short_help="Loader for PyOCD.")
 @click.option("--firmware", help="Path to the input test runner firmware.",
               type=click.Path(exists=True, path_type=Path), required=True)
 @click.option("--probe", help="ID of the probe to use", required=False,
               type=str, metavar="PROBE_ID")
+@click.option("--board", help="Name or probe ID of a discovered board to use, instead of "
+                              "--probe.",
+              required=False, type=str, metavar="BOARD")
 @click.option("--target",
               help="Chip target, must match the target connected to the host",
               required=False, type=str, metavar="TARGET_MCU")
-def lpyocd(firmware: Path, target: Optional[str] = None,
-           probe: Optional[str] = None) -> ExecutionCallable:
+@click.option("--no-image-cache", help="Program the firmware file directly, instead of caching "
+                                       "its parsed image for later loads.",
+              is_flag=True, default=False, type=bool)
+def lpyocd(firmware: Path, target: Optional[str] = None, probe: Optional[str] = None,
+           board: Optional[str] = None, no_image_cache: bool = False) -> ExecutionCallable:
     """Loader for PyOCD.
 
     Note for this loader to work, PyOCD must be loaded with the correct boards
@@ -77,43 +127,254 @@ def lpyocd(firmware: Path, target: Optional[str] = None,
     @execution_config
     def configure_pipeline(context: Context,
                            pipeline: ExecutionPipeline) -> None:
-        loader = PyOCDDeviceLoader(target=target, probe=probe,
-                                   firmware_path=firmware)
+        probe_id = probe
+        if board is not None:
+            if probe is not None:
+                raise click.UsageError("Only one of --probe and --board can be given.")
+            probe_id = _resolve_board(context, board).unique_id
+        loader = PyOCDDeviceLoader(target=target, probe=probe_id, firmware_path=firmware,
+                                   image_cache=None if no_image_cache else IMAGE_CACHE)
         pipeline.loader = loader
         context.with_resource(loader)
 
     return configure_pipeline
 
 
+@click.command("lemu", cls=PyettaCommand, category='Loaders', plugin_name='_builtins',
+               short_help="Loader running the firmware under an emulator.")
+@click.option("--firmware", help="Path to the input test runner firmware.",
+              type=click.Path(exists=True, path_type=Path, dir_okay=False), required=True)
+@click.option("--command", help="Emulator command line. {firmware} is replaced with the "
+                                "firmware path.",
+              type=str, required=True, metavar="COMMAND")
+def lemu(firmware: Path, command: str) -> ExecutionCallable:
+    """Loader running the firmware under an emulator such as QEMU.
+
+    The emulator is started as a subprocess, for example:
+
+    --command "qemu-system-arm -M lm3s6965evb -nographic -kernel {firmware}"
+
+    Use the cemu collector to read the emulator's output, or csocket if the emulator exposes its
+    serial port over TCP."""
+
+    @execution_config
+    def configure_pipeline(context: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        loader = EmulatorLoader(shlex.split(command), firmware_path=firmware)
+        pipeline.loader = loader
+        context.with_resource(loader)
+
+    return configure_pipeline
+
+
+@click.command("cemu", cls=PyettaCommand, category='Collectors', plugin_name='_builtins',
+               help="Collector that reads the output of the lemu loader's emulator.")
+@click.option("--timeout", help="Seconds to wait for a line of output.",
+              default=5.0, show_default=True, type=click.FloatRange(min=0), metavar="SECONDS")
+def cemu(timeout: float = 5.0) -> ExecutionCallable:
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        if not isinstance(pipeline.loader, EmulatorLoader):
+            raise ValueError("cemu requires the lemu loader to be specified before it.")
+        pipeline.collector = EmulatorCollector(pipeline.loader, timeout_s=timeout)
+
+    return configure_pipeline
+
+
 @click.command("cserial", cls=PyettaCommand, category='Collectors', plugin_name='_builtins',
                help="Collector that opens a serial port to collect data.")
 @click.option("--baud", help="Baud rate of serial port.", default=115200,
               required=False, type=int, metavar="BAUD")
 @click.option("--port", help="The serial port to use.",
-              type=str, required=True, metavar="PORT")
-def cserial(port: str, baud: int = 115200) -> ExecutionCallable:
+              type=str, required=False, metavar="PORT")
+@click.option("--board", help="Name or probe ID of a discovered board, whose serial port is "
+                              "used instead of --port.",
+              required=False, type=str, metavar="BOARD")
+def cserial(port: Optional[str] = None, baud: int = 115200,
+            board: Optional[str] = None) -> ExecutionCallable:
     @execution_config
     def configure_pipeline(context: Context,
                            pipeline: ExecutionPipeline) -> None:
-        serial = IOBaseCollector(Serial(port=port, baudrate=baud, timeout=5))
+        serial_port = port
+        if (port is None) == (board is None):
+            raise click.UsageError("Exactly one of --port and --board must be given.")
+        if board is not None:
+            serial_port = _resolve_board(context, board).port
+            if serial_port is None:
+                raise click.ClickException(f"Board '{board}' has no serial port.")
+        serial = IOBaseCollector(Serial(port=serial_port, baudrate=baud, timeout=5))
         pipeline.collector = serial
         context.with_resource(serial)
 
     return configure_pipeline
 
 
+@click.command("csocket", cls=PyettaCommand, category='Collectors', plugin_name='_builtins',
+               help="Collector that connects to a TCP socket to collect data.")
+@click.option("--host", help="Host to connect to.", default="localhost", show_default=True,
+              type=str, metavar="HOST")
+@click.option("--port", help="TCP port to connect to.", required=True,
+              type=click.IntRange(min=1, max=65535), metavar="PORT")
+@click.option("--timeout", help="Seconds to wait for a connection or a line of output.",
+              default=5.0, show_default=True, type=click.FloatRange(min=0), metavar="SECONDS")
+def csocket(port: int, host: str = "localhost", timeout: float = 5.0) -> ExecutionCallable:
+    @execution_config
+    def configure_pipeline(context: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        collector = SocketCollector(host=host, port=port, timeout_s=timeout)
+        pipeline.collector = collector
+        context.with_resource(collector)
+
+    return configure_pipeline
+
+
+@click.command("crtt", cls=PyettaCommand, category='Collectors', plugin_name='_builtins',
+               short_help="Collector that reads a SEGGER RTT channel using the lpyocd session.")
+@click.option("--channel", help="RTT up channel to read.", default=0, show_default=True,
+              type=click.IntRange(min=0), metavar="CHANNEL")
+@click.option("--address", help="Start address to search for the RTT control block.",
+              type=BASED_INT, required=False, metavar="ADDRESS")
+@click.option("--size", help="Size of the region to search for the RTT control block.",
+              type=BASED_INT, required=False, metavar="SIZE")
+@click.option("--timeout", help="Seconds to wait for a line of output.",
+              default=5.0, show_default=True, type=click.FloatRange(min=0), metavar="SECONDS")
+def crtt(channel: int = 0, address: Optional[int] = None, size: Optional[int] = None,
+         timeout: float = 5.0) -> ExecutionCallable:
+    """Collector that reads a SEGGER RTT channel.
+
+    The RTT channel is read through the debug session of the lpyocd loader, which must appear
+    before this collector in the pipeline."""
+
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        if not isinstance(pipeline.loader, PyOCDDeviceLoader):
+            raise ValueError("crtt requires the lpyocd loader to be specified before it.")
+        pipeline.collector = RTTCollector(pipeline.loader, channel=channel, address=address,
+                                          size=size, timeout_s=timeout)
+
+    return configure_pipeline
+
+
 @click.command("punity", cls=PyettaCommand, category="Parsers", plugin_name="_builtins",
                help="Parser for the Unity unit test framework.")
 @click.option("--name", help="optional name of this test suite",
               type=str, metavar="TEST_SUITE_NAME")
 @click.option("-e", "--encoding", help="File encoding to open the file with.",
               default='ascii')
-def punity(name: Optional[str] = None, encoding: str = 'ascii') -> ExecutionCallable:
+@click.option("--errors", help="How lines which cannot be decoded are handled.",
+              type=click.Choice(UnityParser.ERROR_MODES), default="strict", show_default=True)
+@click.option("--workers", help="Number of worker processes to parse with. By default, parsing "
+                                "happens within the main process.",
+              type=click.IntRange(min=1), required=False, metavar="COUNT")
+@click.option("--context-lines", help="Number of output lines preceding a failed test kept as "
+                                      "its output.",
+              type=click.IntRange(min=0), default=0, show_default=True, metavar="LINES")
+@click.option("--context-bytes", help="Maximum size of the output lines kept for a failed test.",
+              type=click.IntRange(min=1), default=4096, show_default=True, metavar="BYTES")
+def punity(name: Optional[str] = None, encoding: str = 'ascii', errors: str = 'strict',
+           workers: Optional[int] = None, context_lines: int = 0,
+           context_bytes: int = 4096) -> ExecutionCallable:
     @execution_config
-    def configure_pipeline(_: Context,
+    def configure_pipeline(context: Context,
                            pipeline: ExecutionPipeline) -> None:
-        parser = UnityParser(name, encoding)
+        parser_factory: Callable[[], Parser] = partial(UnityParser, name, encoding, errors,
+                                                       context_lines, context_bytes)
+        if workers is not None:
+            if context.obj.capture_path is not None:
+                # results of the workers arrive in batches, after the output they were parsed
+                # from, so they cannot label the segments of the capture
+                raise click.UsageError("--workers cannot be used with --capture.")
+            # reruns and retries also parse in parallel, each parser closing its workers once
+            # done
+            parser_factory = partial(ParallelParser, parser_factory, workers=workers)
+        parser = parser_factory()
+        if isinstance(parser, ParallelParser):
+            context.with_resource(parser)
         pipeline.parser = parser
+        pipeline.parser_factory = parser_factory
+
+    return configure_pipeline
+
+
+def _table_parser_command(command_name: str, parser_class: Type[TableParser],
+                          help_text: str) -> click.Command:
+    """Creates the command of a parser built on :class:`pyetta.parsers.TableParser`."""
+    @click.command(command_name, cls=PyettaCommand, category="Parsers",
+                   plugin_name="_builtins", help=help_text)
+    @click.option("--name", help="optional name of this test suite",
+                  type=str, metavar="TEST_SUITE_NAME")
+    @click.option("-e", "--encoding", help="File encoding to open the file with.",
+                  default='ascii')
+    @click.option("--errors", help="How lines which cannot be decoded are handled.",
+                  type=click.Choice(TableParser.ERROR_MODES), default="strict",
+                  show_default=True)
+    def parser_command(name: Optional[str] = None, encoding: str = 'ascii',
+                       errors: str = 'strict') -> ExecutionCallable:
+        @execution_config
+        def configure_pipeline(_: Context,
+                               pipeline: ExecutionPipeline) -> None:
+            parser_factory = partial(parser_class, name, encoding, errors)
+            pipeline.parser = parser_factory()
+            pipeline.parser_factory = parser_factory
+
+        return configure_pipeline
+
+    return parser_command
+
+
+pgtest = _table_parser_command("pgtest", GoogleTestParser,
+                               "Parser for the GoogleTest unit test framework.")
+pcpputest = _table_parser_command("pcpputest", CppUTestParser,
+                                  "Parser for the verbose output of the CppUTest unit test "
+                                  "framework.")
+ptap = _table_parser_command("ptap", TapParser, "Parser for the Test Anything Protocol.")
+
+
+def _wrap_benchmarks(parser_factory: Optional[Callable[[], Parser]],
+                     encoding: str) -> BenchmarkParser:
+    return BenchmarkParser(parser_factory() if parser_factory is not None else None,
+                           encoding=encoding)
+
+
+@click.command("pbench", cls=PyettaCommand, category="Parsers", plugin_name="_builtins",
+               help="Parser for benchmark samples printed as 'BENCH:<name>:<value>[:<unit>]'. "
+                    "Wraps the parser given before it, if any, otherwise completes on "
+                    "'BENCH:DONE'.")
+@click.option("-e", "--encoding", help="File encoding to open the file with.",
+              default='utf-8', show_default=True)
+def pbench(encoding: str = 'utf-8') -> ExecutionCallable:
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        if pipeline.parser is not None and pipeline.parser_factory is None:
+            raise click.ClickException(f"Parser {pipeline.parser} cannot be wrapped by the "
+                                       f"benchmark parser.")
+        parser_factory = partial(_wrap_benchmarks, pipeline.parser_factory, encoding)
+        pipeline.wrap_parser(parser_factory(), parser_factory)
+
+    return configure_pipeline
+
+
+def _wrap_aggregation(parser_factory: Callable[[], Parser]) -> AggregatingParser:
+    return AggregatingParser(parser_factory())
+
+
+@click.command("paggregate", cls=PyettaCommand, category="Parsers", plugin_name="_builtins",
+               help="Aggregates the repeated iterations of each test of the parser given before "
+                    "it into a single summary test case, with the counters and timing of the "
+                    "iterations.")
+def paggregate() -> ExecutionCallable:
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        if pipeline.parser is None:
+            raise click.UsageError("The aggregation requires a parser given before it.")
+        parser_factory = None
+        if pipeline.parser_factory is not None:
+            parser_factory = partial(_wrap_aggregation, pipeline.parser_factory)
+        pipeline.wrap_parser(AggregatingParser(pipeline.parser), parser_factory)
 
     return configure_pipeline
 
@@ -141,6 +402,54 @@ def rjunitxml(file: Path, fail_on_skipped: bool = False,
     return configure_pipeline
 
 
+@click.command("rjsonl", cls=PyettaCommand, category="Reporters", plugin_name="_builtins",
+               help="JSON lines output reporter, one test case per line.")
+@click.option("--file", "file", help="Output file path.", required=True,
+              type=click.Path(path_type=Path))
+def rjsonl(file: Path) -> ExecutionCallable:
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        pipeline.reporters.append(JsonLinesReporter(file_path=file))
+
+    return configure_pipeline
+
+
+@click.command("rcolumnar", cls=PyettaCommand, category="Reporters", plugin_name="_builtins",
+               help="Compact binary columnar output reporter.")
+@click.option("--file", "file", help="Output file path.", required=True,
+              type=click.Path(path_type=Path))
+def rcolumnar(file: Path) -> ExecutionCallable:
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        pipeline.reporters.append(ColumnarReporter(file_path=file))
+
+    return configure_pipeline
+
+
+@click.command("rbench", cls=PyettaCommand, category="Reporters", plugin_name="_builtins",
+               help="Benchmark statistics reporter, failing on regressions against a baseline.")
+@click.option("--file", "file", help="JSON file to write the statistics to, which can be used "
+                                     "as a later baseline.",
+              type=click.Path(path_type=Path, dir_okay=False))
+@click.option("--baseline", help="Statistics of a previous run to compare against.",
+              type=click.Path(exists=True, path_type=Path, dir_okay=False))
+@click.option("--threshold", help="Allowed relative increase of a benchmark's mean.",
+              type=click.FloatRange(min=0), default=0.05, show_default=True)
+@click.option("--min-t", help="Minimum Welch's t statistic for an increase to be significant.",
+              type=click.FloatRange(min=0), default=2.0, show_default=True)
+def rbench(file: Optional[Path] = None, baseline: Optional[Path] = None,
+           threshold: float = 0.05, min_t: float = 2.0) -> ExecutionCallable:
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        pipeline.reporters.append(BenchmarkReporter(file_path=file, baseline_path=baseline,
+                                                    threshold=threshold, min_t=min_t))
+
+    return configure_pipeline
+
+
 @click.command("rexit", cls=PyettaCommand, category="Reporters", plugin_name="_builtins",
                help="Reporter to just output exit code.")
 @click.option("--fail-on-skipped",
@@ -160,11 +469,75 @@ def rexit(fail_on_skipped: bool = False, fail_on_empty: bool = False) -> Executi
     return configure_pipeline
 
 
+@click.command("rstream", cls=PyettaCommand, category="Reporters", plugin_name="_builtins",
+               short_help="Streams results live as JSON lines over HTTP.")
+@click.option("--host", help="Host to bind the server to.", default="localhost",
+              show_default=True, type=str, metavar="HOST")
+@click.option("--port", help="Port to bind the server to.", required=True,
+              type=click.IntRange(min=0, max=65535), metavar="PORT")
+@click.option("--batch-interval", help="Seconds between batches of events sent to clients.",
+              default=0.25, show_default=True, type=click.FloatRange(min=0), metavar="SECONDS")
+def rstream(port: int, host: str = "localhost", batch_interval: float = 0.25) -> ExecutionCallable:
+    """Streams results live as JSON lines over HTTP.
+
+    Clients connecting to http://HOST:PORT/events receive each test case as it is parsed,
+    along with the status of the run. This reporter does not affect the exit code."""
+
+    @execution_config
+    def configure_pipeline(context: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        server = ResultStreamServer(host=host, port=port, batch_interval_s=batch_interval)
+        context.with_resource(server)
+        pipeline.listeners.append(server)
+        pipeline.reporters.append(server)
+
+    return configure_pipeline
+
+
+@click.command("rmerge", cls=PyettaCommand, category="Reporters", plugin_name="_builtins",
+               short_help="Merges results with existing result files into JUnit XML.")
+@click.option("--file", "file", help="Output file path.", required=True,
+              type=click.Path(path_type=Path))
+@click.option("--input", "inputs", help="Existing result file to merge, can be repeated.",
+              multiple=True, type=click.Path(path_type=Path, exists=True, dir_okay=False))
+@click.option("--board", help="Board the run was on, used to keep results of each board apart.",
+              required=False, type=str)
+def rmerge(file: Path, inputs: Tuple[Path, ...] = (),
+           board: Optional[str] = None) -> ExecutionCallable:
+    """Merges results with existing result files into a single JUnit XML report.
+
+    Inputs may be JUnit XML, JSON lines or packed results. Test cases are deduplicated by their
+    group, name and board, with the results of this run replacing those of the inputs. This
+    reporter does not affect the exit code."""
+
+    @execution_config
+    def configure_pipeline(_: Context,
+                           pipeline: ExecutionPipeline) -> None:
+        pipeline.reporters.append(MergeReporter(file, inputs, board=board))
+
+    return configure_pipeline
+
+
 def load_plugin():
     add_command_to_cli(lnull)
     add_command_to_cli(lpyocd)
+    add_command_to_cli(lemu)
     add_command_to_cli(cfile)
     add_command_to_cli(cserial)
+    add_command_to_cli(ccapture)
+    add_command_to_cli(csocket)
+    add_command_to_cli(crtt)
+    add_command_to_cli(cemu)
     add_command_to_cli(punity)
+    add_command_to_cli(pgtest)
+    add_command_to_cli(pcpputest)
+    add_command_to_cli(ptap)
+    add_command_to_cli(pbench)
+    add_command_to_cli(paggregate)
     add_command_to_cli(rjunitxml)
     add_command_to_cli(rexit)
+    add_command_to_cli(rjsonl)
+    add_command_to_cli(rcolumnar)
+    add_command_to_cli(rbench)
+    add_command_to_cli(rstream)
+    add_command_to_cli(rmerge)
@@ -0,0 +1,173 @@
+"""Aggregation of the repeated iterations of tests, such as stress firmware running the same
+test thousands of times in a loop.
+
+:class:`AggregatingParser` wraps the parser of the test framework and folds every iteration of
+a test, identified by its file path, group and name, into a single summary test case as soon as
+it is parsed. Memory therefore only grows with the number of distinct tests, not with the
+number of iterations, and reporters receive one test case per test.
+
+A summary test case fails if any iteration failed, otherwise passes if any iteration passed,
+and is skipped if every iteration was. Its ``extra`` holds the counters and timing of the
+iterations under :data:`AGGREGATE_KEY`, see :meth:`TestAggregate.to_dict`. Parser errors are
+kept as they are.
+"""
+import logging
+from typing import Optional, Dict, Tuple, List, Any
+
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.parsers import Parser
+
+log = logging.getLogger("pyetta.aggregation")
+
+AGGREGATE_KEY = "iterations"
+"""Key within a summary test case's ``extra`` holding the counters of its iterations."""
+
+AggregateKey = Tuple[Optional[str], Optional[str], str]
+"""File path, group and name identifying a test."""
+
+
+class TestAggregate:
+    """Counters, failure messages and timing of the iterations of a test. Only the first and
+    last failure messages are kept, so the size is constant."""
+
+    __slots__ = ("passed", "failed", "skipped", "first_failure", "last_failure",
+                 "runtime_min_s", "runtime_max_s", "runtime_total_s")
+
+    def __init__(self) -> None:
+        self.passed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.first_failure: Optional[str] = None
+        self.last_failure: Optional[str] = None
+        self.runtime_min_s = 0.0
+        self.runtime_max_s = 0.0
+        self.runtime_total_s = 0.0
+
+    @property
+    def iterations(self) -> int:
+        """Number of iterations of the test."""
+        return self.passed + self.failed + self.skipped
+
+    @property
+    def result(self) -> TestResult:
+        """The overall result of the iterations."""
+        if self.failed > 0:
+            return TestResult.Fail
+        return TestResult.Pass if self.passed > 0 else TestResult.Skip
+
+    @property
+    def runtime_mean_s(self) -> float:
+        """Mean runtime of an iteration."""
+        return self.runtime_total_s / self.iterations if self.iterations > 0 else 0.0
+
+    def add(self, test_case: TestCase) -> None:
+        """Counts an iteration of the test.
+
+        :param test_case: The iteration.
+        """
+        if self.iterations == 0:
+            self.runtime_min_s = self.runtime_max_s = test_case.runtime_s
+        else:
+            self.runtime_min_s = min(self.runtime_min_s, test_case.runtime_s)
+            self.runtime_max_s = max(self.runtime_max_s, test_case.runtime_s)
+        self.runtime_total_s += test_case.runtime_s
+        if test_case.result == TestResult.Fail:
+            self.failed += 1
+            message = test_case.result_message or test_case.stdout
+            if self.first_failure is None:
+                self.first_failure = message
+            self.last_failure = message
+        elif test_case.result == TestResult.Pass:
+            self.passed += 1
+        else:
+            self.skipped += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converts the counters into a dictionary of JSON compatible types."""
+        return {"iterations": self.iterations, "passed": self.passed, "failed": self.failed,
+                "skipped": self.skipped, "first_failure": self.first_failure,
+                "last_failure": self.last_failure, "runtime_min_s": self.runtime_min_s,
+                "runtime_max_s": self.runtime_max_s, "runtime_mean_s": self.runtime_mean_s}
+
+    def result_message(self) -> Optional[str]:
+        """Summarises the failures of the iterations, None if none failed."""
+        if self.failed == 0:
+            return None
+        message = f"{self.failed} of {self.iterations} iterations failed."
+        if self.first_failure is not None:
+            message += f" First failure: {self.first_failure}"
+            if self.failed > 1 and self.last_failure is not None:
+                message += f" Last failure: {self.last_failure}"
+        return message
+
+
+class AggregatingParser(Parser):
+
+    def __init__(self, parser: Parser) -> None:
+        """Folds the iterations of each test parsed by the wrapped parser into a summary test
+        case, in the order the tests were first seen. The test cases of the wrapped parser are
+        removed as they are folded.
+
+        The summary test cases are updated in place as more iterations are parsed, so listeners
+        of the pipeline only see a test case on its first iteration.
+
+        :param parser: Parser of the test framework.
+        """
+        super(AggregatingParser, self).__init__()
+        self._parser = parser
+        self._aggregates: Dict[AggregateKey, Tuple[TestAggregate, TestCase]] = dict()
+
+    def __str__(self):
+        return f"Aggregating Parser, parser={self._parser}"
+
+    @property
+    def done(self) -> bool:
+        return self._parser.done
+
+    @property
+    def aggregates(self) -> Dict[AggregateKey, TestAggregate]:
+        """The counters of each test."""
+        return {key: aggregate for key, (aggregate, _) in self._aggregates.items()}
+
+    def feed_data(self, data_chunk: bytes) -> None:
+        self._parser.feed_data(data_chunk)
+        self._fold()
+
+    def is_final_chunk(self, data_chunk: bytes) -> bool:
+        return self._parser.is_final_chunk(data_chunk)
+
+    def stop(self, forced: bool = False) -> None:
+        self._parser.stop(forced)
+        self._fold()
+
+    def _fold(self) -> None:
+        parsed: List[TestCase] = self._parser.test_cases
+        if len(parsed) == 0:
+            return
+        for test_case in parsed:
+            if test_case.group == Parser.RESERVED_TEST_GROUP:
+                self._test_cases.append(test_case)
+            else:
+                self._add(test_case)
+        del parsed[:]
+
+    def _add(self, test_case: TestCase) -> None:
+        key = (test_case.filepath, test_case.group, test_case.name)
+        entry = self._aggregates.get(key)
+        if entry is None:
+            summary = TestCase(name=test_case.name, result=test_case.result,
+                               group=test_case.group, filepath=test_case.filepath,
+                               extra=dict(test_case.extra), line_num=test_case.line_num,
+                               timestamp_s=test_case.timestamp_s)
+            entry = self._aggregates[key] = (TestAggregate(), summary)
+            self._test_cases.append(summary)
+        aggregate, summary = entry
+        aggregate.add(test_case)
+        if test_case.result == TestResult.Fail and aggregate.failed == 1:
+            # the output of the first failure is kept, the output of other iterations dropped
+            summary.stdout = test_case.stdout
+            summary.stderr = test_case.stderr
+        summary.result = aggregate.result
+        summary.runtime_s = aggregate.runtime_total_s
+        summary.result_message = aggregate.result_message()
+        summary.extra[AGGREGATE_KEY] = aggregate.to_dict()
@@ -0,0 +1,293 @@
+"""Micro-benchmark results printed by the firmware, such as the cycle counts of DSP kernels.
+
+Samples are extracted from the output by :class:`BenchmarkParser`, which can wrap the parser of
+the test framework so tests and benchmarks are read from the same output. Each benchmark is
+reported as a passing test case in the :data:`BENCHMARK_GROUP` group, with its samples in the
+test case's ``extra``. :class:`BenchmarkReporter` summarises the samples and compares them
+against a baseline, failing the run on regressions.
+
+The default line format is ``BENCH:<name>:<value>[:<unit>]``, for example:
+
+.. code-block:: text
+
+    BENCH:fir_q15:10234:cycles
+    BENCH:fft_1024:88.5:us
+"""
+import json
+import logging
+import math
+import re
+from array import array
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional, Dict, Tuple, List, Iterable, Sequence
+
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.parsers import Parser
+from pyetta.reporters import Reporter
+
+log = logging.getLogger("pyetta.benchmarks")
+
+BENCHMARK_GROUP = "pyetta.benchmark"
+"""Group of the test cases holding benchmark samples."""
+
+SAMPLES_KEY = "samples"
+"""Key within a benchmark test case's ``extra`` holding its samples."""
+
+UNIT_KEY = "unit"
+"""Key within a benchmark test case's ``extra`` holding the unit of its samples."""
+
+DEFAULT_PATTERN = rb"^BENCH:(?P<name>[^:\s]+):" \
+                  rb"(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?::(?P<unit>\S+))?$"
+"""Default pattern of a benchmark sample line."""
+
+DEFAULT_DONE_PATTERN = rb"^BENCH:DONE"
+"""Default pattern of the line completing the benchmarks, when no parser is wrapped."""
+
+
+class BenchmarkSamples:
+    """Compact store of benchmark samples, keeping the values of each benchmark and unit in a
+    typed array."""
+
+    def __init__(self) -> None:
+        self._samples: Dict[Tuple[str, str], array] = dict()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, name: str, value: float, unit: str = "") -> None:
+        """Adds a sample.
+
+        :param name: Name of the benchmark.
+        :param value: The sampled value.
+        :param unit: Unit of the value.
+        """
+        samples = self._samples.get((name, unit))
+        if samples is None:
+            samples = self._samples[(name, unit)] = array("d")
+        samples.append(value)
+
+    def items(self) -> Iterable[Tuple[Tuple[str, str], array]]:
+        """The samples of each benchmark, keyed by name and unit, in the order first seen."""
+        return self._samples.items()
+
+    def to_test_cases(self) -> List[TestCase]:
+        """Converts the samples into test cases, one per benchmark and unit."""
+        return [TestCase(name=name, result=TestResult.Pass, group=BENCHMARK_GROUP,
+                         extra={SAMPLES_KEY: samples.tolist(), UNIT_KEY: unit})
+                for (name, unit), samples in self._samples.items()]
+
+
+class BenchmarkParser(Parser):
+
+    def __init__(self, parser: Optional[Parser] = None, encoding: str = "utf-8",
+                 pattern: bytes = DEFAULT_PATTERN, done_pattern: bytes = DEFAULT_DONE_PATTERN):
+        """Extracts benchmark samples from the output. Lines which are not samples are fed to
+        the wrapped parser, if any. The benchmark test cases are added once the parser is done.
+
+        :param parser: Parser of the test framework, whose completion completes this parser.
+        :param encoding: The encoding of the output.
+        :param pattern: Pattern of a sample line, with ``name``, ``value`` and optionally
+                        ``unit`` groups.
+        :param done_pattern: Pattern of the line completing the benchmarks, only used when no
+                             parser is wrapped.
+        """
+        super(BenchmarkParser, self).__init__()
+        self._parser = parser
+        self._encoding = encoding
+        self._pattern = re.compile(pattern)
+        self._done_pattern = re.compile(done_pattern)
+        self._done = False
+        self._combined: Optional[List[TestCase]] = None
+        self.samples = BenchmarkSamples()
+        """The samples read so far."""
+
+    def __str__(self):
+        return f"Benchmark Parser, parser={self._parser}"
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def test_cases(self) -> List[TestCase]:
+        if self._parser is None:
+            return self._test_cases
+        if not self._done:
+            return self._parser.test_cases
+        if self._combined is None:
+            # the wrapped parser is done, so its test cases no longer change
+            self._combined = self._parser.test_cases + self._test_cases
+        return self._combined
+
+    def feed_data(self, data_chunk: bytes) -> None:
+        if self._done:
+            return
+        line = data_chunk.strip()
+        match = self._pattern.match(line)
+        if match is not None:
+            try:
+                unit = match.group("unit") or b""
+                self.samples.add(match.group("name").decode(self._encoding, "replace"),
+                                 float(match.group("value")),
+                                 unit.decode(self._encoding, "replace"))
+            except (ValueError, IndexError) as ec:
+                log.debug(f"Discarded benchmark sample {line!r}: {ec}")
+        elif self._parser is not None:
+            self._parser.feed_data(data_chunk)
+            if self._parser.done:
+                self._complete()
+        elif self._done_pattern.match(line) is not None:
+            self._complete()
+
+    def is_final_chunk(self, data_chunk: bytes) -> bool:
+        if self._parser is not None:
+            return self._parser.is_final_chunk(data_chunk)
+        return self._done_pattern.match(data_chunk.strip()) is not None
+
+    def stop(self, forced: bool = False) -> None:
+        if self._done:
+            return
+        if self._parser is not None:
+            self._parser.stop(forced)
+        elif forced:
+            self._add_parser_error("Parser stopped before unit test output stopped.")
+        self._complete()
+
+    def _complete(self) -> None:
+        self._done = True
+        self._test_cases.extend(self.samples.to_test_cases())
+        log.debug(f"Read samples of {len(self.samples)} benchmarks.")
+
+
+def _percentile(ordered: Sequence[float], percent: float) -> float:
+    """Linearly interpolated percentile of sorted values."""
+    position = (len(ordered) - 1) * percent / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+@dataclass
+class BenchmarkStats:
+    """Summary statistics of the samples of a benchmark."""
+
+    name: str
+    unit: str
+    count: int
+    mean: float
+    median: float
+    variance: float
+    """Sample variance, zero for a single sample."""
+    minimum: float
+    maximum: float
+    p90: float
+    p99: float
+
+    @property
+    def key(self) -> str:
+        """Identifies the benchmark within a baseline."""
+        return f"{self.name}[{self.unit}]" if self.unit else self.name
+
+    @classmethod
+    def from_samples(cls, name: str, unit: str, samples: Sequence[float]) -> "BenchmarkStats":
+        """Summarises the samples of a benchmark.
+
+        :param name: Name of the benchmark.
+        :param unit: Unit of the samples.
+        :param samples: The samples, at least one.
+        :returns: The statistics.
+        """
+        ordered = sorted(samples)
+        count = len(ordered)
+        mean = math.fsum(ordered) / count
+        variance = math.fsum((value - mean) ** 2 for value in ordered) / (count - 1) \
+            if count > 1 else 0.0
+        return cls(name=name, unit=unit, count=count, mean=mean,
+                   median=_percentile(ordered, 50), variance=variance,
+                   minimum=ordered[0], maximum=ordered[-1],
+                   p90=_percentile(ordered, 90), p99=_percentile(ordered, 99))
+
+
+def is_regression(current: BenchmarkStats, baseline: BenchmarkStats, threshold: float,
+                  min_t: float = 2.0) -> bool:
+    """Checks if a benchmark regressed against its baseline, where lower values are better.
+
+    The mean must have increased by more than the threshold, and the increase must be
+    significant: Welch's t statistic of the two sets of samples must be at least ``min_t``,
+    roughly a 95% confidence for a handful of samples. If neither set of samples varies, such as
+    with deterministic cycle counts, any increase above the threshold is significant.
+
+    :param current: Statistics of this run.
+    :param baseline: Statistics of the baseline.
+    :param threshold: Allowed relative increase of the mean, such as 0.05 for 5%.
+    :param min_t: Minimum t statistic for an increase to be significant.
+    :returns: True if the benchmark regressed.
+    """
+    if current.mean <= baseline.mean * (1 + threshold) + 1e-12:
+        return False
+    standard_error = math.sqrt(current.variance / current.count +
+                               baseline.variance / baseline.count)
+    if standard_error == 0:
+        return True
+    return (current.mean - baseline.mean) / standard_error >= min_t
+
+
+def read_baseline(file_path: Path) -> Dict[str, BenchmarkStats]:
+    """Reads a baseline written by :class:`BenchmarkReporter`.
+
+    :param file_path: The baseline file.
+    :returns: The statistics of each benchmark, keyed by :attr:`BenchmarkStats.key`.
+    """
+    with open(file_path, "r", encoding="utf-8") as fi:
+        data = json.load(fi)
+    return {key: BenchmarkStats(**stats) for key, stats in data["benchmarks"].items()}
+
+
+class BenchmarkReporter(Reporter):
+
+    def __init__(self, file_path: Optional[Path] = None, baseline_path: Optional[Path] = None,
+                 threshold: float = 0.05, min_t: float = 2.0) -> None:
+        """Summarises the samples of each benchmark, and fails the run if any regressed
+        against the baseline, see :func:`is_regression`. Benchmarks missing from the baseline
+        are not compared.
+
+        :param file_path: JSON file to write the statistics to, usable as a later baseline.
+        :param baseline_path: Statistics of a previous run to compare against.
+        :param threshold: Allowed relative increase of the mean, such as 0.05 for 5%.
+        :param min_t: Minimum t statistic for an increase to be significant.
+        """
+        self._file_path = file_path
+        self._baseline_path = baseline_path
+        self._threshold = threshold
+        self._min_t = min_t
+        self.regressions: List[str] = list()
+        """Keys of the benchmarks which regressed in the last report."""
+
+    def __str__(self):
+        return f"Benchmark Reporter, file='{self._file_path}', baseline='{self._baseline_path}'"
+
+    def generate_report(self, test_cases: Iterable[TestCase]) -> int:
+        stats = [BenchmarkStats.from_samples(test_case.name,
+                                             test_case.extra.get(UNIT_KEY, ""),
+                                             test_case.extra[SAMPLES_KEY])
+                 for test_case in test_cases
+                 if test_case.group == BENCHMARK_GROUP and
+                 len(test_case.extra.get(SAMPLES_KEY, ())) > 0]
+
+        if self._file_path is not None:
+            with open(self._file_path, "w", encoding="utf-8") as fo:
+                json.dump({"benchmarks": {s.key: asdict(s) for s in stats}}, fo, indent=2)
+
+        self.regressions = list()
+        if self._baseline_path is not None:
+            baseline = read_baseline(self._baseline_path)
+            for current in stats:
+                previous = baseline.get(current.key)
+                if previous is None:
+                    log.info(f"Benchmark {current.key} has no baseline.")
+                elif is_regression(current, previous, self._threshold, self._min_t):
+                    log.error(f"Benchmark {current.key} regressed, mean {current.mean:.6g} "
+                              f"against a baseline of {previous.mean:.6g}.")
+                    self.regressions.append(current.key)
+        return 1 if len(self.regressions) > 0 else 0
@@ -0,0 +1,341 @@
+"""Raw capture of collector output into a compressed, indexed log file.
+
+The capture file is a sequence of independently compressed segments (gzip members or zstd
+frames), which together still form a valid stream for standard tools such as ``zcat``. A sparse
+JSON lines index is written next to the capture, with one entry per test case pointing at the
+compressed segment containing the output leading up to (and including) that test's result.
+This allows the output of a single test to be extracted without decompressing the whole log.
+"""
+import io
+import json
+import logging
+import zlib
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional, List, Iterator, Any, BinaryIO, Sequence
+
+from pyetta.collectors import Collector
+from pyetta.parser_data import TestCase
+from pyetta.pipeline import PipelineListener
+
+log = logging.getLogger("pyetta.capture")
+
+COMPRESSION_TYPES = ("gzip", "zstd")
+"""Supported compression types for capture files."""
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _import_zstandard() -> Any:
+    try:
+        import zstandard
+    except ImportError as ec:
+        raise ImportError("zstd compression requires the 'zstandard' package, install pyetta "
+                          "with the [zstd] extras to use it.") from ec
+    return zstandard
+
+
+def index_path_for(file_path: Path) -> Path:
+    """Gets the path of the index file belonging to a capture file.
+
+    :param file_path: Path to the capture file.
+    :returns: The path to the sidecar index file.
+    """
+    return file_path.with_name(file_path.name + ".index")
+
+
+def capture_label(test_case: TestCase) -> str:
+    """Generates the label used to index a test case within a capture.
+
+    :param test_case: The test case to generate the label for.
+    :returns: A label in the form ``[group::][filepath::]name``.
+    """
+    parts = [test_case.group, test_case.filepath, test_case.name]
+    return "::".join(part for part in parts if part)
+
+
+@dataclass(frozen=True)
+class CaptureSegment:
+    """An entry within the capture index."""
+
+    label: Optional[str]
+    """Label of the test case the segment belongs to, None for output after the last test."""
+    offset: int
+    """Offset of the compressed segment within the capture file."""
+    length: int
+    """Length of the compressed segment."""
+    raw_offset: int
+    """Offset of the segment within the uncompressed stream."""
+    raw_length: int
+    """Length of the uncompressed segment."""
+
+
+class CaptureWriter:
+    """Writes raw collector output into a compressed segment file with a sparse index."""
+
+    def __init__(self, file_path: Path, compression: str = "gzip", level: int = 6) -> None:
+        """
+        :param file_path: Output capture file. The index is written to ``<file_path>.index``.
+        :param compression: Compression type, one of :data:`COMPRESSION_TYPES`.
+        :param level: Compression level passed to the compressor.
+        """
+        if compression not in COMPRESSION_TYPES:
+            raise ValueError(f"Unsupported capture compression '{compression}'.")
+        if compression == "zstd":
+            self._zstd_compressor = _import_zstandard().ZstdCompressor(level=level)
+        self._file_path = file_path
+        self._compression = compression
+        self._level = level
+        self._file: Optional[BinaryIO] = None
+        self._index: Optional[BinaryIO] = None
+        self._compressor = None
+        self._offset = 0
+        self._segment_offset = 0
+        self._raw_offset = 0
+        self._segment_raw_offset = 0
+        self._last_segment: Optional[CaptureSegment] = None
+
+    def __str__(self):
+        return f"Capture Writer, file='{self._file_path}', compression='{self._compression}'"
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def file_path(self) -> Path:
+        return self._file_path
+
+    def open(self) -> None:
+        """Opens the capture and index files for writing, truncating any existing content."""
+        if self._file is None:
+            self._file = open(self._file_path, "wb")
+            self._index = open(index_path_for(self._file_path), "wb")
+
+    def close(self) -> None:
+        """Ends the trailing segment and closes the underlying files."""
+        if self._file is not None:
+            self._end_segment(None)
+            self._file.close()
+            self._index.close()
+            self._file = None
+            self._index = None
+
+    def write(self, chunk: bytes) -> None:
+        """Writes a chunk of raw data into the current segment.
+
+        :param chunk: Raw bytes as returned by the collector.
+        """
+        if len(chunk) == 0:
+            return
+        self.open()
+        if self._compressor is None:
+            self._compressor = self._new_compressor()
+        self._write_compressed(self._compressor.compress(chunk))
+        self._raw_offset += len(chunk)
+
+    def mark(self, label: str) -> None:
+        """Ends the current segment and records it in the index under the given label.
+
+        If no data was written since the previous mark, the label shares the previous segment.
+        This happens when a single chunk produces more than one test case.
+
+        :param label: Label for the segment, typically from :func:`capture_label`.
+        """
+        self.open()
+        self._end_segment(label)
+
+    def _new_compressor(self) -> Any:
+        if self._compression == "zstd":
+            return self._zstd_compressor.compressobj()
+        # wbits of 31 produces a complete gzip member per segment
+        return zlib.compressobj(self._level, zlib.DEFLATED, 31)
+
+    def _write_compressed(self, data: bytes) -> None:
+        if len(data) > 0:
+            self._file.write(data)
+            self._offset += len(data)
+
+    def _end_segment(self, label: Optional[str]) -> None:
+        if self._compressor is None:
+            if self._last_segment is None or label is None:
+                return
+            segment = CaptureSegment(label, self._last_segment.offset,
+                                     self._last_segment.length,
+                                     self._last_segment.raw_offset,
+                                     self._last_segment.raw_length)
+        else:
+            self._write_compressed(self._compressor.flush())
+            self._compressor = None
+            segment = CaptureSegment(label, self._segment_offset,
+                                     self._offset - self._segment_offset,
+                                     self._segment_raw_offset,
+                                     self._raw_offset - self._segment_raw_offset)
+            self._segment_offset = self._offset
+            self._segment_raw_offset = self._raw_offset
+            # keep the capture usable if the run is interrupted
+            self._file.flush()
+
+        self._last_segment = segment
+        self._index.write(json.dumps(asdict(segment)).encode("utf-8") + b"\n")
+        self._index.flush()
+
+
+class CaptureReader:
+    """Reads a capture file produced by :class:`CaptureWriter`."""
+
+    def __init__(self, file_path: Path) -> None:
+        """
+        :param file_path: The capture file to read. The index must be located next to it.
+        """
+        self._file_path = file_path
+        self._segments: List[CaptureSegment] = list()
+        index_path = index_path_for(file_path)
+        if index_path.exists():
+            with open(index_path, "rb") as fi:
+                for line in fi:
+                    if line.strip():
+                        self._segments.append(CaptureSegment(**json.loads(line)))
+        else:
+            log.warning(f"No index found for capture '{file_path}'.")
+
+        with open(file_path, "rb") as fi:
+            magic = fi.read(4)
+        if magic.startswith(_GZIP_MAGIC) or len(magic) == 0:
+            self._compression = "gzip"
+        elif magic == _ZSTD_MAGIC:
+            self._compression = "zstd"
+        else:
+            raise ValueError(f"'{file_path}' is not a recognised capture file.")
+
+    @property
+    def segments(self) -> List[CaptureSegment]:
+        """All indexed segments, in the order they were captured."""
+        return self._segments
+
+    def find(self, label: str) -> List[CaptureSegment]:
+        """Finds all segments recorded under a label.
+
+        :param label: The label to search for.
+        :returns: Matching segments, in capture order.
+        """
+        return [segment for segment in self._segments if segment.label == label]
+
+    def read_segment(self, segment: CaptureSegment) -> bytes:
+        """Reads and decompresses a single segment, seeking directly to it.
+
+        :param segment: The segment to read.
+        :returns: The uncompressed raw output of the segment.
+        """
+        with open(self._file_path, "rb") as fi:
+            fi.seek(segment.offset)
+            return self._decompress(fi.read(segment.length))
+
+    def read_all(self) -> bytes:
+        """Reads and decompresses the entire capture.
+
+        :returns: The uncompressed raw output.
+        """
+        with open(self._file_path, "rb") as fi:
+            return self._decompress(fi.read())
+
+    def iter_lines(self, segments: Optional[List[CaptureSegment]] = None) -> Iterator[bytes]:
+        """Iterates over the lines of the capture, keeping line endings.
+
+        :param segments: Segments to read, the entire capture is read if not given.
+        """
+        if segments is None:
+            # stream the capture, so large captures are never held in memory at once
+            with open(self._file_path, "rb") as fi:
+                partial_line = b""
+                for data in self._iter_decompressed(fi):
+                    lines = (partial_line + data).splitlines(keepends=True)
+                    partial_line = b""
+                    if len(lines) > 0 and not lines[-1].endswith((b"\n", b"\r")):
+                        partial_line = lines.pop()
+                    yield from lines
+                if len(partial_line) > 0:
+                    yield partial_line
+        else:
+            for segment in segments:
+                yield from self.read_segment(segment).splitlines(keepends=True)
+
+    def _iter_decompressed(self, fi: BinaryIO, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+        """Decompresses a file incrementally, yielding at most ``chunk_size`` bytes at a time."""
+        if self._compression == "zstd":
+            decompressor = _import_zstandard().ZstdDecompressor()
+            with decompressor.stream_reader(fi, read_across_frames=True) as reader:
+                while True:
+                    data = reader.read(chunk_size)
+                    if len(data) == 0:
+                        return
+                    yield data
+
+        decompressor = zlib.decompressobj(31)
+        while True:
+            data = fi.read(chunk_size)
+            if len(data) == 0:
+                return
+            while len(data) > 0:
+                yield decompressor.decompress(data, chunk_size)
+                if decompressor.eof:
+                    # each segment is its own gzip member
+                    data = decompressor.unused_data
+                    decompressor = zlib.decompressobj(31)
+                else:
+                    data = decompressor.unconsumed_tail
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self._compression == "zstd":
+            decompressor = _import_zstandard().ZstdDecompressor()
+            with decompressor.stream_reader(io.BytesIO(data), read_across_frames=True) as reader:
+                return reader.read()
+
+        output = list()
+        while len(data) > 0:
+            decompressor = zlib.decompressobj(31)
+            output.append(decompressor.decompress(data))
+            data = decompressor.unused_data
+        return b"".join(output)
+
+
+class CaptureListener(PipelineListener):
+    """Pipeline listener writing every collected chunk into a capture, marking a segment for
+    each test case produced by the parser."""
+
+    def __init__(self, writer: CaptureWriter):
+        """
+        :param writer: Capture to write the collected output into.
+        """
+        self._writer = writer
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        self._writer.write(chunk)
+        for test_case in test_cases:
+            self._writer.mark(capture_label(test_case))
+
+
+class CaptureCollector(Collector):
+    """Replays the output stored within a capture file, line by line."""
+
+    def __init__(self, reader: CaptureReader, labels: Optional[Sequence[str]] = None):
+        """
+        :param reader: The capture to replay.
+        :param labels: Only replay the segments belonging to these labels. If not given, the
+                       whole capture is replayed.
+        """
+        super().__init__()
+        if labels:
+            segments = [segment for label in labels for segment in reader.find(label)]
+            if len(segments) == 0:
+                raise ValueError(f"No segments found in capture for labels {list(labels)}.")
+            self._lines = reader.iter_lines(segments)
+        else:
+            self._lines = reader.iter_lines()
+
+    def read_chunk(self) -> bytes:
+        return next(self._lines, b"")
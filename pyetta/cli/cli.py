@@ -1,14 +1,30 @@
 import importlib.util
 import logging
+import re
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from types import ModuleType
-from typing import Optional, Tuple, Callable, Dict, List, Union
+from typing import Optional, Tuple, Callable, Dict, List, Union, Any
 
 import click
 from click import pass_context, Context, Parameter
 
+from pyetta.capture import COMPRESSION_TYPES, CaptureWriter, CaptureListener
+from pyetta.cli.config import CONFIG_SUFFIXES, STAGE_CATEGORIES, CompiledStages, \
+    PipelineConfig, StageConfig, read_pipeline_config, compile_config, build_config_plan
+from pyetta.cli.console import ECHO_MODES, create_echo, ProgressListener
 from pyetta.cli.utils import PyettaCommand, PyettaCLIRoot, CliState, ExecutionPipeline, \
     ExecutionCallable
+from pyetta.crash import CrashDetector
+from pyetta.distributed import AgentClient, AgentServer, Coordinator, Job, JobResult, \
+    RecordReporter, parse_address
+from pyetta.parser_data import TestCase
+from pyetta.pipeline import Pipeline, PipelineListener, PipelineStageError, PipelineResult
+from pyetta.profiling import PROFILE_MODES, Profiler
+from pyetta.watch import FileWatcher, watch
 
 from importlib_metadata import entry_points, EntryPoint
 
@@ -41,6 +57,11 @@ def setup_extras(context: Context, _: Parameter,
     context.obj.extras = set(extras)
 
 
+def setup_state(context: Context, parameter: Parameter, value: Any) -> None:
+    context.ensure_object(CliState)
+    setattr(context.obj, parameter.name, value)
+
+
 def setup_logging(_: Context, __: Parameter, verbose: int):
     log_level = logging.ERROR - (10 * min(verbose, 3))
     logging.getLogger().setLevel(log_level)
@@ -89,6 +110,7 @@ def load_plugins(_: click.Group, context: Context) -> None:
 
 
 @click.group(chain=True, cls=PyettaCLIRoot, plugin_handler=load_plugins,
+             invoke_without_command=True, no_args_is_help=True,
              subcommand_metavar="STAGE1 [ARGS]... [STAGE2 [ARGS]...]...")
 @click.version_option(message="%(version)s")
 @click.option('-v', 'verbose',
@@ -104,6 +126,103 @@ def load_plugins(_: click.Group, context: Context) -> None:
               type=click.Path(exists=True, path_type=Path, dir_okay=False),
               callback=setup_extras,
               is_eager=True, expose_value=False)
+@click.option("--capture", "capture_path",
+              help="Writes the raw collected output to a compressed, indexed file.",
+              required=False, type=click.Path(path_type=Path, dir_okay=False),
+              callback=setup_state, expose_value=False, metavar="FILE")
+@click.option("--capture-compression", "capture_compression",
+              help="Compression used for the capture file.",
+              type=click.Choice(COMPRESSION_TYPES), default="gzip", show_default=True,
+              callback=setup_state, expose_value=False)
+@click.option("--echo", "echo_mode", help="How the collected output is shown on the console.",
+              type=click.Choice(ECHO_MODES), default="all", show_default=True,
+              callback=setup_state, expose_value=False)
+@click.option("--echo-interval", "echo_interval_s",
+              help="Interval in seconds at which console output is flushed.",
+              type=click.FloatRange(min=0), default=0.1, show_default=True,
+              callback=setup_state, expose_value=False, metavar="SECONDS")
+@click.option("--echo-rate", "echo_rate",
+              help="Lines shown per interval when using the sample echo mode.",
+              type=click.IntRange(min=1), default=10, show_default=True,
+              callback=setup_state, expose_value=False, metavar="LINES")
+@click.option("--retries", "retries",
+              help="Number of times failed tests are retried before being reported as failed.",
+              type=click.IntRange(min=0), default=0, show_default=True,
+              callback=setup_state, expose_value=False, metavar="COUNT")
+@click.option("--detect-crashes", "detect_crashes",
+              help="Detects the device crashing during a run, from the boot banner appearing "
+                   "again or the output stopping early. The crashing test is failed and the "
+                   "test runner is resumed at the next test, if the loader supports it.",
+              is_flag=True, default=False, callback=setup_state, expose_value=False)
+@click.option("--boot-banner", "boot_banner",
+              help="Regular expression of the boot banner printed by the firmware, used to "
+                   "detect the device resetting.",
+              type=str, default=None, callback=setup_state, expose_value=False,
+              metavar="PATTERN")
+@click.option("--test-start", "test_start_pattern",
+              help="Regular expression of the line printed as each test starts, with a 'name' "
+                   "group, used to name the test running when the device crashed.",
+              type=str, default=None, callback=setup_state, expose_value=False,
+              metavar="PATTERN")
+@click.option("--max-restarts", "max_restarts",
+              help="Maximum number of times the test runner is resumed after crashing.",
+              type=click.IntRange(min=0), default=3, show_default=True,
+              callback=setup_state, expose_value=False, metavar="COUNT")
+@click.option("--report-timeout", "report_timeout_s",
+              help="Maximum time in seconds each reporter may take, unlimited if not given.",
+              type=click.FloatRange(min=0), default=None,
+              callback=setup_state, expose_value=False, metavar="SECONDS")
+@click.option("--profile", "profile_mode",
+              help="Profiles the CPU time or memory used by each stage, reporting a breakdown "
+                   "per plugin once the run is complete.",
+              type=click.Choice(PROFILE_MODES), default=None,
+              callback=setup_state, expose_value=False)
+@click.option("--watch", "watch",
+              help="Reruns the pipeline each time the loader's firmware file changes, keeping "
+                   "the loader and collector open between runs.",
+              is_flag=True, default=False, callback=setup_state, expose_value=False)
+@click.option("--watch-interval", "watch_interval_s",
+              help="Interval in seconds at which the firmware file is checked for changes.",
+              type=click.FloatRange(min=0.01), default=0.5, show_default=True,
+              callback=setup_state, expose_value=False, metavar="SECONDS")
+@click.option("--config", "config_path",
+              help=f"Pipeline configuration file ({', '.join(CONFIG_SUFFIXES)}) to run instead "
+                   f"of stages given on the command line.",
+              required=False, type=click.Path(exists=True, path_type=Path, dir_okay=False),
+              callback=setup_state, expose_value=False, metavar="FILE")
+@click.option("--board-aliases", "board_aliases_path",
+              help="JSON file mapping logical board names, as given to --board, to the unique "
+                   "IDs of their probes.",
+              required=False, type=click.Path(exists=True, path_type=Path, dir_okay=False),
+              callback=setup_state, expose_value=False, metavar="FILE")
+@click.option("--discovery-ttl", "discovery_ttl_s",
+              help="Time in seconds the discovered boards are cached for.",
+              type=click.FloatRange(min=0), default=300.0, show_default=True,
+              callback=setup_state, expose_value=False, metavar="SECONDS")
+@click.option("--agents", "agent_addresses",
+              help="Address of an agent to run the plans of the configuration file on, "
+                   "supports multiples. Reporters run locally.",
+              required=False, type=str, multiple=True,
+              callback=setup_state, expose_value=False, metavar="HOST:PORT")
+@click.option("--serve", "serve_address",
+              help="Runs as an agent listening on the address, running the jobs sent by "
+                   "coordinators instead of any stages.",
+              required=False, type=str, default=None,
+              callback=setup_state, expose_value=False, metavar="HOST:PORT")
+@click.option("--agent-name", "agent_name",
+              help="Name the agent advertises, the host name if not given.",
+              required=False, type=str, default=None,
+              callback=setup_state, expose_value=False)
+@click.option("--agent-stages", "agent_stages",
+              help="Stage the agent allows coordinators to run, supports multiples. All "
+                   "loader, collector and parser stages are allowed if not given.",
+              required=False, type=str, multiple=True,
+              callback=setup_state, expose_value=False, metavar="STAGE")
+@click.option("--agent-token", "agent_token",
+              help="Token shared by the coordinator and its agents, which each request must "
+                   "present.",
+              required=False, type=str, default=None, envvar="PYETTA_AGENT_TOKEN",
+              callback=setup_state, expose_value=False, metavar="TOKEN")
 def cli() -> None:
     """Python Embedded Test Toolbox and Automation
 
@@ -115,65 +234,322 @@ def cli() -> None:
     generate a test result.
 
     An execution plan requires a Loader, a Collector, a Parser, and [1-N]
-    Reporters.
+    Reporters. The stages can also be given by a configuration file with
+    --config.
     """
 
 
-@cli.result_callback()
-@pass_context
-def cli_execute_plan(context: Context,
-                     setup_functions: List[ExecutionCallable]) -> None:
-    log.debug("Entering execution phase.")
-    plan = ExecutionPipeline()
+def _run_plan(context: Context, plan: ExecutionPipeline, interactive: bool = True) -> int:
+    """Runs a single execution plan.
 
-    for setup_function in setup_functions:
-        setup_function(context, plan)
+    :param interactive: Set to false when running plans concurrently, which disables the capture
+                        and console output as they cannot be shared between plans.
+    :returns: The exit code of the plan.
+    """
+    listeners: List[PipelineListener] = list(plan.listeners)
+    parser_factory = plan.parser_factory
+    profiler: Optional[Profiler] = None
+    if context.obj.profile_mode is not None:
+        profiler = Profiler(context.obj.profile_mode)
+        context.with_resource(profiler)
+        for component in [plan.loader, plan.collector, plan.parser, *plan.reporters,
+                          *listeners]:
+            profiler.instrument(component)
+        parser_factory = profiler.instrument_factory(parser_factory)
+
+    if interactive:
+        if context.obj.capture_path is not None:
+            try:
+                capture = CaptureWriter(context.obj.capture_path,
+                                        compression=context.obj.capture_compression)
+            except Exception as ec:
+                log.debug("Error creating the capture file.", exc_info=ec)
+                raise click.ClickException(str(ec)) from ec
+            context.with_resource(capture)
+            listeners.append(CaptureListener(capture))
+
+        progress = ProgressListener(str(plan.loader))
+        context.with_resource(progress)
+        echo = create_echo(context.obj.echo_mode, interval_s=context.obj.echo_interval_s,
+                           rate=context.obj.echo_rate)
+        context.with_resource(echo)
+        listeners.extend([progress, echo])
+
+    crash_detector: Optional[CrashDetector] = None
+    if context.obj.detect_crashes:
+        crash_detector = _create_crash_detector(context.obj)
+    pipeline = Pipeline(plan.loader, plan.collector, parser=plan.parser,
+                        reporters=plan.reporters, parser_factory=parser_factory,
+                        listeners=listeners, retries=context.obj.retries,
+                        report_timeout_s=context.obj.report_timeout_s,
+                        crash_detector=crash_detector)
+    if interactive and context.obj.watch:
+        return _watch_plan(context, pipeline, plan, profiler)
 
-    if not plan.is_valid():
-        raise ValueError("Execution plan missing 1 or more required stages.")
+    try:
+        result = pipeline.run()
+    except PipelineStageError as ec:
+        if interactive:
+            raise click.ClickException(str(ec)) from ec
+        click.echo(f"Error: {ec.stage} failed with loader {plan.loader}: {ec}", err=True)
+        return 1
+    return _echo_result(result, profiler)
+
+
+def _echo_result(result: PipelineResult, profiler: Optional[Profiler]) -> int:
+    for error in result.report_errors:
+        click.echo(f"Error: {error}", err=True)
+    if profiler is not None:
+        click.echo(profiler.format_report(), err=True)
+
+    log.debug(f"Run completed in {result.total_s:.3f}s (load {result.load_s:.3f}s, "
+              f"collect {result.collect_s:.3f}s, report {result.report_s:.3f}s).")
+    return result.exit_code
 
-    log.debug("Loaded all execution objects.")
 
+def _watch_plan(context: Context, pipeline: Pipeline, plan: ExecutionPipeline,
+                profiler: Optional[Profiler]) -> int:
+    """Runs the plan each time its firmware changes, until interrupted. The stages are entered
+    when the plan is built, so they stay open across runs.
+
+    :returns: The exit code of the last run.
+    """
+    firmware_path = plan.loader.firmware_path
+    if firmware_path is None:
+        raise click.UsageError(f"Loader {plan.loader} has no firmware file to watch.")
+    exit_codes: List[int] = list()
+
+    def on_result(result: Optional[PipelineResult]) -> None:
+        exit_code = 1 if result is None else _echo_result(result, profiler)
+        exit_codes.append(exit_code)
+        click.echo(f"Run {len(exit_codes)} completed with exit code {exit_code}. Watching "
+                   f"{firmware_path} for changes, press Ctrl+C to stop.", err=True)
+
+    watcher = FileWatcher([firmware_path], interval_s=context.obj.watch_interval_s)
+    try:
+        watch(pipeline, watcher, on_result)
+    except KeyboardInterrupt:
+        log.debug("Watch mode interrupted.")
+    return exit_codes[-1] if len(exit_codes) > 0 else 1
+
+
+def _create_crash_detector(state: CliState) -> CrashDetector:
+    patterns = [None if pattern is None else pattern.encode("utf-8")
+                for pattern in (state.boot_banner, state.test_start_pattern)]
     try:
-        click.echo(f"Loading with loader {plan.loader}.")
-        with click.progressbar(length=100, label="Flashing",
-                               show_eta=True) as progress_bar:
-            def update_progress(progress: float) -> None:
-                progress_pct = int(progress * 100)
-                progress_bar.update(progress_pct - progress_bar.pos)
-
-            plan.loader.load_to_device(progress=update_progress)
-    except Exception as ec:
-        log.debug("Error loading firmware to target.", exc_info=ec)
-        raise click.ClickException(str(ec)) from ec
+        return CrashDetector(boot_pattern=patterns[0], test_start_pattern=patterns[1],
+                             max_restarts=state.max_restarts)
+    except re.error as ec:
+        raise click.UsageError(f"Invalid crash detection pattern: {ec}") from ec
+
 
+def _check_plan(context: Context, plan: ExecutionPipeline) -> None:
+    if not plan.is_valid():
+        raise click.UsageError("Execution plan missing 1 or more required stages, expected a "
+                               "loader, collector, parser and reporter.")
+    if context.obj.retries > 0 and plan.parser_factory is None:
+        raise click.ClickException(f"Parser {plan.parser} does not support retrying tests.")
+    if context.obj.watch and plan.parser_factory is None:
+        raise click.ClickException(f"Parser {plan.parser} does not support watch mode.")
+    if context.obj.detect_crashes and context.obj.max_restarts > 0 and \
+            plan.parser_factory is None:
+        raise click.ClickException(f"Parser {plan.parser} does not support resuming after a "
+                                   f"crash, use --max-restarts=0 to only record crashes.")
+
+
+def _run_config_entries(context: Context, stages: CompiledStages,
+                        entries: List[Dict[str, Any]], interactive: bool) -> int:
+    """Runs the plans of matrix entries one after another. Each plan is built in its own
+    context, closing its resources before the next plan is built.
+
+    :returns: The highest exit code of the plans.
+    """
+    exit_code = 0
+    for variables in entries:
+        with click.Context(context.command, parent=context, info_name=context.info_name,
+                           obj=context.obj) as plan_context:
+            try:
+                plan = build_config_plan(plan_context, stages, variables)
+                _check_plan(plan_context, plan)
+                plan_exit_code = _run_plan(plan_context, plan, interactive=interactive)
+            except click.ClickException as ec:
+                if interactive:
+                    raise
+                log.debug(f"Error running matrix entry {variables}.", exc_info=ec)
+                click.echo(f"Error: matrix entry {variables}: {ec.format_message()}", err=True)
+                plan_exit_code = 1
+        exit_code = max(exit_code, plan_exit_code)
+    return exit_code
+
+
+def _report_job(context: Context, reporters: CompiledStages, job: Job,
+                test_cases: List[TestCase]) -> int:
+    """Runs the reporter stages of the configuration over the test cases of a job.
+
+    :returns: The highest exit code of the reporters.
+    """
+    exit_code = 0
+    with click.Context(context.command, parent=context, info_name=context.info_name,
+                       obj=context.obj) as plan_context:
+        try:
+            plan = build_config_plan(plan_context, reporters, job.variables)
+        except click.ClickException as ec:
+            click.echo(f"Error: matrix entry {job.variables}: {ec.format_message()}", err=True)
+            return 1
+        snapshot = tuple(test_cases)
+        for reporter in plan.reporters:
+            try:
+                exit_code = max(exit_code, reporter.generate_report(snapshot))
+            except Exception as ec:
+                log.debug(f"Error generating report with {reporter}.", exc_info=ec)
+                click.echo(f"Error: Reporter {reporter} failed: {ec}", err=True)
+                exit_code = 1
+    return exit_code
+
+
+def _run_distributed(context: Context, config: PipelineConfig, stages: CompiledStages) -> int:
+    """Runs the plans of the configuration on agents, see :mod:`pyetta.distributed`. The
+    reporter stages run locally, over the test cases of each plan.
+
+    :returns: The highest exit code of the plans.
+    """
+    if context.obj.capture_path is not None:
+        raise click.UsageError("--capture cannot be used with --agents.")
+    if context.obj.watch:
+        raise click.UsageError("--watch cannot be used with --agents.")
     try:
-        click.echo("Executing test runner.")
+        clients = [AgentClient(parse_address(address), token=context.obj.agent_token)
+                   for address in context.obj.agent_addresses]
+    except ValueError as ec:
+        raise click.UsageError(str(ec)) from ec
+
+    reporters = [(stage, command) for stage, command in stages
+                 if getattr(command, "category", None) == "Reporters"]
+    remote = [stage.to_dict() for stage, command in stages
+              if getattr(command, "category", None) != "Reporters"]
+    groups = [[Job(stages=remote, variables=variables) for variables in group]
+              for group in config.sequential_groups()]
+
+    exit_codes: List[int] = list()
+    lock = threading.Lock()
+
+    def on_result(job: Job, result: JobResult) -> None:
+        exit_code = result.exit_code
+        if result.error is not None:
+            click.echo(f"Error: matrix entry {job.variables}: {result.error}", err=True)
+        else:
+            exit_code = max(exit_code, _report_job(context, reporters, job, result.test_cases))
+            click.echo(f"Matrix entry {job.variables} ran {len(result.test_cases)} tests, exit "
+                       f"code {exit_code}.", err=True)
+        with lock:
+            exit_codes.append(exit_code)
+
+    Coordinator(clients).run(groups, on_result)
+    return max(exit_codes, default=0)
 
-        plan.loader.start_program()
 
-        done = False
-        while not done:
-            chunk = plan.collector.read_chunk()
+def _run_agent_job(context: Context, job: Job, on_test_case: Callable[[TestCase], None]) -> int:
+    """Runs a job sent to this agent, sending its test cases back through a reporter.
 
-            if chunk is not None and len(chunk) > 0:
-                click.echo(chunk)
-                plan.parser.feed_data(chunk)
-            else:
-                plan.parser.stop()
+    :returns: The exit code of the job.
+    """
+    config = PipelineConfig(stages=[StageConfig.from_dict(stage) for stage in job.stages])
+    stages = compile_config(context, config, required=STAGE_CATEGORIES[:-1])
+    with click.Context(context.command, parent=context, info_name=context.info_name,
+                       obj=context.obj) as plan_context:
+        plan = build_config_plan(plan_context, stages, job.variables)
+        plan.reporters.append(RecordReporter(on_test_case))
+        _check_plan(plan_context, plan)
+        return _run_plan(plan_context, plan, interactive=False)
+
+
+def _serve_agent(context: Context) -> int:
+    """Runs as an agent, advertising the stages of the CLI it allows, until interrupted. Only
+    loader, collector and parser stages are allowed, as reporters run on the coordinator."""
+    try:
+        host, port = parse_address(context.obj.serve_address)
+    except ValueError as ec:
+        raise click.UsageError(str(ec)) from ec
+    group = context.command
+    allowed = context.obj.agent_stages
+    stages: Dict[str, List[str]] = dict()
+    for name in group.list_commands(context):
+        category = getattr(group.get_command(context, name), "category", None)
+        if category in STAGE_CATEGORIES[:-1] and (len(allowed) == 0 or name in allowed):
+            stages.setdefault(category, list()).append(name)
+    unknown = set(allowed).difference(*stages.values())
+    if len(unknown) > 0:
+        raise click.UsageError(f"--agent-stages {', '.join(sorted(unknown))} are not loader, "
+                               f"collector or parser stages.")
+
+    name = context.obj.agent_name or socket.gethostname()
+    try:
+        server = AgentServer(name, stages, partial(_run_agent_job, context), host=host,
+                             port=port, token=context.obj.agent_token)
+    except ValueError as ec:
+        raise click.UsageError(f"{ec} Give one with --agent-token.") from ec
+    except OSError as ec:
+        raise click.ClickException(f"Unable to listen on {host}:{port}: {ec}") from ec
+    with server:
+        address = server.address
+        click.echo(f"Agent '{name}' listening on {address[0]}:{address[1]}, press Ctrl+C to "
+                   f"stop.", err=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            log.debug("Agent interrupted.")
+    return 0
 
-            done = plan.parser.done
 
-    except Exception as ec:
-        log.debug("Error collecting data from target.", exc_info=ec)
-        raise click.ClickException(str(ec)) from ec
+def _run_config(context: Context) -> int:
+    try:
+        config = read_pipeline_config(context.obj.config_path)
+        stages = compile_config(context, config)
+    except (ValueError, ImportError) as ec:
+        log.debug("Error reading the configuration file.", exc_info=ec)
+        raise click.UsageError(str(ec)) from ec
+
+    if len(context.obj.agent_addresses) > 0:
+        return _run_distributed(context, config, stages)
+
+    groups = config.sequential_groups()
+    if len(groups) == 1 and len(groups[0]) == 1:
+        return _run_config_entries(context, stages, groups[0], interactive=True)
+
+    if context.obj.capture_path is not None:
+        raise click.UsageError("--capture cannot be used when running multiple plans.")
+    if context.obj.watch:
+        raise click.UsageError("--watch cannot be used when running multiple plans.")
+    max_workers = min(len(groups), config.max_parallel or len(groups))
+    log.debug(f"Running {len(groups)} groups of plans, {max_workers} at a time.")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        exit_codes = list(executor.map(
+            partial(_run_config_entries, context, stages, interactive=False), groups))
+    return max(exit_codes)
 
-    # pass test suites to reports
-    exit_code = 0
-    for reporter in plan.reporters:
-        reporter_exit_code = reporter.generate_report(plan.parser.test_cases)
 
-        # our logic just takes the highest exit code it can
-        exit_code = max(reporter_exit_code, exit_code)
+@cli.result_callback()
+@pass_context
+def cli_execute_plan(context: Context,
+                     setup_functions: List[ExecutionCallable]) -> None:
+    log.debug("Entering execution phase.")
+    if context.obj.serve_address is not None:
+        if len(setup_functions) > 0 or context.obj.config_path is not None:
+            raise click.UsageError("Stages cannot be given together with --serve.")
+        context.exit(_serve_agent(context))
+    if len(context.obj.agent_addresses) > 0 and context.obj.config_path is None:
+        raise click.UsageError("--agents requires the plans to be given with --config.")
+    if context.obj.config_path is not None:
+        if len(setup_functions) > 0:
+            raise click.UsageError("Stages cannot be given together with --config.")
+        context.exit(_run_config(context))
+    if len(setup_functions) == 0:
+        raise click.UsageError("No stages given, chain a loader, collector, parser and reporter "
+                               "or use --config.")
 
-    context.exit(exit_code)
+    plan = ExecutionPipeline()
+    for setup_function in setup_functions:
+        setup_function(context, plan)
+    _check_plan(context, plan)
+    log.debug("Loaded all execution objects.")
+    context.exit(_run_plan(context, plan))
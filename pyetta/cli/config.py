@@ -0,0 +1,315 @@
+"""Declarative pipeline configuration files, an alternative to long chained command lines.
+
+A configuration file lists the stages of the pipeline, each with the options of its command, and
+an optional matrix. Each combination of the matrix values creates its own execution plan, with
+the values substituted into the stage options using ``{name}`` placeholders, with the format
+syntax of python strings. Braces which do not name a matrix entry, such as the placeholders of
+``lemu --command``, are kept as they are, and double braces always give a single brace, such as
+``{{firmware}}`` to keep the emulator's placeholder when the matrix has a ``firmware`` entry.
+
+.. code-block:: toml
+
+    [[stages]]
+    stage = "lpyocd"
+    target = "nrf52840"
+    firmware = "{firmware}"
+    probe = "{board[probe]}"
+
+    [[stages]]
+    stage = "cserial"
+    port = "{board[port]}"
+
+    [[stages]]
+    stage = "punity"
+
+    [[stages]]
+    stage = "rjunitxml"
+    file = "results-{board[name]}-{firmware}.xml"
+
+    [matrix]
+    firmware = ["app.hex", "bootloader_tests.hex"]
+    board = [
+        { name = "a", probe = "0001", port = "/dev/ttyACM0" },
+        { name = "b", probe = "0002", port = "/dev/ttyACM1" },
+    ]
+
+Plans sharing the same value of a ``sequential`` matrix entry, by default ``board``, run one
+after another, as they share hardware such as a probe and serial port. Other plans run
+concurrently, up to ``max_parallel`` at a time if given. Each plan is built right before it runs,
+and its resources are closed once it completes, so no two plans hold the same board.
+
+.. code-block:: toml
+
+    sequential = ["board"]
+    max_parallel = 4
+
+Options are given as values rather than command line arguments, so no argument parsing happens
+when the plans are built. The stages and their options are validated before any plan runs.
+"""
+import itertools
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Mapping, Optional, Sequence
+
+import click
+from click import Context
+
+from pyetta.cli.utils import ExecutionPipeline
+
+log = logging.getLogger("pyetta.cli")
+
+CONFIG_SUFFIXES = (".toml", ".yaml", ".yml")
+"""Supported configuration file extensions."""
+
+STAGE_CATEGORIES = ("Loaders", "Collectors", "Parsers", "Reporters")
+"""Categories a plan requires a stage from."""
+
+
+@dataclass(frozen=True)
+class StageConfig:
+    """A single stage of a configuration file."""
+
+    name: str
+    """Name of the stage's command, such as ``lpyocd``."""
+    options: Dict[str, Any] = field(default_factory=dict)
+    """Values of the command's options, keyed by the option name."""
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "StageConfig":
+        """Creates a stage from its table in a configuration file.
+
+        :param data: The table, naming the command in ``stage`` with the remaining keys being
+                     its options.
+        :returns: The stage.
+        :raises ValueError: If the table does not name a command.
+        """
+        if not isinstance(data, Mapping) or not isinstance(data.get("stage"), str):
+            raise ValueError("Stage must be a table with a 'stage' name.")
+        return cls(name=data["stage"],
+                   options={key: value for key, value in data.items() if key != "stage"})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converts the stage back into its table, see :meth:`from_dict`."""
+        return {"stage": self.name, **self.options}
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """A validated configuration file."""
+
+    stages: List[StageConfig]
+    """The stages of each plan, in order."""
+    matrix: Dict[str, List[Any]] = field(default_factory=dict)
+    """Values substituted into the stage options, a plan is created for each combination."""
+    sequential: List[str] = field(default_factory=lambda: ["board"])
+    """Matrix entries whose plans share hardware, plans with the same values of these entries
+    run one after another."""
+    max_parallel: Optional[int] = None
+    """Maximum number of plans run at once, unlimited if not given."""
+
+    def matrix_entries(self) -> List[Dict[str, Any]]:
+        """Expands the matrix into each combination of its values.
+
+        :returns: The variables of each plan, a single empty entry if there is no matrix.
+        """
+        names = list(self.matrix.keys())
+        return [dict(zip(names, values))
+                for values in itertools.product(*(self.matrix[name] for name in names))]
+
+    def sequential_groups(self) -> List[List[Dict[str, Any]]]:
+        """Groups the matrix entries which must run one after another, see :attr:`sequential`.
+
+        :returns: The groups of matrix entries, in matrix order.
+        """
+        if len(self.sequential) == 0:
+            return [[variables] for variables in self.matrix_entries()]
+        groups: Dict[str, List[Dict[str, Any]]] = dict()
+        for variables in self.matrix_entries():
+            key = json.dumps([variables.get(name) for name in self.sequential],
+                             sort_keys=True, default=str)
+            groups.setdefault(key, list()).append(variables)
+        return list(groups.values())
+
+
+def _load_toml(file_path: Path) -> Any:
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError as ec:
+            raise ImportError("TOML configuration files require the 'tomli' package on python "
+                              "versions before 3.11, install pyetta with the [config] extras "
+                              "to use them.") from ec
+    with open(file_path, "rb") as fi:
+        return tomllib.load(fi)
+
+
+def _load_yaml(file_path: Path) -> Any:
+    try:
+        import yaml
+    except ImportError as ec:
+        raise ImportError("YAML configuration files require the 'pyyaml' package, install "
+                          "pyetta with the [config] extras to use them.") from ec
+    with open(file_path, "r", encoding="utf-8") as fi:
+        return yaml.safe_load(fi)
+
+
+def _parse_config(data: Any) -> PipelineConfig:
+    if not isinstance(data, Mapping):
+        raise ValueError("Configuration must be a table.")
+    unknown = set(data.keys()) - {"stages", "matrix", "sequential", "max_parallel"}
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown configuration keys: {', '.join(sorted(unknown))}.")
+
+    stages = list()
+    for idx, stage in enumerate(data.get("stages", [])):
+        try:
+            stages.append(StageConfig.from_dict(stage))
+        except ValueError as ec:
+            raise ValueError(f"Stage {idx}: {ec}") from ec
+    if len(stages) == 0:
+        raise ValueError("Configuration has no stages.")
+
+    matrix = data.get("matrix", {})
+    if not isinstance(matrix, Mapping):
+        raise ValueError("Matrix must be a table.")
+    for name, values in matrix.items():
+        if not isinstance(values, list) or len(values) == 0:
+            raise ValueError(f"Matrix entry '{name}' must be a non empty list.")
+
+    sequential = data.get("sequential", ["board"])
+    if isinstance(sequential, str):
+        sequential = [sequential]
+    if not isinstance(sequential, list) or not all(isinstance(n, str) for n in sequential):
+        raise ValueError("Sequential must be a list of matrix entry names.")
+    max_parallel = data.get("max_parallel")
+    if max_parallel is not None and (not isinstance(max_parallel, int) or max_parallel < 1):
+        raise ValueError("Max parallel must be a positive integer.")
+    return PipelineConfig(stages=stages, matrix=dict(matrix), sequential=sequential,
+                          max_parallel=max_parallel)
+
+
+def read_pipeline_config(file_path: Path) -> PipelineConfig:
+    """Reads and validates a TOML or YAML configuration file.
+
+    :param file_path: The configuration file.
+    :returns: The configuration.
+    :raises ValueError: If the file is not a valid configuration.
+    """
+    if file_path.suffix == ".toml":
+        data = _load_toml(file_path)
+    elif file_path.suffix in (".yaml", ".yml"):
+        data = _load_yaml(file_path)
+    else:
+        raise ValueError(f"Unsupported configuration file type '{file_path.suffix}', expected "
+                         f"one of {', '.join(CONFIG_SUFFIXES)}.")
+    try:
+        return _parse_config(data)
+    except ValueError as ec:
+        raise ValueError(f"Invalid configuration file {file_path}: {ec}") from ec
+
+
+_PLACEHOLDER = re.compile(r"\{\{|\}\}|\{((\w+)[^{}]*)\}")
+
+
+def _substitute(value: Any, variables: Dict[str, Any]) -> Any:
+    """Substitutes the matrix variables into an option value. A string consisting of only a
+    single variable is replaced by the variable's value as is, keeping its type. Placeholders not
+    naming a variable are kept.
+
+    :raises ValueError: If a placeholder of a variable is invalid, such as a missing key.
+    """
+    if isinstance(value, str):
+        name = value[1:-1]
+        if value.startswith("{") and value.endswith("}") and name in variables:
+            return variables[name]
+
+        def replace(match: "re.Match[str]") -> str:
+            if match.group(1) is None:
+                return match.group(0)[0]
+            if match.group(2) not in variables:
+                return match.group(0)
+            try:
+                return match.group(0).format_map(variables)
+            except (KeyError, IndexError, AttributeError, ValueError) as ec:
+                raise ValueError(f"Invalid placeholder {match.group(0)}: "
+                                 f"{ec.__class__.__name__} {ec}") from ec
+
+        return _PLACEHOLDER.sub(replace, value)
+    if isinstance(value, list):
+        return [_substitute(item, variables) for item in value]
+    return value
+
+
+def _resolve_stage(group: click.Group, context: Context, stage: StageConfig) -> click.Command:
+    command = group.get_command(context, stage.name)
+    if command is None:
+        raise ValueError(f"Unknown stage '{stage.name}'.")
+    names = {param.name for param in command.params if param.name is not None}
+    unknown = {key.replace("-", "_") for key in stage.options} - names
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown options for stage '{stage.name}': "
+                         f"{', '.join(sorted(unknown))}.")
+    return command
+
+
+CompiledStages = List[Tuple[StageConfig, click.Command]]
+"""Stages of a configuration with their resolved commands."""
+
+
+def compile_config(context: Context, config: PipelineConfig,
+                   required: Sequence[str] = STAGE_CATEGORIES) -> CompiledStages:
+    """Resolves the command of each stage, validating the stage names and option names.
+
+    :param context: The context of the pyetta CLI, used to find the stage commands.
+    :param config: The configuration.
+    :param required: Categories the configuration must have a stage from, only checked if all
+                     stages have a category.
+    :returns: The stages with their commands.
+    :raises ValueError: If a stage or option is unknown, or the plan is missing a stage.
+    """
+    group = context.command
+    if not isinstance(group, click.Group):
+        raise TypeError("Configuration plans must be built from the pyetta CLI context.")
+    stages = [(stage, _resolve_stage(group, context, stage)) for stage in config.stages]
+
+    categories = [getattr(command, "category", None) for _, command in stages]
+    if all(category is not None for category in categories):
+        for category in required:
+            if category not in categories:
+                raise ValueError(f"Configuration has no stage from {category}.")
+    return stages
+
+
+def build_config_plan(context: Context, stages: CompiledStages,
+                      variables: Dict[str, Any]) -> ExecutionPipeline:
+    """Builds the execution plan of a single matrix entry.
+
+    The stage commands are invoked directly with their options, so the plan is configured
+    exactly as if the stages were given on the command line. Resources opened by the stages are
+    registered with the given context.
+
+    :param context: Context owning the resources of the plan, a child of the pyetta CLI context.
+    :param stages: The stages, see :func:`compile_config`.
+    :param variables: The matrix entry to substitute into the options.
+    :returns: The execution plan.
+    :raises click.UsageError: If the matrix entry cannot be substituted into an option.
+    """
+    plan = ExecutionPipeline()
+    for stage, command in stages:
+        options = dict()
+        for key, value in stage.options.items():
+            try:
+                options[key.replace("-", "_")] = _substitute(value, variables)
+            except ValueError as ec:
+                raise click.UsageError(f"Option '{key}' of stage '{stage.name}': {ec}") from ec
+        with command.make_context(stage.name, [], parent=context,
+                                  default_map=options) as stage_context:
+            execution_callable = command.invoke(stage_context)
+        execution_callable(context, plan)
+    log.debug(f"Built plan for matrix entry {variables}.")
+    return plan
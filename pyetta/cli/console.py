@@ -0,0 +1,210 @@
+"""Console output of the CLI, implemented as pipeline listeners.
+
+Writing every collected chunk to the terminal is slow when the output is chatty, especially over
+remote sessions. These strategies keep the terminal writes out of the collection loop by
+buffering, sampling or suppressing the echoed output. Buffered output is also flushed by a
+background thread once it is held for the flush interval, so the last lines before the output
+stops, such as a hanging test, are shown without waiting for more output.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Sequence, Callable, Dict, Type, Optional, Any
+
+import click
+
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.pipeline import PipelineListener
+
+ECHO_MODES = ("all", "sample", "failures", "off")
+"""Supported console echo modes."""
+
+
+class ConsoleEcho(PipelineListener, ABC):
+    """Base interface for echoing collected output to the console, as a pipeline listener."""
+
+    def __init__(self, interval_s: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param interval_s: Maximum time output is held in the buffer before being flushed.
+        :param clock: Monotonic clock, in seconds.
+        """
+        self._interval_s = interval_s
+        self._clock = clock
+        self._buffer: List[bytes] = list()
+        self._last_flush = clock()
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self) -> None:
+        """Starts flushing the buffered output in the background on the interval."""
+        if self._flusher is None:
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_on_interval, daemon=True,
+                                             name="pyetta-console-echo")
+            self._flusher.start()
+
+    def stop(self) -> None:
+        """Stops flushing in the background, and flushes the remaining output."""
+        if self._flusher is not None:
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def _flush_on_interval(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            self.flush_due()
+
+    def flush_due(self) -> None:
+        """Flushes the buffered output if it was last flushed at least an interval ago."""
+        with self._lock:
+            if self._clock() - self._last_flush >= self._interval_s:
+                self.flush()
+
+    @abstractmethod
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        pass
+
+    def on_stage(self, stage: str) -> None:
+        # ensure the output is complete before reports are generated
+        if stage == "report":
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered output to the console."""
+        with self._lock:
+            if len(self._buffer) > 0:
+                click.echo(b"".join(self._buffer), nl=False)
+                self._buffer.clear()
+            self._last_flush = self._clock()
+
+    def _buffer_data(self, data: bytes) -> None:
+        with self._lock:
+            self._buffer.append(data)
+        self.flush_due()
+
+
+class BufferedEcho(ConsoleEcho):
+    """Echoes all collected output, flushing to the console on an interval."""
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        self._buffer_data(chunk)
+
+
+class SampledEcho(ConsoleEcho):
+    """Echoes at most a fixed number of chunks per interval, counting the dropped chunks."""
+
+    def __init__(self, interval_s: float = 0.1, rate: int = 10,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param interval_s: Length of each sampling interval, in seconds.
+        :param rate: Number of chunks echoed per interval.
+        :param clock: Monotonic clock, in seconds.
+        """
+        super().__init__(interval_s=interval_s, clock=clock)
+        self._rate = rate
+        self._sampled = 0
+        self._dropped = 0
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        with self._lock:
+            if self._sampled < self._rate:
+                self._sampled += 1
+                self._buffer.append(chunk)
+            else:
+                self._dropped += 1
+        self.flush_due()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._dropped > 0:
+                self._buffer.append(f"[pyetta] {self._dropped} lines not shown.\n".encode())
+                self._dropped = 0
+            self._sampled = 0
+            super().flush()
+
+
+class FailuresEcho(ConsoleEcho):
+    """Echoes only the output of failed test cases."""
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        for test_case in test_cases:
+            if test_case.result == TestResult.Fail:
+                self._buffer_data(f"{test_case.stdout or test_case.name}\n".encode())
+
+
+class NullEcho(ConsoleEcho):
+    """Echoes nothing."""
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        pass
+
+
+class ProgressListener(PipelineListener):
+    """Displays the progress of the pipeline stages on the console."""
+
+    def __init__(self, loader_name: str) -> None:
+        """
+        :param loader_name: Name of the loader to display when loading.
+        """
+        self._loader_name = loader_name
+        self._progress_bar: Optional[Any] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._close_progress_bar()
+
+    def _close_progress_bar(self) -> None:
+        if self._progress_bar is not None:
+            self._progress_bar.__exit__(None, None, None)
+            self._progress_bar = None
+
+    def on_stage(self, stage: str) -> None:
+        self._close_progress_bar()
+        if stage == "load":
+            click.echo(f"Loading with loader {self._loader_name}.")
+            self._progress_bar = click.progressbar(length=100, label="Flashing", show_eta=True)
+            self._progress_bar.__enter__()
+        elif stage == "collect":
+            click.echo("Executing test runner.")
+        elif stage == "resume":
+            click.echo("Device crashed, resuming test runner at the next test.")
+
+    def on_load_progress(self, progress: float) -> None:
+        if self._progress_bar is not None:
+            progress_pct = int(progress * 100)
+            self._progress_bar.update(progress_pct - self._progress_bar.pos)
+
+
+_ECHO_TYPES: Dict[str, Type[ConsoleEcho]] = {
+    "all": BufferedEcho,
+    "sample": SampledEcho,
+    "failures": FailuresEcho,
+    "off": NullEcho,
+}
+
+
+def create_echo(mode: str, interval_s: float = 0.1, rate: int = 10) -> ConsoleEcho:
+    """Creates the console echo for a given mode.
+
+    :param mode: One of :data:`ECHO_MODES`.
+    :param interval_s: Flush interval, in seconds.
+    :param rate: Number of chunks shown per interval, only used for the sample mode.
+    :returns: The console echo.
+    """
+    if mode not in _ECHO_TYPES:
+        raise ValueError(f"Unsupported echo mode '{mode}'.")
+    if mode == "sample":
+        return SampledEcho(interval_s=interval_s, rate=rate)
+    return _ECHO_TYPES[mode](interval_s=interval_s)
@@ -0,0 +1,38 @@
+"""Standalone command merging result files from many runs into a single JUnit XML report."""
+import logging
+from pathlib import Path
+from typing import Tuple
+
+import click
+
+from pyetta.merge import merge_results
+
+log = logging.getLogger("pyetta.cli.merge")
+
+
+@click.command("pyetta-merge")
+@click.argument("inputs", nargs=-1, required=True,
+                type=click.Path(path_type=Path, exists=True, dir_okay=False))
+@click.option("-o", "--output", help="Merged JUnit XML report to write.", required=True,
+              type=click.Path(path_type=Path, dir_okay=False))
+def merge_cli(inputs: Tuple[Path, ...], output: Path) -> None:
+    """Merges JUnit XML, JSON lines or packed result files into a single JUnit XML report.
+
+    Test cases are deduplicated by their group, name and board, keeping the result from the
+    first input it appears in. Give the newest results first to have them replace older ones.
+    """
+    try:
+        merger = merge_results(inputs, output)
+    except Exception as ec:
+        log.debug("Error merging results.", exc_info=ec)
+        raise click.ClickException(str(ec)) from ec
+
+    suites = merger.suites.values()
+    click.echo(f"Merged {sum(suite.tests for suite in suites)} tests from {len(inputs)} files "
+               f"into {output} ({sum(suite.failures for suite in suites)} failed, "
+               f"{merger.duplicates} duplicates removed).")
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    merge_cli()
@@ -11,6 +11,7 @@ from click import Context, HelpFormatter, Command
 from pyetta.collectors import Collector
 from pyetta.loaders import Loader
 from pyetta.parsers import Parser
+from pyetta.pipeline import PipelineListener
 from pyetta.reporters import Reporter
 
 log = logging.getLogger("pyetta.cli")
@@ -22,6 +23,28 @@ class CliState:
     """
     extras: Set[Path] = field(default_factory=set)
     plugins_filter: Set[str] = field(default_factory=set)
+    capture_path: Optional[Path] = None
+    capture_compression: str = "gzip"
+    echo_mode: str = "all"
+    echo_interval_s: float = 0.1
+    echo_rate: int = 10
+    retries: int = 0
+    report_timeout_s: Optional[float] = None
+    config_path: Optional[Path] = None
+    profile_mode: Optional[str] = None
+    watch: bool = False
+    watch_interval_s: float = 0.5
+    detect_crashes: bool = False
+    boot_banner: Optional[str] = None
+    test_start_pattern: Optional[str] = None
+    max_restarts: int = 3
+    agent_addresses: Tuple[str, ...] = ()
+    serve_address: Optional[str] = None
+    agent_name: Optional[str] = None
+    agent_token: Optional[str] = None
+    agent_stages: Tuple[str, ...] = ()
+    board_aliases_path: Optional[Path] = None
+    discovery_ttl_s: float = 300.0
 
 
 @dataclass
@@ -33,6 +56,11 @@ class ExecutionPipeline:
     collector: Collector = None
     parser: Parser = None
     reporters: List[Reporter] = field(default_factory=list)
+    parser_factory: Optional[Callable[[], Parser]] = None
+    """Optional factory creating new instances of the parser, needed when the pipeline runs
+    more than once."""
+    listeners: List[PipelineListener] = field(default_factory=list)
+    """Listeners receiving the events of the pipeline as it runs."""
 
     def is_valid(self) -> bool:
         return self.loader is not None and \
@@ -40,6 +68,16 @@ class ExecutionPipeline:
                self.parser is not None and \
                len(self.reporters) > 0
 
+    def wrap_parser(self, parser: Parser, parser_factory: Optional[Callable[[], Parser]]) -> None:
+        """Replaces the parser with one wrapping it, for stages which extend the parser given
+        before them.
+
+        :param parser: The wrapping parser.
+        :param parser_factory: Factory creating new instances of the wrapping parser.
+        """
+        super(ExecutionPipeline, self).__setattr__("parser", parser)
+        self.parser_factory = parser_factory
+
     def __setattr__(self, key: str, value: Any) -> None:
         if key == "loader" and self.loader is not None:
             raise ValueError("The CLI only supports a single loader. "
@@ -53,6 +91,23 @@ class ExecutionPipeline:
         super(ExecutionPipeline, self).__setattr__(key, value)
 
 
+class BasedIntParamType(click.ParamType):
+    """Integer parameter type accepting any base prefix, such as ``0x20000000``."""
+    name = "integer"
+
+    def convert(self, value: Any, param: Optional[click.Parameter],
+                ctx: Optional[Context]) -> int:
+        if isinstance(value, int):
+            return value
+        try:
+            return int(value, 0)
+        except ValueError:
+            self.fail(f"{value!r} is not a valid integer.", param, ctx)
+
+
+BASED_INT = BasedIntParamType()
+
+
 ExecutionCallable = Callable[[Context, ExecutionPipeline], None]
 """Function signature for execution callables.
 """
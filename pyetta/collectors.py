@@ -1,5 +1,15 @@
+import logging
+import queue
+import select
+import socket
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import IO
+from typing import IO, Optional, Any
+
+from pyetta.loaders import PyOCDDeviceLoader, EmulatorLoader
+
+log = logging.getLogger("pyetta.collectors")
 
 
 class Collector(ABC):
@@ -32,3 +42,215 @@ class IOBaseCollector(Collector):
 
     def read_chunk(self) -> bytes:
         return self._io.readline()
+
+
+class StreamCollector(Collector):
+    """Base class for collectors reading from an unframed byte stream. The stream is split into
+    lines, with each line returned as a chunk.
+
+    Subclasses only need to implement :meth:`_read_available`.
+    """
+
+    def __init__(self, timeout_s: float = 5.0):
+        """
+        :param timeout_s: Maximum time to wait for a complete line. On timeout, any partial line
+                          is returned, or an empty chunk if no data arrived.
+        """
+        super().__init__()
+        self._timeout_s = timeout_s
+        self._buffer = bytearray()
+        self._eof = False
+
+    @abstractmethod
+    def _read_available(self, timeout_s: float) -> Optional[bytes]:
+        """Reads the data currently available from the stream, waiting up to the timeout for
+        data to arrive.
+
+        :param timeout_s: Maximum time to wait for data.
+        :returns: The data read, an empty bytes object if no data arrived within the timeout, or
+                  None if the stream has ended.
+        """
+
+    def read_chunk(self) -> bytes:
+        deadline = time.monotonic() + self._timeout_s
+        while True:
+            line_end = self._buffer.find(b"\n")
+            if line_end >= 0:
+                return self._pop(line_end + 1)
+
+            remaining_s = deadline - time.monotonic()
+            if self._eof or remaining_s <= 0:
+                return self._pop(len(self._buffer))
+
+            data = self._read_available(remaining_s)
+            if data is None:
+                self._eof = True
+            else:
+                self._buffer.extend(data)
+
+    def _pop(self, length: int) -> bytes:
+        chunk = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        return chunk
+
+
+class SocketCollector(StreamCollector):
+    """Collector reading from a TCP socket, such as one exposed by an emulator or a network
+    bridge. The socket is connected on the first read, retrying until the timeout elapses, which
+    allows the server to be started by the loader."""
+
+    def __init__(self, host: str, port: int, timeout_s: float = 5.0):
+        """
+        :param host: Host to connect to.
+        :param port: TCP port to connect to.
+        :param timeout_s: Maximum time to wait for a connection or for a complete line.
+        """
+        super().__init__(timeout_s=timeout_s)
+        self._address = (host, port)
+        self._socket: Optional[socket.socket] = None
+
+    def __str__(self):
+        return f"Socket Collector, address='{self._address[0]}:{self._address[1]}'"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def connect(self) -> None:
+        """Connects to the socket if not already connected."""
+        if self._socket is not None:
+            return
+        deadline = time.monotonic() + self._timeout_s
+        while True:
+            try:
+                connection = socket.create_connection(self._address, timeout=self._timeout_s)
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+        connection.setblocking(False)
+        self._socket = connection
+        log.debug(f"Connected to {self._address}.")
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _read_available(self, timeout_s: float) -> Optional[bytes]:
+        self.connect()
+        readable, _, _ = select.select([self._socket], [], [], timeout_s)
+        if not readable:
+            return b""
+        data = self._socket.recv(65536)
+        # an orderly shutdown from the remote end is reported as an empty read
+        return data if len(data) > 0 else None
+
+
+class RTTCollector(StreamCollector):
+    """Collector reading from a SEGGER RTT up channel, sharing the debug session of a
+    :class:`pyetta.loaders.PyOCDDeviceLoader`.
+
+    The RTT control block is searched for on the first read, after the program has started.
+    """
+
+    def __init__(self, loader: PyOCDDeviceLoader, channel: int = 0,
+                 address: Optional[int] = None, size: Optional[int] = None,
+                 timeout_s: float = 5.0, poll_interval_s: float = 0.001):
+        """
+        :param loader: The loader owning the debug session.
+        :param channel: Index of the RTT up channel to read.
+        :param address: Start address to search for the RTT control block. Defaults to the start
+                        of the target's RAM.
+        :param size: Size of the search region. Defaults to the size of the target's RAM.
+        :param timeout_s: Maximum time to wait for a complete line.
+        :param poll_interval_s: Time to wait between polls of the channel while empty.
+        """
+        super().__init__(timeout_s=timeout_s)
+        self._loader = loader
+        self._channel_index = channel
+        self._address = address
+        self._size = size
+        self._poll_interval_s = poll_interval_s
+        self._channel: Any = None
+
+    def __str__(self):
+        return f"RTT Collector, channel={self._channel_index}"
+
+    def _start(self) -> None:
+        from pyocd.debug.rtt import RTTControlBlock
+
+        control_block = RTTControlBlock.from_target(self._loader.session.target,
+                                                    address=self._address, size=self._size)
+        control_block.start()
+        if self._channel_index >= len(control_block.up_channels):
+            raise ValueError(f"RTT up channel {self._channel_index} does not exist, target has "
+                             f"{len(control_block.up_channels)} up channels.")
+        self._channel = control_block.up_channels[self._channel_index]
+
+    def _read_available(self, timeout_s: float) -> Optional[bytes]:
+        if self._channel is None:
+            self._start()
+        deadline = time.monotonic() + timeout_s
+        while True:
+            data = self._channel.read()
+            if len(data) > 0 or time.monotonic() >= deadline:
+                return bytes(data)
+            time.sleep(self._poll_interval_s)
+
+
+class EmulatorCollector(StreamCollector):
+    """Collector reading the output of the emulator launched by a
+    :class:`pyetta.loaders.EmulatorLoader`.
+
+    The output pipe is drained by a background thread, allowing reads to time out on all
+    platforms. If the loader restarts the emulator, the collector follows the new process.
+    """
+
+    def __init__(self, loader: EmulatorLoader, timeout_s: float = 5.0):
+        """
+        :param loader: The loader running the emulator.
+        :param timeout_s: Maximum time to wait for a complete line.
+        """
+        super().__init__(timeout_s=timeout_s)
+        self._loader = loader
+        self._process: Any = None
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+
+    def __str__(self):
+        return f"Emulator Collector, loader='{self._loader}'"
+
+    @staticmethod
+    def _drain(pipe: IO, output: "queue.Queue[Optional[bytes]]") -> None:
+        try:
+            for data in iter(lambda: pipe.read1(65536), b""):
+                output.put(data)
+        except (OSError, ValueError):
+            # pipe was closed by the loader terminating the emulator
+            pass
+        output.put(None)
+
+    def _follow_process(self) -> None:
+        process = self._loader.process
+        if process is None:
+            raise RuntimeError("Emulator has not been started by the loader.")
+        if process is not self._process:
+            self._process = process
+            self._queue = queue.Queue()
+            self._buffer.clear()
+            self._eof = False
+            threading.Thread(target=self._drain, args=(process.stdout, self._queue),
+                             daemon=True).start()
+
+    def read_chunk(self) -> bytes:
+        self._follow_process()
+        return super().read_chunk()
+
+    def _read_available(self, timeout_s: float) -> Optional[bytes]:
+        try:
+            return self._queue.get(timeout=timeout_s)
+        except queue.Empty:
+            return b""
@@ -0,0 +1,96 @@
+"""Detects the device crashing part way through a run, such as from a hard fault or a watchdog
+reset, so the pipeline can record the crash and resume the test runner at the next test.
+
+A crash is detected from any of:
+
+- The boot banner of the firmware appearing again after the run started, as the device reset.
+- The output stopping before the parser is done, such as the collector timing out or an
+  emulator exiting. The loader is then asked if the device is in a fault state, see
+  :meth:`pyetta.loaders.Loader.is_faulted`.
+
+The test running when the device crashed is only known if the firmware prints a line as each
+test starts, matched by the test start pattern. Otherwise the crash is recorded as a parser
+error, after the last completed test.
+"""
+import logging
+import re
+from typing import Optional, Sequence
+
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.parsers import Parser
+
+log = logging.getLogger("pyetta.crash")
+
+CRASH_KEY = "crash"
+"""Key within a test case's ``extra`` holding the reason the device crashed during the test."""
+
+
+class CrashDetector:
+    """Watches the collected output of a run for the device crashing."""
+
+    def __init__(self, boot_pattern: Optional[bytes] = None,
+                 test_start_pattern: Optional[bytes] = None,
+                 detect_silence: bool = True, max_restarts: int = 3) -> None:
+        """
+        :param boot_pattern: Pattern of the boot banner printed when the firmware starts. The
+                             first banner of a run is expected, any later banner is a reset.
+        :param test_start_pattern: Pattern of the line printed as a test starts, with a
+                                   ``name`` group holding the test's name.
+        :param detect_silence: Set to false to treat the output stopping as the end of the run,
+                               rather than a crash.
+        :param max_restarts: Maximum number of times the test runner is resumed after a crash
+                             within a single run. Set to 0 to only record crashes.
+        """
+        if max_restarts < 0:
+            raise ValueError("Max restarts must not be negative.")
+        self._boot_pattern = None if boot_pattern is None else re.compile(boot_pattern)
+        self._test_start_pattern = None if test_start_pattern is None else \
+            re.compile(test_start_pattern)
+        self.detect_silence = detect_silence
+        self.max_restarts = max_restarts
+        self._booted = False
+        self.current_test: Optional[str] = None
+        """Name of the last test which started, if the test start pattern is given."""
+
+    def __str__(self):
+        return f"Crash Detector, max_restarts={self.max_restarts}"
+
+    def reset(self) -> None:
+        """Resets the state of the detector, called each time the program is started."""
+        self._booted = False
+        self.current_test = None
+
+    def feed_data(self, data_chunk: bytes) -> Optional[str]:
+        """Checks a chunk of the output for a crash.
+
+        :param data_chunk: A line of the collected output.
+        :returns: The reason the device crashed, or None if it did not.
+        """
+        line = data_chunk.strip()
+        if self._boot_pattern is not None and self._boot_pattern.search(line) is not None:
+            if self._booted:
+                return "device reset"
+            self._booted = True
+        elif self._test_start_pattern is not None:
+            match = self._test_start_pattern.search(line)
+            if match is not None:
+                self.current_test = match.group("name").decode("utf-8", "replace")
+        return None
+
+    def crashed_test(self, reason: str, completed: Sequence[TestCase]) -> TestCase:
+        """Creates the failed test case recording a crash.
+
+        :param reason: The reason the device crashed.
+        :param completed: The tests completed before the crash, in order.
+        :returns: The test running when the device crashed, or a parser error if it is unknown.
+        """
+        last = completed[-1].name if len(completed) > 0 else None
+        if self.current_test is not None and self.current_test != last:
+            return TestCase(name=self.current_test, result=TestResult.Fail,
+                            result_message=f"Device crashed during the test ({reason}).",
+                            extra={CRASH_KEY: reason})
+        after = f"after test '{last}'" if last is not None else "before the first test"
+        return TestCase(name="device_crash", result=TestResult.Fail,
+                        group=Parser.RESERVED_TEST_GROUP,
+                        result_message=f"Device crashed {after} ({reason}).",
+                        extra={CRASH_KEY: reason})
@@ -0,0 +1,241 @@
+"""Discovery of the boards connected to the host, pairing each debug probe with its serial port.
+
+Enumerating every USB probe takes seconds on large hubs, so discovered boards are cached in a
+file shared by all pyetta processes of the user, and only rediscovered once the cache is older
+than its time to live, or a board is not found in it.
+
+Probes are paired with the CDC-ACM serial ports they provide by their USB serial number, which
+most probes also use as their unique ID. Boards are resolved by their probe's unique ID, a unique
+prefix of it, or a logical name given by an alias file, a JSON object mapping names to IDs:
+
+.. code-block:: json
+
+    {"nrf52_a": "000683012345", "nrf52_b": "000683054321"}
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import List, Optional, Tuple, Callable, Mapping, Dict, Iterable
+
+log = logging.getLogger("pyetta.discovery")
+
+DEFAULT_CACHE_PATH = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / \
+    "pyetta" / "boards.json"
+"""File the discovered boards are cached in."""
+
+DEFAULT_TTL_S = 300.0
+"""Time the discovered boards are cached for, in seconds."""
+
+
+@dataclass(frozen=True)
+class Board:
+    """A debug probe and the serial ports it provides."""
+
+    unique_id: str
+    """Unique ID of the probe, usually its USB serial number."""
+    description: str = ""
+    """Description of the probe and its target."""
+    ports: Tuple[str, ...] = ()
+    """Serial ports of the probe, in name order."""
+
+    @property
+    def port(self) -> Optional[str]:
+        """The first serial port of the probe, None if it has none."""
+        return self.ports[0] if len(self.ports) > 0 else None
+
+
+ProbeInfo = Tuple[str, str]
+"""Unique ID and description of a probe."""
+
+PortInfo = Tuple[str, Optional[str]]
+"""Device name and USB serial number of a serial port."""
+
+
+def discover_probes() -> List[ProbeInfo]:
+    """Enumerates the connected debug probes using PyOCD.
+
+    :returns: The unique ID and description of each probe.
+    """
+    from pyocd.core.helpers import ConnectHelper
+
+    return [(probe.unique_id, probe.description)
+            for probe in ConnectHelper.get_all_connected_probes(blocking=False,
+                                                                print_wait_message=False)]
+
+
+def discover_serial_ports() -> List[PortInfo]:
+    """Enumerates the serial ports of the host.
+
+    :returns: The device name and USB serial number of each port.
+    """
+    from serial.tools import list_ports
+
+    return [(port.device, port.serial_number) for port in list_ports.comports()]
+
+
+def _serial_key(serial_number: str) -> str:
+    # some probes report their serial number with leading zeros only on one of the interfaces
+    return serial_number.strip().lstrip("0").casefold()
+
+
+def pair_boards(probes: Iterable[ProbeInfo], ports: Iterable[PortInfo]) -> List[Board]:
+    """Pairs each probe with the serial ports sharing its USB serial number.
+
+    :param probes: The probes, see :func:`discover_probes`.
+    :param ports: The serial ports, see :func:`discover_serial_ports`.
+    :returns: A board for each probe, in probe order.
+    """
+    ports_by_serial: Dict[str, List[str]] = dict()
+    for device, serial_number in ports:
+        if serial_number:
+            ports_by_serial.setdefault(_serial_key(serial_number), list()).append(device)
+    return [Board(unique_id=unique_id, description=description,
+                  ports=tuple(sorted(ports_by_serial.get(_serial_key(unique_id), ()))))
+            for unique_id, description in probes]
+
+
+def discover_boards() -> List[Board]:
+    """Enumerates the connected probes and serial ports, and pairs them.
+
+    :returns: The connected boards.
+    """
+    return pair_boards(discover_probes(), discover_serial_ports())
+
+
+def read_aliases(file_path: Path) -> Dict[str, str]:
+    """Reads the logical names of boards.
+
+    :param file_path: JSON file mapping each name to the unique ID of the board's probe.
+    :returns: The unique ID of each name.
+    :raises ValueError: If the file is not a JSON object of strings.
+    """
+    with open(file_path, "r", encoding="utf-8") as fi:
+        aliases = json.load(fi)
+    if not isinstance(aliases, dict) or \
+            not all(isinstance(value, str) for value in aliases.values()):
+        raise ValueError(f"Board aliases {file_path} must map names to probe IDs.")
+    return aliases
+
+
+class DiscoveryCache:
+    """Thread safe cache of the connected boards, backed by a file shared between processes."""
+
+    def __init__(self, cache_path: Optional[Path] = DEFAULT_CACHE_PATH,
+                 ttl_s: float = DEFAULT_TTL_S, aliases: Optional[Mapping[str, str]] = None,
+                 discover: Optional[Callable[[], List[Board]]] = None,
+                 clock: Callable[[], float] = time.time) -> None:
+        """
+        :param cache_path: File the boards are cached in, or None to only cache them in memory.
+        :param ttl_s: Time the boards are cached for, in seconds.
+        :param aliases: Unique ID of the board of each logical name.
+        :param discover: Discovers the connected boards, :func:`discover_boards` by default.
+        :param clock: Wall clock, in seconds, as the cache file is shared between processes.
+        """
+        self._cache_path = cache_path
+        self._ttl_s = ttl_s
+        self._aliases = dict(aliases or {})
+        self._discover = discover or discover_boards
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._boards: Optional[List[Board]] = None
+        self._discovered_at = 0.0
+        self.discoveries = 0
+        """Number of times the boards were discovered, rather than read from the cache."""
+
+    def _is_fresh(self, discovered_at: float) -> bool:
+        return 0 <= self._clock() - discovered_at < self._ttl_s
+
+    def _read_file(self) -> bool:
+        if self._cache_path is None:
+            return False
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as fi:
+                data = json.load(fi)
+            boards = [Board(unique_id=board["unique_id"], description=board["description"],
+                            ports=tuple(board["ports"])) for board in data["boards"]]
+            discovered_at = float(data["discovered_at"])
+        except (OSError, ValueError, KeyError, TypeError) as ec:
+            log.debug(f"Ignored board cache {self._cache_path}: {ec}")
+            return False
+        if not self._is_fresh(discovered_at):
+            return False
+        self._boards, self._discovered_at = boards, discovered_at
+        return True
+
+    def _write_file(self) -> None:
+        if self._cache_path is None:
+            return
+        data = {"discovered_at": self._discovered_at,
+                "boards": [asdict(board) for board in self._boards or []]}
+        try:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # replaced in one step, so other processes never read a partial file
+            temp_path = self._cache_path.with_name(f"{self._cache_path.name}.{os.getpid()}")
+            with open(temp_path, "w", encoding="utf-8") as fo:
+                json.dump(data, fo)
+            os.replace(temp_path, self._cache_path)
+        except OSError as ec:
+            log.warning(f"Unable to write board cache {self._cache_path}: {ec}")
+
+    def _refresh(self) -> None:
+        start = time.monotonic()
+        self._boards = self._discover()
+        self._discovered_at = self._clock()
+        self.discoveries += 1
+        log.debug(f"Discovered {len(self._boards)} boards in {time.monotonic() - start:.3f}s.")
+        self._write_file()
+
+    def boards(self, refresh: bool = False) -> List[Board]:
+        """Gets the connected boards, discovering them if the cache has expired.
+
+        :param refresh: Set to true to discover the boards even if the cache has not expired.
+        :returns: The boards.
+        """
+        with self._lock:
+            cached = self._boards is not None and self._is_fresh(self._discovered_at)
+            if refresh or not (cached or self._read_file()):
+                self._refresh()
+            return list(self._boards or [])
+
+    def invalidate(self) -> None:
+        """Discards the cached boards, such as after a board is unplugged."""
+        with self._lock:
+            self._boards = None
+            if self._cache_path is not None:
+                try:
+                    os.remove(self._cache_path)
+                except OSError:
+                    pass
+
+    def _find(self, unique_id: str) -> Optional[Board]:
+        boards = self.boards()
+        for board in boards:
+            if board.unique_id == unique_id:
+                return board
+        matches = [board for board in boards if board.unique_id.startswith(unique_id)]
+        if len(matches) > 1:
+            raise ValueError(f"Board ID '{unique_id}' matches {len(matches)} boards.")
+        return matches[0] if len(matches) == 1 else None
+
+    def resolve(self, name: str) -> Board:
+        """Finds a board by its logical name, unique ID, or a unique prefix of its ID. If the
+        board is not cached, the boards are discovered again, in case it was just connected.
+
+        :param name: The board.
+        :returns: The board.
+        :raises ValueError: If no single board matches.
+        """
+        unique_id = self._aliases.get(name, name)
+        discoveries = self.discoveries
+        board = self._find(unique_id)
+        if board is None and self.discoveries == discoveries:
+            log.debug(f"Board '{name}' not cached, discovering boards.")
+            self.boards(refresh=True)
+            board = self._find(unique_id)
+        if board is None:
+            raise ValueError(f"No connected board matches '{name}'.")
+        return board
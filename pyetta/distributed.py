@@ -0,0 +1,463 @@
+"""Distributed execution of pipelines across the boards of many hosts.
+
+Each host with boards runs an agent, which advertises the stages it provides and runs the jobs
+it is sent, one at a time as they share the host's hardware. A coordinator dispatches jobs to the
+agents able to run them, and receives the parsed test cases back.
+
+A job is the loader, collector and parser stages of a single plan, as in a configuration file,
+along with the matrix entry substituted into their options. The agent builds the plan itself,
+so only the stage names and options are sent, rather than any of the pipeline's objects.
+
+Messages are JSON objects, one per line, over TCP. Each request opens its own connection:
+
+- ``hello`` is answered by the agent's name and stages, keyed by their category.
+- ``run`` runs a job. The agent sends each parsed test case as a ``test_case`` record, as
+  produced by :func:`pyetta.parser_data.case_to_dict`, followed by ``done`` with the exit
+  code of the job.
+- An ``error`` message ends a request which failed.
+
+Agents run the stages they are sent, which may start processes on the host, so an agent should
+only listen on a trusted network, and be given a token that each request must present. Agents
+refuse to listen beyond the local host without a token, and reject jobs with any stage they do
+not advertise.
+"""
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import socketserver
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Callable, Optional, Tuple, Sequence, Iterator, Iterable
+
+from pyetta.parser_data import TestCase, case_to_dict, case_from_dict
+from pyetta.reporters import Reporter
+
+log = logging.getLogger("pyetta.distributed")
+
+PROTOCOL_VERSION = 1
+"""Version of the messages exchanged between the coordinator and agents."""
+
+DEFAULT_PORT = 7420
+"""Port agents listen on if not given."""
+
+AGENT_VARIABLE = "agent"
+"""Matrix entry pinning a job to the agent with this name."""
+
+AGENT_KEY = "agent"
+"""Key within a test case's ``extra`` holding the name of the agent which ran the test."""
+
+Address = Tuple[str, int]
+
+
+class AgentError(RuntimeError):
+    """Raised when an agent rejects a request or fails to run a job."""
+
+
+def parse_address(address: str) -> Address:
+    """Parses an agent address.
+
+    :param address: The address, as ``host:port`` or ``host`` for the default port.
+    :returns: The host and port.
+    :raises ValueError: If the port is not a number.
+    """
+    host, _, port = address.rpartition(":")
+    if host == "":
+        return port, DEFAULT_PORT
+    try:
+        return host.strip("[]"), int(port)
+    except ValueError as ec:
+        raise ValueError(f"Invalid agent address '{address}', expected host:port.") from ec
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+
+
+@dataclass
+class Job:
+    """The stages of a single plan, run by an agent."""
+
+    stages: List[Dict[str, Any]]
+    """Each stage as a table naming its command in ``stage``, with the remaining keys being
+    its options, as in a configuration file."""
+    variables: Dict[str, Any] = field(default_factory=dict)
+    """The matrix entry substituted into the stage options."""
+
+    @property
+    def stage_names(self) -> List[str]:
+        """Names of the stages of the job."""
+        return [stage["stage"] for stage in self.stages]
+
+
+@dataclass
+class JobResult:
+    """The result of a job."""
+
+    test_cases: List[TestCase]
+    """Test cases received from the agent."""
+    exit_code: int = 0
+    """Exit code of the job, 1 if it failed."""
+    error: Optional[str] = None
+    """Why the job failed, if it failed to run."""
+
+
+@dataclass(frozen=True)
+class AgentInfo:
+    """An agent, as advertised by itself."""
+
+    name: str
+    address: Address
+    stages: Dict[str, List[str]]
+    """Names of the stages the agent provides, keyed by category."""
+
+    def can_run(self, job: Job) -> bool:
+        """Checks if the agent provides all stages of a job, and the job is not pinned to
+        another agent, see :data:`AGENT_VARIABLE`.
+
+        :param job: The job.
+        :returns: True if the agent can run the job.
+        """
+        pinned = job.variables.get(AGENT_VARIABLE)
+        if pinned is not None and str(pinned) != self.name:
+            return False
+        provided = {name for names in self.stages.values() for name in names}
+        return all(name in provided for name in job.stage_names)
+
+
+JobRunner = Callable[[Job, Callable[[TestCase], None]], int]
+"""Runs a job, passing each parsed test case to the callback, and returns its exit code."""
+
+
+class RecordReporter(Reporter):
+    """Passes each test case to a callback, used by agents to send the test cases of a job back
+    to the coordinator. This reporter does not affect the exit code."""
+
+    def __init__(self, on_test_case: Callable[[TestCase], None]) -> None:
+        """
+        :param on_test_case: Called with each test case.
+        """
+        self._on_test_case = on_test_case
+
+    def __str__(self):
+        return "Record Reporter"
+
+    def generate_report(self, test_cases: Iterable[TestCase]) -> int:
+        for test_case in test_cases:
+            self._on_test_case(test_case)
+        return 0
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        def send(message: Dict[str, Any]) -> None:
+            self.wfile.write(_encode(message))
+            self.wfile.flush()
+
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            send({"type": "error", "message": "Malformed request."})
+            return
+        self.server.agent.handle_request(request, send)
+
+
+class _AgentTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    agent: "AgentServer"
+
+
+def is_loopback(host: str) -> bool:
+    """Checks if a host only accepts connections from the local host.
+
+    :param host: The host name or address.
+    :returns: True for ``localhost`` and loopback addresses.
+    """
+    if host.casefold() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class AgentServer:
+    """Serves the requests of coordinators, running their jobs one at a time."""
+
+    def __init__(self, name: str, stages: Dict[str, List[str]], run_job: JobRunner,
+                 host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 token: Optional[str] = None) -> None:
+        """
+        :param name: Name of the agent, such as the host name.
+        :param stages: Names of the stages the agent provides, keyed by category. Jobs with any
+                       other stage are rejected.
+        :param run_job: Runs each job.
+        :param host: Interface to listen on, only the local host by default.
+        :param port: Port to listen on, or 0 for any free port.
+        :param token: Token each request must present, required unless listening on the local
+                      host only.
+        :raises ValueError: If listening beyond the local host without a token.
+        """
+        if not token and not is_loopback(host):
+            raise ValueError(f"An agent token is required to listen on {host}, as agents run "
+                             f"the stages they are sent.")
+        self.name = name
+        self._stages = {category: list(names) for category, names in stages.items()}
+        self._allowed = {stage for names in self._stages.values() for stage in names}
+        self._run_job = run_job
+        self._token = token
+        self._job_lock = threading.Lock()
+        self._server = _AgentTCPServer((host, port), _AgentHandler)
+        self._server.agent = self
+
+    def __str__(self):
+        return f"Agent '{self.name}', address={self.address[0]}:{self.address[1]}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def address(self) -> Address:
+        """The address the agent listens on."""
+        return self._server.server_address[:2]
+
+    def serve_forever(self, poll_interval_s: float = 0.5) -> None:
+        """Serves requests until :meth:`shutdown` is called.
+
+        :param poll_interval_s: Interval at which a shutdown is checked for.
+        """
+        log.debug(f"{self} serving.")
+        self._server.serve_forever(poll_interval_s)
+
+    def shutdown(self) -> None:
+        """Stops serving requests, waiting for :meth:`serve_forever` to return."""
+        self._server.shutdown()
+
+    def close(self) -> None:
+        """Closes the listening socket."""
+        self._server.server_close()
+
+    def handle_request(self, request: Dict[str, Any],
+                       send: Callable[[Dict[str, Any]], None]) -> None:
+        """Handles a single request.
+
+        :param request: The request message.
+        :param send: Sends a message back to the coordinator.
+        """
+        if self._token is not None and not hmac.compare_digest(
+                str(request.get("token", "")).encode("utf-8"), self._token.encode("utf-8")):
+            send({"type": "error", "message": "Invalid agent token."})
+            return
+
+        request_type = request.get("type")
+        if request_type == "hello":
+            send({"type": "hello", "version": PROTOCOL_VERSION, "name": self.name,
+                  "stages": self._stages})
+        elif request_type == "run":
+            job = Job(stages=list(request.get("stages", [])),
+                      variables=dict(request.get("variables", {})))
+            try:
+                rejected = [stage for stage in job.stage_names if stage not in self._allowed]
+            except (TypeError, KeyError):
+                send({"type": "error", "message": "Invalid job stages."})
+                return
+            if len(rejected) > 0:
+                send({"type": "error", "message": f"Stages {', '.join(map(str, rejected))} are "
+                                                  f"not allowed on agent '{self.name}'."})
+                return
+            with self._job_lock:
+                log.debug(f"Running job with stages {job.stage_names}.")
+                try:
+                    exit_code = self._run_job(job, lambda test_case: send(
+                        {"type": "test_case", "test_case": case_to_dict(test_case)}))
+                except Exception as ec:
+                    log.debug("Error running job.", exc_info=ec)
+                    send({"type": "error", "message": str(ec)})
+                    return
+            send({"type": "done", "exit_code": exit_code})
+        else:
+            send({"type": "error", "message": f"Unknown request '{request_type}'."})
+
+
+class AgentClient:
+    """Sends requests to a single agent."""
+
+    def __init__(self, address: Address, token: Optional[str] = None,
+                 connect_timeout_s: float = 10.0, timeout_s: Optional[float] = None) -> None:
+        """
+        :param address: Address of the agent.
+        :param token: Token presented with each request.
+        :param connect_timeout_s: Maximum time to wait to connect to the agent.
+        :param timeout_s: Maximum time to wait for each message from the agent, unlimited if not
+                          given, as jobs only send their test cases once complete.
+        """
+        self.address = address
+        self._token = token
+        self._connect_timeout_s = connect_timeout_s
+        self._timeout_s = timeout_s
+
+    def __str__(self):
+        return f"Agent Client, address={self.address[0]}:{self.address[1]}"
+
+    def _request(self, request: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if self._token is not None:
+            request = {**request, "token": self._token}
+        with socket.create_connection(self.address, timeout=self._connect_timeout_s) as sock:
+            sock.settimeout(self._timeout_s)
+            sock.sendall(_encode(request))
+            with sock.makefile("rb") as fi:
+                for line in fi:
+                    message = json.loads(line)
+                    if message.get("type") == "error":
+                        raise AgentError(message.get("message"))
+                    yield message
+
+    def hello(self) -> AgentInfo:
+        """Gets the agent's name and stages.
+
+        :returns: The agent.
+        :raises AgentError: If the agent rejects the request.
+        :raises OSError: If the agent cannot be reached.
+        """
+        for message in self._request({"type": "hello"}):
+            if message.get("version") != PROTOCOL_VERSION:
+                raise AgentError(f"Agent uses protocol version {message.get('version')}, "
+                                 f"expected {PROTOCOL_VERSION}.")
+            return AgentInfo(name=message["name"], address=self.address,
+                             stages=message["stages"])
+        raise AgentError("Agent closed the connection without a reply.")
+
+    def run(self, job: Job,
+            on_test_case: Optional[Callable[[TestCase], None]] = None) -> JobResult:
+        """Runs a job on the agent.
+
+        :param job: The job.
+        :param on_test_case: Called with each test case as it is received.
+        :returns: The result of the job.
+        :raises AgentError: If the agent fails to run the job.
+        :raises OSError: If the connection to the agent is lost.
+        """
+        result = JobResult(test_cases=list())
+        for message in self._request({"type": "run", "stages": job.stages,
+                                      "variables": job.variables}):
+            if message.get("type") == "test_case":
+                test_case = case_from_dict(message["test_case"])
+                result.test_cases.append(test_case)
+                if on_test_case is not None:
+                    on_test_case(test_case)
+            elif message.get("type") == "done":
+                result.exit_code = int(message["exit_code"])
+                return result
+        raise AgentError("Agent closed the connection before the job completed.")
+
+
+class Coordinator:
+    """Dispatches groups of jobs to agents. The jobs of a group run one after another on the
+    same agent, such as the plans sharing a board, while groups run concurrently across agents.
+    """
+
+    def __init__(self, clients: Sequence[AgentClient]) -> None:
+        """
+        :param clients: Clients of each agent.
+        """
+        if len(clients) == 0:
+            raise ValueError("Coordinator requires at least 1 agent.")
+        self._clients = list(clients)
+
+    def connect(self) -> List[Tuple[AgentClient, AgentInfo]]:
+        """Gets the stages of each agent. Agents which cannot be reached are skipped.
+
+        :returns: The reachable agents.
+        """
+        agents = list()
+        for client in self._clients:
+            try:
+                info = client.hello()
+            except (OSError, AgentError, ValueError) as ec:
+                log.warning(f"Skipped agent at {client.address[0]}:{client.address[1]}: {ec}")
+                continue
+            log.debug(f"Agent '{info.name}' provides {info.stages}.")
+            agents.append((client, info))
+        return agents
+
+    def run(self, groups: Sequence[Sequence[Job]],
+            on_result: Callable[[Job, JobResult], None]) -> None:
+        """Runs the groups of jobs across the agents, until all have run. A job whose agent
+        fails to run it fails. If the connection to an agent is lost, the rest of its group is
+        returned for the other agents, which wait for work until every group has finished. Jobs
+        which no agent can run fail.
+
+        :param groups: The groups of jobs.
+        :param on_result: Called with the result of each job, from the thread of its agent.
+        """
+        agents = self.connect()
+        pending: List[List[Job]] = [list(group) for group in groups if len(group) > 0]
+        running = [0]
+        changed = threading.Condition()
+
+        def take_group(info: AgentInfo) -> Optional[List[Job]]:
+            # agents without work wait while other groups run, as the rest of a group is
+            # returned if its agent is lost
+            with changed:
+                while True:
+                    for idx, group in enumerate(pending):
+                        if all(info.can_run(job) for job in group):
+                            running[0] += 1
+                            return pending.pop(idx)
+                    if running[0] == 0:
+                        return None
+                    changed.wait()
+
+        def finish_group(remaining: Sequence[Job]) -> None:
+            with changed:
+                running[0] -= 1
+                if len(remaining) > 0:
+                    pending.append(list(remaining))
+                changed.notify_all()
+
+        def run_group(client: AgentClient, info: AgentInfo, group: List[Job]) -> List[Job]:
+            """Runs a group on an agent, returning the jobs not run if the agent is lost."""
+            for idx, job in enumerate(group):
+                try:
+                    result = client.run(job)
+                except AgentError as ec:
+                    result = JobResult(test_cases=list(), exit_code=1,
+                                       error=f"Agent '{info.name}' failed the job: {ec}")
+                except OSError as ec:
+                    log.warning(f"Lost agent '{info.name}': {ec}")
+                    return group[idx:]
+                for test_case in result.test_cases:
+                    test_case.extra.setdefault(AGENT_KEY, info.name)
+                on_result(job, result)
+            return list()
+
+        def run_agent(client: AgentClient, info: AgentInfo) -> None:
+            group = take_group(info)
+            while group is not None:
+                remaining: List[Job] = list()
+                try:
+                    remaining = run_group(client, info, group)
+                finally:
+                    finish_group(remaining)
+                if len(remaining) > 0:
+                    return
+                group = take_group(info)
+
+        threads = [threading.Thread(target=run_agent, args=agent, daemon=True,
+                                    name=f"pyetta-agent-{agent[1].name}")
+                   for agent in agents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for group in pending:
+            for job in group:
+                on_result(job, JobResult(test_cases=list(), exit_code=1,
+                                         error="No agent available to run the job."))
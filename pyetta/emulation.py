@@ -0,0 +1,69 @@
+"""Runs test firmware under emulators, allowing many test images to be run concurrently on a
+single host without any physical boards.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Sequence, Iterable, Dict, List, Optional
+
+from pyetta.collectors import EmulatorCollector
+from pyetta.loaders import EmulatorLoader
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.parsers import Parser
+from pyetta.pipeline import Pipeline
+
+log = logging.getLogger("pyetta.emulation")
+
+
+class EmulatorPool:
+    """Runs a set of firmware images under an emulator, with a bounded number of emulator
+    instances running at once.
+
+    Each image is run with its own :class:`pyetta.loaders.EmulatorLoader`,
+    :class:`pyetta.collectors.EmulatorCollector` and parser. The emulators are separate
+    processes, so the threads managing them spend most of their time waiting on output.
+    """
+
+    def __init__(self, command: Sequence[str], parser_factory: Callable[[], Parser],
+                 max_instances: Optional[int] = None, timeout_s: float = 5.0):
+        """
+        :param command: Emulator command, see :class:`pyetta.loaders.EmulatorLoader`.
+        :param parser_factory: Callable creating a new parser for each image.
+        :param max_instances: Maximum number of emulators running at once. Defaults to the
+                              number of CPUs on the host.
+        :param timeout_s: Maximum time to wait for each line of output.
+        """
+        self._command = list(command)
+        self._parser_factory = parser_factory
+        self._max_instances = max_instances or os.cpu_count() or 1
+        self._timeout_s = timeout_s
+
+    def run(self, firmware_paths: Iterable[Path]) -> Dict[Path, List[TestCase]]:
+        """Runs each of the firmware images, blocking until all are complete.
+
+        An image failing to run does not stop the other images. Its failure is reported as a
+        failed test case within :attr:`pyetta.parsers.Parser.RESERVED_TEST_GROUP`.
+
+        :param firmware_paths: The firmware images to run.
+        :returns: The test cases of each image, in the order the images were given.
+        """
+        firmware_paths = list(firmware_paths)
+        with ThreadPoolExecutor(max_workers=self._max_instances) as executor:
+            results = executor.map(self._run_image, firmware_paths)
+            return dict(zip(firmware_paths, results))
+
+    def _run_image(self, firmware_path: Path) -> List[TestCase]:
+        parser = self._parser_factory()
+        try:
+            with EmulatorLoader(self._command, firmware_path) as loader:
+                collector = EmulatorCollector(loader, timeout_s=self._timeout_s)
+                Pipeline(loader, collector, parser=parser).run()
+        except Exception as ec:
+            log.debug(f"Error running '{firmware_path}' under the emulator.", exc_info=ec)
+            return parser.test_cases + [
+                TestCase(group=Parser.RESERVED_TEST_GROUP,
+                         name="emulator_error",
+                         result=TestResult.Fail,
+                         stdout=f"{ec.__class__.__name__} raised with message: {ec}.")]
+        return parser.test_cases
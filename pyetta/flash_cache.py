@@ -0,0 +1,227 @@
+"""Cache of preprocessed firmware images for :class:`pyetta.loaders.PyOCDDeviceLoader`.
+
+Programming a firmware file through PyOCD parses the whole ELF or HEX file on every load, which
+for large HEX files takes longer than the programming itself. The cache keeps the parsed and
+merged segments of each image, keyed by the hash of the file and the target type, so repeated
+loads, and loads of the same image onto many boards at once, only parse the file once.
+
+Each image also holds its erase plan, the flash sectors its segments touch. Whether those
+sectors are erased and programmed is still decided by PyOCD, which compares them against the
+contents of the device.
+"""
+import bisect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple, Optional, Dict, Any
+
+log = logging.getLogger("pyetta.flash_cache")
+
+CACHED_SUFFIXES = (".elf", ".axf", ".hex")
+"""Firmware file types which are parsed into cached images. Other types, such as binaries which
+need a base address, are programmed directly."""
+
+Segment = Tuple[int, bytes]
+"""Address and contents of a contiguous block of the image."""
+
+
+def read_firmware_segments(file_path: Path) -> List[Segment]:
+    """Reads the loadable segments of an ELF or Intel HEX file.
+
+    :param file_path: The firmware file, see :data:`CACHED_SUFFIXES`.
+    :returns: The segments, in file order.
+    :raises ValueError: If the file type is not supported.
+    """
+    suffix = file_path.suffix.lower()
+    if suffix in (".elf", ".axf"):
+        from elftools.elf.elffile import ELFFile
+
+        with open(file_path, "rb") as fi:
+            return [(segment["p_paddr"], segment.data()) for segment in ELFFile(fi).iter_segments()
+                    if segment.header.p_type == "PT_LOAD" and segment.header.p_filesz != 0]
+    if suffix == ".hex":
+        from intelhex import IntelHex
+
+        hex_file = IntelHex(str(file_path))
+        return [(start, hex_file.tobinstr(start=start, end=end - 1))
+                for start, end in hex_file.segments()]
+    raise ValueError(f"Unsupported firmware type '{file_path.suffix}', expected one of "
+                     f"{', '.join(CACHED_SUFFIXES)}.")
+
+
+def merge_segments(segments: List[Segment]) -> List[Segment]:
+    """Sorts segments by address and merges adjacent or overlapping segments, with later
+    segments taking priority where they overlap.
+
+    :param segments: The segments to merge.
+    :returns: The merged segments.
+    """
+    blocks: List[List[int]] = list()
+    for address, data in sorted(segments, key=lambda segment: segment[0]):
+        end = address + len(data)
+        if len(blocks) > 0 and address <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], end)
+        else:
+            blocks.append([address, end])
+
+    starts = [start for start, _ in blocks]
+    buffers = [bytearray(end - start) for start, end in blocks]
+    for address, data in segments:
+        idx = bisect.bisect_right(starts, address) - 1
+        offset = address - starts[idx]
+        buffers[idx][offset:offset + len(data)] = data
+    return [(start, bytes(buffer)) for start, buffer in zip(starts, buffers)]
+
+
+@dataclass(frozen=True)
+class FlashImage:
+    """A preprocessed firmware image."""
+
+    segments: Tuple[Segment, ...]
+    """The merged segments of the image, in address order."""
+    sectors: Tuple[int, ...]
+    """Start addresses of the flash sectors the image touches, in address order."""
+
+    @property
+    def size_bytes(self) -> int:
+        """Total size of the segments."""
+        return sum(len(data) for _, data in self.segments)
+
+
+def plan_image(segments: List[Segment], memory_map: Any) -> FlashImage:
+    """Creates an image from its segments, planning the sectors to erase from the flash regions
+    of the target's memory map.
+
+    :param segments: The segments of the firmware.
+    :param memory_map: The PyOCD memory map of the target.
+    :returns: The image.
+    """
+    merged = merge_segments(segments)
+    sectors = set()
+    for address, data in merged:
+        end = address + len(data)
+        while address < end:
+            region = memory_map.get_region_for_address(address)
+            if region is None:
+                log.debug(f"No memory region for address 0x{address:08x}.")
+                break
+            region_end = min(end, region.end + 1)
+            sector_size = region.sector_size if region.is_flash else None
+            if sector_size:
+                sector = region.start + (address - region.start) // sector_size * sector_size
+                sectors.update(range(sector, region_end, sector_size))
+            address = region_end
+    return FlashImage(segments=tuple(merged), sectors=tuple(sorted(sectors)))
+
+
+def hash_file(file_path: Path) -> str:
+    """Hashes the contents of a file.
+
+    :param file_path: The file.
+    :returns: The SHA-256 of the file, as hex.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as fi:
+        for block in iter(lambda: fi.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_ImageKey = Tuple[str, str]
+
+
+class FlashImageCache:
+    """Thread safe cache of preprocessed firmware images, keyed by the hash of the firmware file
+    and the target type. The least recently used images are evicted once the cached images
+    exceed the size limit.
+
+    Concurrent requests for the same image wait for the first to prepare it, so loading an
+    image onto many boards at once only prepares it once.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """
+        :param max_bytes: Maximum total size of the cached images. Images larger than this are
+                          prepared but not cached.
+        """
+        self.max_bytes = max_bytes
+        self._images: "OrderedDict[_ImageKey, FlashImage]" = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self._preparing: Dict[_ImageKey, threading.Lock] = dict()
+        self.hits = 0
+        """Number of images found in the cache."""
+        self.misses = 0
+        """Number of images prepared."""
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._images)
+
+    @property
+    def size_bytes(self) -> int:
+        """Total size of the cached images."""
+        with self._lock:
+            return self._size_bytes
+
+    def clear(self) -> None:
+        """Removes all cached images."""
+        with self._lock:
+            self._images.clear()
+            self._size_bytes = 0
+
+    def get(self, file_path: Path, target_type: str, memory_map: Any) -> FlashImage:
+        """Gets the image of a firmware file, preparing and caching it if needed.
+
+        :param file_path: The firmware file, see :data:`CACHED_SUFFIXES`.
+        :param target_type: The target type, as different targets have different memory maps.
+        :param memory_map: The PyOCD memory map of the target, used when preparing the image.
+        :returns: The image.
+        """
+        key = (hash_file(file_path), target_type)
+        image = self._lookup(key)
+        if image is not None:
+            return image
+
+        with self._lock:
+            preparing = self._preparing.setdefault(key, threading.Lock())
+        with preparing:
+            # another thread may have prepared the image while waiting
+            image = self._lookup(key)
+            if image is not None:
+                return image
+            log.debug(f"Preparing flash image of {file_path} for {target_type}.")
+            try:
+                image = plan_image(read_firmware_segments(file_path), memory_map)
+                with self._lock:
+                    self.misses += 1
+                    self._store(key, image)
+            finally:
+                with self._lock:
+                    self._preparing.pop(key, None)
+        return image
+
+    def _lookup(self, key: _ImageKey) -> Optional[FlashImage]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+            return image
+
+    def _store(self, key: _ImageKey, image: FlashImage) -> None:
+        if image.size_bytes > self.max_bytes:
+            log.debug(f"Flash image of {image.size_bytes} bytes exceeds the cache size.")
+            return
+        self._images[key] = image
+        self._size_bytes += image.size_bytes
+        while self._size_bytes > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self._size_bytes -= evicted.size_bytes
+
+
+IMAGE_CACHE = FlashImageCache()
+"""Cache shared by the PyOCD loaders of the process."""
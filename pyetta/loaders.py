@@ -1,12 +1,17 @@
 import logging
+import subprocess
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Sequence, List
 from typing import Optional
 
 from pyocd.core.helpers import ConnectHelper
 from pyocd.core.session import Session
+from pyocd.core.target import Target
 from pyocd.flash.file_programmer import FileProgrammer
+from pyocd.flash.loader import FlashLoader
+
+from pyetta.flash_cache import FlashImageCache, IMAGE_CACHE, CACHED_SUFFIXES
 
 log = logging.getLogger("pyetta.loaders")
 
@@ -35,6 +40,57 @@ class Loader(ABC):
         """Starts the loaded program from the beginning. Each subsequent run of the program should
         have its state unaffected by previous run."""
 
+    @property
+    def firmware_path(self) -> Optional[Path]:
+        """Path of the firmware file the loader loads, watched for changes by watch mode. None
+        if the loader does not load a file."""
+        return None
+
+    def set_test_filter(self, tests: Optional[Sequence[str]]) -> bool:
+        """Restricts the individual tests run by the next :meth:`start_program` call, such as
+        when retrying failed tests.
+
+        The default implementation does not support filtering. Loaders that can pass a filter to
+        the test runner, such as through command line arguments or target memory, should
+        override this.
+
+        :param tests: Names of the tests to run, or None to run all tests.
+        :returns: True if the filter will be applied by the test runner, False if unsupported.
+        """
+        return False
+
+    def set_group_filter(self, groups: Optional[Sequence[str]]) -> bool:
+        """Restricts the test groups run by the next :meth:`start_program` call, such as when
+        sharding groups across boards. When both filters are set, only tests matching both are
+        expected to run.
+
+        The default implementation does not support filtering.
+
+        :param groups: Names of the test groups to run, or None to run all groups.
+        :returns: True if the filter will be applied by the test runner, False if unsupported.
+        """
+        return False
+
+    def set_resume_point(self, skip: Optional[int]) -> bool:
+        """Makes the next :meth:`start_program` call skip the first tests of the test runner,
+        resuming a run after the device crashed part way through it.
+
+        The default implementation does not support resuming.
+
+        :param skip: Number of tests to skip, in the order the test runner runs them, or None to
+                     run all tests.
+        :returns: True if the test runner will skip the tests, False if unsupported.
+        """
+        return False
+
+    def is_faulted(self) -> bool:
+        """Checks if the device is in a fault state, such as a locked up core, used to
+        diagnose the device crashing. The default implementation cannot tell.
+
+        :returns: True if the device is known to be faulted.
+        """
+        return False
+
 
 class PyOCDDeviceLoader(Loader):
     """
@@ -43,15 +99,28 @@ class PyOCDDeviceLoader(Loader):
     """
 
     def __init__(self, firmware_path: Path, target: Optional[str] = None,
-                 probe: Optional[str] = None):
+                 probe: Optional[str] = None,
+                 image_cache: Optional[FlashImageCache] = IMAGE_CACHE):
+        """
+        :param firmware_path: Path to the firmware to program.
+        :param target: Expected target type, checked once connected.
+        :param probe: Unique ID of the probe to use, the first probe found if not given.
+        :param image_cache: Cache of preprocessed firmware images, shared by all loaders of the
+                            process by default. Set to None to always program the file directly.
+        """
         self._target = target
         self._firmware_path = firmware_path
         self._probe = probe
+        self._image_cache = image_cache
         self._session: Optional[Session] = None
 
     def __str__(self):
         return f"PyOCD Loader, file='{self._firmware_path}', target='{self._target or 'auto'}'"
 
+    @property
+    def firmware_path(self) -> Optional[Path]:
+        return self._firmware_path
+
     def __enter__(self):
         self._session = ConnectHelper.session_with_chosen_probe(blocking=False,
                                                                 return_first=True,
@@ -67,6 +136,14 @@ class PyOCDDeviceLoader(Loader):
         else:
             raise RuntimeError("Unable to open connection for loader.")
 
+    @property
+    def session(self) -> Session:
+        """The open debug session, allowing other stages such as collectors to share the
+        connection to the probe."""
+        if self._session is None:
+            raise RuntimeError("Loader session is not open.")
+        return self._session
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self._board = None
         if self._session is not None:
@@ -74,12 +151,162 @@ class PyOCDDeviceLoader(Loader):
 
     def load_to_device(self,
                        progress: Optional[Callable[[int], None]] = None) -> None:
-        programmer = FileProgrammer(self._session, progress=progress)
-        programmer.program(file_or_path=str(self._firmware_path.resolve()))
+        if self._image_cache is None or \
+                self._firmware_path.suffix.lower() not in CACHED_SUFFIXES:
+            programmer = FileProgrammer(self._session, progress=progress)
+            programmer.program(file_or_path=str(self._firmware_path.resolve()))
+            return
+
+        image = self._image_cache.get(self._firmware_path, self._board.target_type,
+                                      self._session.target.memory_map)
+        log.debug(f"Programming {image.size_bytes} bytes over {len(image.sectors)} sectors.")
+        loader = FlashLoader(self._session, progress=progress)
+        for address, data in image.segments:
+            try:
+                loader.add_data(address, data)
+            except ValueError as ec:
+                # as when programming the file, data outside of flash is skipped
+                log.warning(f"Failed to add data at 0x{address:08x}: {ec}")
+        loader.commit()
 
     def reset_device(self) -> None:
         self._board.target.reset()
 
+    def is_faulted(self) -> bool:
+        try:
+            return self._board.target.get_state() == Target.State.LOCKUP
+        except Exception as ec:
+            log.debug("Error reading the target state.", exc_info=ec)
+            return False
+
     def start_program(self):
         self._board.target.reset_and_halt()
         self._board.target.resume()
+
+
+class EmulatorLoader(Loader):
+    """
+    Loader running the firmware under an emulator, such as QEMU, or any command line simulator.
+    The emulator is launched as a subprocess when the program is started, with its output
+    available through :attr:`process` for a collector to read.
+    """
+
+    FIRMWARE_PLACEHOLDER = "{firmware}"
+    """Placeholder within the command arguments that is replaced with the firmware path."""
+
+    FILTER_PLACEHOLDER = "{filter}"
+    """Placeholder within the command arguments that is replaced with the comma separated test
+    names to run. Arguments containing this placeholder are omitted when no filter is set."""
+
+    GROUP_FILTER_PLACEHOLDER = "{groups}"
+    """Placeholder within the command arguments that is replaced with the comma separated test
+    groups to run. Arguments containing this placeholder are omitted when no filter is set."""
+
+    RESUME_PLACEHOLDER = "{resume}"
+    """Placeholder within the command arguments that is replaced with the number of tests to
+    skip when resuming after a crash. Arguments containing this placeholder are omitted when not
+    resuming."""
+
+    def __init__(self, command: Sequence[str], firmware_path: Path,
+                 terminate_timeout_s: float = 5.0):
+        """
+        :param command: The emulator command and its arguments. Occurrences of
+                        :attr:`FIRMWARE_PLACEHOLDER` are replaced with the firmware path.
+        :param firmware_path: Path to the firmware to run.
+        :param terminate_timeout_s: Time to wait for the emulator to exit before killing it.
+        """
+        if len(command) == 0:
+            raise ValueError("Emulator command must not be empty.")
+        self._command = list(command)
+        self._firmware_path = firmware_path
+        self._terminate_timeout_s = terminate_timeout_s
+        self._process: Optional[subprocess.Popen] = None
+        self._test_filter: Optional[Sequence[str]] = None
+        self._group_filter: Optional[Sequence[str]] = None
+        self._resume_point: Optional[int] = None
+
+    def __str__(self):
+        return f"Emulator Loader, file='{self._firmware_path}', emulator='{self._command[0]}'"
+
+    @property
+    def firmware_path(self) -> Optional[Path]:
+        return self._firmware_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._terminate()
+
+    @property
+    def process(self) -> Optional[subprocess.Popen]:
+        """The running emulator process, None if the program has not been started."""
+        return self._process
+
+    def _build_command(self) -> List[str]:
+        firmware = str(self._firmware_path.resolve())
+        command = list()
+        resume = None if self._resume_point is None else [str(self._resume_point)]
+        filters = ((self.FILTER_PLACEHOLDER, self._test_filter),
+                   (self.GROUP_FILTER_PLACEHOLDER, self._group_filter),
+                   (self.RESUME_PLACEHOLDER, resume))
+        for arg in self._command:
+            if any(placeholder in arg and names is None for placeholder, names in filters):
+                continue
+            for placeholder, names in filters:
+                if names is not None:
+                    arg = arg.replace(placeholder, ",".join(names))
+            command.append(arg.replace(self.FIRMWARE_PLACEHOLDER, firmware))
+        return command
+
+    def _terminate(self) -> None:
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.terminate()
+                try:
+                    self._process.wait(timeout=self._terminate_timeout_s)
+                except subprocess.TimeoutExpired:
+                    log.warning("Emulator did not exit when requested, killing it.")
+                    self._process.kill()
+                    self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+
+    def load_to_device(self,
+                       progress: Optional[Callable[[int], None]] = None) -> None:
+        if not self._firmware_path.is_file():
+            raise FileNotFoundError(f"Firmware '{self._firmware_path}' does not exist.")
+        if progress is not None:
+            progress(1.0)
+
+    def reset_device(self) -> None:
+        self._terminate()
+
+    def set_test_filter(self, tests: Optional[Sequence[str]]) -> bool:
+        if not any(self.FILTER_PLACEHOLDER in arg for arg in self._command):
+            return False
+        self._test_filter = None if tests is None else list(tests)
+        return True
+
+    def set_group_filter(self, groups: Optional[Sequence[str]]) -> bool:
+        if not any(self.GROUP_FILTER_PLACEHOLDER in arg for arg in self._command):
+            return False
+        self._group_filter = None if groups is None else list(groups)
+        return True
+
+    def set_resume_point(self, skip: Optional[int]) -> bool:
+        if not any(self.RESUME_PLACEHOLDER in arg for arg in self._command):
+            return False
+        self._resume_point = skip
+        return True
+
+    def is_faulted(self) -> bool:
+        # an emulator exiting with an error is the closest to a fault state
+        return self._process is not None and self._process.poll() not in (None, 0)
+
+    def start_program(self) -> None:
+        self._terminate()
+        command = self._build_command()
+        log.debug(f"Starting emulator with {command}.")
+        self._process = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
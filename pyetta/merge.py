@@ -0,0 +1,311 @@
+"""Merges the results of many runs, such as the same tests run across multiple boards and
+firmware variants, into a single JUnit XML report.
+
+Inputs are streamed one test case at a time, and the rendered test cases are spooled to a
+temporary file until the report is written, so memory use does not grow with the size of the
+output of each test. Only the keys used to deduplicate test cases and the statistics of each
+suite are held in memory.
+"""
+import json
+import logging
+import tempfile
+import xml.etree.ElementTree as ET
+from array import array
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Iterator, Iterable, Optional, Dict, Tuple, Set, IO, List
+from xml.sax.saxutils import escape, quoteattr
+
+from pyetta.parser_data import TestCase, TestResult, PackedTestCases, ColumnarTestCases, \
+    case_from_dict
+from pyetta.reporters import Reporter
+
+log = logging.getLogger("pyetta.merge")
+
+BOARD_KEY = "board"
+"""Key within a test case's ``extra`` holding the board the test was run on."""
+
+_MergeKey = Tuple[Optional[str], str, Optional[str]]
+
+
+def board_of(test_case: TestCase) -> Optional[str]:
+    """Gets the board a test case was run on.
+
+    :param test_case: The test case.
+    :returns: The board stored in the test case's ``extra``, or None if unknown.
+    """
+    board = test_case.extra.get(BOARD_KEY)
+    return None if board is None else str(board)
+
+
+def _read_junit_xml(file_path: Path) -> Iterator[TestCase]:
+    suite_name: Optional[str] = None
+    hostname: Optional[str] = None
+    for event, element in ET.iterparse(str(file_path), events=("start", "end")):
+        if element.tag == "testsuite":
+            if event == "start":
+                suite_name = element.get("name")
+                # suites of test cases without a group are named "None" by the JUnit XML
+                # reporter, and left empty by the merger
+                if suite_name in ("", str(None)):
+                    suite_name = None
+                hostname = element.get("hostname")
+            else:
+                element.clear()
+            continue
+        if event != "end" or element.tag != "testcase":
+            continue
+
+        result = TestResult.Pass
+        result_message = None
+        for outcome in ("failure", "error", "skipped"):
+            outcome_element = element.find(outcome)
+            if outcome_element is not None:
+                result = TestResult.Skip if outcome == "skipped" else TestResult.Fail
+                result_message = outcome_element.get("message") or outcome_element.text
+                break
+        extra = {BOARD_KEY: hostname} if hostname else dict()
+        yield TestCase(name=element.get("name", ""),
+                       result=result,
+                       group=suite_name if suite_name is not None else element.get("classname"),
+                       filepath=element.get("file"),
+                       extra=extra,
+                       line_num=int(element.get("line") or 0),
+                       runtime_s=float(element.get("time") or 0.0),
+                       stdout=element.findtext("system-out"),
+                       stderr=element.findtext("system-err"),
+                       result_message=result_message)
+        # discard the parsed test case, keeping memory bounded
+        element.clear()
+
+
+def _read_json_lines(file_path: Path) -> Iterator[TestCase]:
+    with open(file_path, "r", encoding="utf-8") as fi:
+        for line in fi:
+            if len(line.strip()) > 0:
+                yield case_from_dict(json.loads(line))
+
+
+def _read_packed(file_path: Path) -> Iterator[TestCase]:
+    with PackedTestCases.from_file(file_path) as packed:
+        yield from packed
+
+
+def _read_columnar(file_path: Path) -> Iterator[TestCase]:
+    with ColumnarTestCases.from_file(file_path) as columnar:
+        yield from columnar
+
+
+def read_results(file_path: Path) -> Iterator[TestCase]:
+    """Reads the test cases of a result file, one at a time. The format is detected from the
+    contents of the file, supporting:
+
+    - JUnit XML, with the ``hostname`` of each test suite used as the board.
+    - JSON lines, one :func:`pyetta.parser_data.case_to_dict` per line.
+    - Packed test cases, see :func:`pyetta.parser_data.pack_test_cases`.
+    - Columnar test cases, see :func:`pyetta.parser_data.pack_test_cases_columnar`.
+
+    :param file_path: The result file.
+    :returns: An iterator over the test cases of the file.
+    """
+    with open(file_path, "rb") as fi:
+        start = fi.read(64).lstrip()
+    if start.startswith(b"PYTC"):
+        return _read_packed(file_path)
+    if start.startswith(b"PYCL"):
+        return _read_columnar(file_path)
+    if start.startswith(b"<"):
+        return _read_junit_xml(file_path)
+    return _read_json_lines(file_path)
+
+
+@dataclass
+class SuiteStats:
+    """Statistics of a merged test suite."""
+
+    tests: int = 0
+    failures: int = 0
+    skipped: int = 0
+    time_s: float = 0.0
+    offsets: array = field(default_factory=lambda: array("Q"))
+    """Spool offsets and lengths of the rendered test cases, as pairs."""
+
+    def add(self, test_case: TestCase, offset: int, length: int) -> None:
+        self.tests += 1
+        if test_case.result == TestResult.Fail:
+            self.failures += 1
+        elif test_case.result == TestResult.Skip:
+            self.skipped += 1
+        self.time_s += test_case.runtime_s
+        self.offsets.extend((offset, length))
+
+
+def _render_test_case(test_case: TestCase) -> bytes:
+    attributes = [f"name={quoteattr(test_case.name)}",
+                  f"time=\"{test_case.runtime_s:.6f}\""]
+    if test_case.group is not None:
+        attributes.append(f"classname={quoteattr(test_case.group)}")
+    if test_case.filepath is not None:
+        attributes.append(f"file={quoteattr(test_case.filepath)}")
+    if test_case.line_num:
+        attributes.append(f"line=\"{test_case.line_num}\"")
+
+    children: List[str] = list()
+    message = quoteattr(test_case.result_message or "")
+    if test_case.result == TestResult.Fail:
+        children.append(f"<failure type=\"failure\" message={message} />")
+    elif test_case.result == TestResult.Skip:
+        children.append(f"<skipped type=\"skipped\" message={message} />")
+    if test_case.stdout is not None:
+        children.append(f"<system-out>{escape(test_case.stdout)}</system-out>")
+    if test_case.stderr is not None:
+        children.append(f"<system-err>{escape(test_case.stderr)}</system-err>")
+    return f"\t\t<testcase {' '.join(attributes)}>{''.join(children)}</testcase>\n" \
+        .encode("utf-8")
+
+
+class JUnitMerger:
+    """Merges test cases into a single JUnit XML report, with one test suite per test group and
+    board.
+
+    Test cases are deduplicated by their group, name and board, keeping the first one added. To
+    have newer results replace older ones, add the newest results first.
+    """
+
+    def __init__(self) -> None:
+        self._spool: IO[bytes] = tempfile.TemporaryFile()
+        self._spool_size = 0
+        self._seen: Set[_MergeKey] = set()
+        self._suites: Dict[Tuple[Optional[str], Optional[str]], SuiteStats] = dict()
+        self.duplicates = 0
+        """Number of test cases discarded as duplicates."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Removes the spooled test cases."""
+        self._spool.close()
+
+    @property
+    def suites(self) -> Dict[Tuple[Optional[str], Optional[str]], SuiteStats]:
+        """Statistics of each merged suite, keyed by group and board."""
+        return dict(self._suites)
+
+    def add(self, test_case: TestCase) -> bool:
+        """Adds a test case to the report.
+
+        :param test_case: The test case.
+        :returns: False if the test case was discarded as a duplicate.
+        """
+        board = board_of(test_case)
+        key = (test_case.group, test_case.name, board)
+        if key in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(key)
+
+        rendered = _render_test_case(test_case)
+        self._spool.write(rendered)
+        suite = self._suites.setdefault((test_case.group, board), SuiteStats())
+        suite.add(test_case, self._spool_size, len(rendered))
+        self._spool_size += len(rendered)
+        return True
+
+    def add_all(self, test_cases: Iterable[TestCase]) -> None:
+        """Adds each of the test cases to the report.
+
+        :param test_cases: The test cases.
+        """
+        for test_case in test_cases:
+            self.add(test_case)
+
+    def write(self, output: IO[bytes]) -> None:
+        """Writes the merged report.
+
+        :param output: Binary file to write the report to.
+        """
+        self._spool.flush()
+        totals = SuiteStats()
+        for suite in self._suites.values():
+            totals.tests += suite.tests
+            totals.failures += suite.failures
+            totals.skipped += suite.skipped
+            totals.time_s += suite.time_s
+
+        output.write(b"<?xml version=\"1.0\" encoding=\"utf-8\"?>\n")
+        output.write(f"<testsuites tests=\"{totals.tests}\" failures=\"{totals.failures}\" "
+                     f"errors=\"0\" skipped=\"{totals.skipped}\" "
+                     f"time=\"{totals.time_s:.6f}\">\n".encode("utf-8"))
+        for (group, board), suite in self._suites.items():
+            attributes = [f"name={quoteattr(group or '')}",
+                          f"tests=\"{suite.tests}\"",
+                          f"failures=\"{suite.failures}\"",
+                          "errors=\"0\"",
+                          f"skipped=\"{suite.skipped}\"",
+                          f"time=\"{suite.time_s:.6f}\""]
+            if board is not None:
+                attributes.append(f"hostname={quoteattr(board)}")
+            output.write(f"\t<testsuite {' '.join(attributes)}>\n".encode("utf-8"))
+            for idx in range(0, len(suite.offsets), 2):
+                self._spool.seek(suite.offsets[idx])
+                output.write(self._spool.read(suite.offsets[idx + 1]))
+            output.write(b"\t</testsuite>\n")
+        output.write(b"</testsuites>\n")
+        self._spool.seek(0, 2)
+
+
+def merge_results(input_paths: Iterable[Path], output_path: Path) -> JUnitMerger:
+    """Merges result files into a single JUnit XML report, see :func:`read_results` for the
+    supported formats. Duplicated test cases keep the result from the earliest file given.
+
+    :param input_paths: The result files to merge.
+    :param output_path: The report to write.
+    :returns: The merger, closed, which holds the statistics of the merged report.
+    """
+    with JUnitMerger() as merger:
+        for input_path in input_paths:
+            log.debug(f"Merging results from {input_path}.")
+            merger.add_all(read_results(input_path))
+        with open(output_path, "wb") as fo:
+            merger.write(fo)
+    return merger
+
+
+class MergeReporter(Reporter):
+    """Merges the results of the run with existing result files into a single JUnit XML report.
+    The results of the run take priority over those of the existing files. This reporter does
+    not affect the exit code."""
+
+    def __init__(self, file_path: Path, input_paths: Iterable[Path] = (),
+                 board: Optional[str] = None) -> None:
+        """
+        :param file_path: The report to write.
+        :param input_paths: Existing result files to merge with.
+        :param board: Board the run was on, used for test cases which do not specify a board.
+        """
+        self._file_path = file_path
+        self._input_paths = list(input_paths)
+        self._board = board
+
+    def __str__(self):
+        return f"Merge Reporter, file='{self._file_path}'"
+
+    def generate_report(self, test_cases: Iterable[TestCase]) -> int:
+        with JUnitMerger() as merger:
+            for test_case in test_cases:
+                if self._board is not None and BOARD_KEY not in test_case.extra:
+                    # the snapshot is shared with other reporters, so it is not modified
+                    test_case = replace(test_case,
+                                        extra={**test_case.extra, BOARD_KEY: self._board})
+                merger.add(test_case)
+            for input_path in self._input_paths:
+                merger.add_all(read_results(input_path))
+            with open(self._file_path, "wb") as fo:
+                merger.write(fo)
+        log.debug(f"Merged {sum(s.tests for s in merger.suites.values())} test cases, "
+                  f"discarding {merger.duplicates} duplicates.")
+        return 0
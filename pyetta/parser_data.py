@@ -1,8 +1,13 @@
 """pyetta defined test data format."""
-
-from dataclasses import dataclass, field
+import json
+import mmap
+import struct
+import sys
+from array import array
+from dataclasses import dataclass, field, asdict
 from enum import Enum
-from typing import Any, Dict, Optional
+from pathlib import Path
+from typing import Any, Dict, Optional, Iterable, List, Sequence, Union, Iterator, overload
 
 
 class TestResult(Enum):
@@ -24,3 +29,371 @@ class TestCase:
     stdout: Optional[str] = None
     stderr: Optional[str] = None
     result_message: Optional[str] = None
+
+
+def case_to_dict(test_case: TestCase) -> Dict[str, Any]:
+    """Converts a test case into a dictionary of JSON compatible types.
+
+    :param test_case: The test case to convert.
+    :returns: The test case as a dictionary, with the result stored as its value.
+    """
+    data = asdict(test_case)
+    data["result"] = test_case.result.value
+    return data
+
+
+def case_from_dict(data: Dict[str, Any]) -> TestCase:
+    """Creates a test case from a dictionary produced by :func:`case_to_dict`.
+
+    :param data: The dictionary to convert.
+    :returns: The test case.
+    """
+    data = dict(data)
+    data["result"] = TestResult(data["result"])
+    return TestCase(**data)
+
+
+# Packed format, all values little endian:
+#   header: magic, version, record count, string table offset
+#   records: fixed width, strings referenced by their index in the string table
+#   string table: string count, (count + 1) offsets into the blob, utf-8 blob
+_PACKED_MAGIC = b"PYTC"
+_PACKED_VERSION = 1
+_HEADER = struct.Struct("<4sHxxIQ")
+_RECORD = struct.Struct("<BiIIIddIIII")
+_STRING_COUNT = struct.Struct("<I")
+_STRING_OFFSET = struct.Struct("<Q")
+_NO_STRING = 0xFFFFFFFF
+_RESULTS = list(TestResult)
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.indexes: Dict[str, int] = dict()
+        self.strings: List[bytes] = list()
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NO_STRING
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.strings)
+            self.strings.append(value.encode("utf-8"))
+        return index
+
+    def pack(self) -> bytes:
+        offsets = [0]
+        for string in self.strings:
+            offsets.append(offsets[-1] + len(string))
+        return b"".join([_STRING_COUNT.pack(len(self.strings)),
+                         b"".join(_STRING_OFFSET.pack(offset) for offset in offsets),
+                         *self.strings])
+
+
+def pack_test_cases(test_cases: Iterable[TestCase]) -> bytes:
+    """Packs test cases into a compact binary format of fixed width records and a deduplicated
+    string table, readable with :class:`PackedTestCases` without any unpickling.
+
+    The ``extra`` of each test case is stored as JSON, so its keys become strings and values
+    which are not JSON compatible are stored as their string representation.
+
+    :param test_cases: The test cases to pack.
+    :returns: The packed test cases.
+    """
+    strings = _StringTable()
+    records = list()
+    for test_case in test_cases:
+        extra = json.dumps(test_case.extra, default=str) if len(test_case.extra) > 0 else None
+        records.append(_RECORD.pack(_RESULTS.index(test_case.result),
+                                    test_case.line_num,
+                                    strings.add(test_case.name),
+                                    strings.add(test_case.group),
+                                    strings.add(test_case.filepath),
+                                    test_case.runtime_s,
+                                    test_case.timestamp_s,
+                                    strings.add(test_case.stdout),
+                                    strings.add(test_case.stderr),
+                                    strings.add(test_case.result_message),
+                                    strings.add(extra)))
+    string_table_offset = _HEADER.size + _RECORD.size * len(records)
+    header = _HEADER.pack(_PACKED_MAGIC, _PACKED_VERSION, len(records), string_table_offset)
+    return b"".join([header, *records, strings.pack()])
+
+
+def write_packed_test_cases(file_path: Path, test_cases: Iterable[TestCase]) -> None:
+    """Writes test cases to a file in the packed format, see :func:`pack_test_cases`.
+
+    :param file_path: The file to write.
+    :param test_cases: The test cases to write.
+    """
+    with open(file_path, "wb") as fo:
+        fo.write(pack_test_cases(test_cases))
+
+
+class PackedTestCases(Sequence[TestCase]):
+    """A read only sequence of test cases over packed data, see :func:`pack_test_cases`.
+
+    Test cases are decoded from the underlying buffer as they are accessed, so the data can be
+    read directly from shared memory or a memory mapped file. The sequence can be passed to
+    reporters in place of a list of test cases.
+    """
+
+    _MAGIC = _PACKED_MAGIC
+    _VERSION = _PACKED_VERSION
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview, mmap.mmap]) -> None:
+        """
+        :param buffer: Buffer starting with the packed data. It may be larger than the data, such
+                       as shared memory rounded up to the page size.
+        """
+        self._buffer = memoryview(buffer)
+        self._mmap: Optional[mmap.mmap] = None
+        magic, version, self._count, self._strings_offset = \
+            _HEADER.unpack_from(self._buffer, 0)
+        if magic != self._MAGIC:
+            raise ValueError("Buffer does not contain packed test cases.")
+        if version != self._VERSION:
+            raise ValueError(f"Unsupported packed test case version {version}.")
+        self._string_count, = _STRING_COUNT.unpack_from(self._buffer, self._strings_offset)
+        self._blob_offset = self._strings_offset + _STRING_COUNT.size + \
+            _STRING_OFFSET.size * (self._string_count + 1)
+
+    @classmethod
+    def from_file(cls, file_path: Path) -> "PackedTestCases":
+        """Memory maps a file written by :func:`write_packed_test_cases`. The file remains mapped
+        until the sequence is closed.
+
+        :param file_path: The file to map.
+        """
+        with open(file_path, "rb") as fi:
+            mapped = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            packed = cls(mapped)
+        except Exception:
+            mapped.close()
+            raise
+        packed._mmap = mapped
+        return packed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Releases the underlying buffer. This must be called before closing the shared memory
+        the data is read from."""
+        self._buffer.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @overload
+    def __getitem__(self, index: int) -> TestCase: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[TestCase]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._read_record(idx) for idx in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("Packed test case index out of range.")
+        return self._read_record(index)
+
+    def __iter__(self) -> Iterator[TestCase]:
+        for index in range(self._count):
+            yield self._read_record(index)
+
+    def _read_string(self, index: int) -> Optional[str]:
+        if index == _NO_STRING:
+            return None
+        offset = self._strings_offset + _STRING_COUNT.size + _STRING_OFFSET.size * index
+        start, = _STRING_OFFSET.unpack_from(self._buffer, offset)
+        end, = _STRING_OFFSET.unpack_from(self._buffer, offset + _STRING_OFFSET.size)
+        return str(self._buffer[self._blob_offset + start:self._blob_offset + end], "utf-8")
+
+    def _read_record(self, index: int) -> TestCase:
+        result, line_num, name, group, filepath, runtime_s, timestamp_s, stdout, stderr, \
+            result_message, extra = _RECORD.unpack_from(self._buffer,
+                                                        _HEADER.size + _RECORD.size * index)
+        extra_json = self._read_string(extra)
+        return TestCase(name=self._read_string(name) or "",
+                        result=_RESULTS[result],
+                        group=self._read_string(group),
+                        filepath=self._read_string(filepath),
+                        extra=json.loads(extra_json) if extra_json is not None else dict(),
+                        line_num=line_num,
+                        runtime_s=runtime_s,
+                        timestamp_s=timestamp_s,
+                        stdout=self._read_string(stdout),
+                        stderr=self._read_string(stderr),
+                        result_message=self._read_string(result_message))
+
+
+# Columnar format, all values little endian:
+#   header: magic, version, row count, string table offset
+#   columns: each column's values contiguous, in the order of _COLUMNS, padded to 8 bytes
+#   string table: as the packed format, string columns hold indexes into it
+_COLUMNAR_MAGIC = b"PYCL"
+_COLUMNAR_VERSION = 1
+_COLUMNS = (("result", "B"), ("line_num", "i"), ("runtime_s", "d"), ("timestamp_s", "d"),
+            ("name", "I"), ("group", "I"), ("filepath", "I"), ("stdout", "I"), ("stderr", "I"),
+            ("result_message", "I"), ("extra", "I"))
+_STRING_COLUMNS = ("name", "group", "filepath", "stdout", "stderr", "result_message", "extra")
+
+COLUMN_NAMES = tuple(name for name, _ in _COLUMNS)
+"""Names of the columns of the columnar format, see :func:`pack_test_cases_columnar`."""
+
+
+def _padded(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def _column_offsets(count: int) -> Dict[str, int]:
+    offsets = dict()
+    offset = _HEADER.size
+    for name, code in _COLUMNS:
+        offsets[name] = offset
+        offset += _padded(struct.calcsize(code) * count)
+    offsets[""] = offset
+    return offsets
+
+
+def pack_test_cases_columnar(test_cases: Iterable[TestCase]) -> bytes:
+    """Packs test cases into a compact columnar format, where the values of each field are
+    stored together as a typed column, with strings deduplicated into a string table. Readable
+    with :class:`ColumnarTestCases`, which can load whole columns without decoding any test
+    cases, such as to count results across many runs.
+
+    The ``extra`` of each test case is stored as JSON, as with :func:`pack_test_cases`.
+
+    :param test_cases: The test cases to pack.
+    :returns: The packed test cases.
+    """
+    strings = _StringTable()
+    columns = {name: array(code) for name, code in _COLUMNS}
+    for test_case in test_cases:
+        extra = json.dumps(test_case.extra, default=str) if len(test_case.extra) > 0 else None
+        columns["result"].append(_RESULTS.index(test_case.result))
+        columns["line_num"].append(test_case.line_num)
+        columns["runtime_s"].append(test_case.runtime_s)
+        columns["timestamp_s"].append(test_case.timestamp_s)
+        for name in _STRING_COLUMNS:
+            value = extra if name == "extra" else getattr(test_case, name)
+            columns[name].append(strings.add(value))
+
+    count = len(columns["result"])
+    offsets = _column_offsets(count)
+    chunks = [_HEADER.pack(_COLUMNAR_MAGIC, _COLUMNAR_VERSION, count, offsets[""])]
+    for name, _ in _COLUMNS:
+        column = columns[name]
+        if sys.byteorder == "big":
+            column.byteswap()
+        data = column.tobytes()
+        chunks.append(data + bytes(_padded(len(data)) - len(data)))
+    chunks.append(strings.pack())
+    return b"".join(chunks)
+
+
+def write_columnar_test_cases(file_path: Path, test_cases: Iterable[TestCase]) -> None:
+    """Writes test cases to a file in the columnar format, see :func:`pack_test_cases_columnar`.
+
+    :param file_path: The file to write.
+    :param test_cases: The test cases to write.
+    """
+    with open(file_path, "wb") as fo:
+        fo.write(pack_test_cases_columnar(test_cases))
+
+
+class ColumnarTestCases(PackedTestCases):
+    """A read only sequence of test cases over columnar data, see
+    :func:`pack_test_cases_columnar`. Like :class:`PackedTestCases`, test cases are decoded as
+    they are accessed, and whole columns can be read with :meth:`column`.
+    """
+
+    _MAGIC = _COLUMNAR_MAGIC
+    _VERSION = _COLUMNAR_VERSION
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview, mmap.mmap]) -> None:
+        super(ColumnarTestCases, self).__init__(buffer)
+        self._offsets = _column_offsets(self._count)
+
+    def column(self, name: str) -> array:
+        """Reads the values of a column. String columns hold indexes into the string table, see
+        :meth:`string_column` to read their strings.
+
+        :param name: The column, one of :data:`COLUMN_NAMES`.
+        :returns: The values of the column, in test case order. Results are stored as their
+                  index in :class:`TestResult`.
+        """
+        code = dict(_COLUMNS)[name]
+        start = self._offsets[name]
+        values = array(code)
+        values.frombytes(self._buffer[start:start + struct.calcsize(code) * self._count])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def string_column(self, name: str) -> List[Optional[str]]:
+        """Reads the strings of a string column, each distinct string decoded once.
+
+        :param name: The column, such as ``name`` or ``group``.
+        :returns: The strings of the column, in test case order.
+        """
+        if name not in _STRING_COLUMNS:
+            raise ValueError(f"Column '{name}' does not hold strings.")
+        decoded: Dict[int, Optional[str]] = dict()
+        values = list()
+        for index in self.column(name):
+            if index not in decoded:
+                decoded[index] = self._read_string(index)
+            values.append(decoded[index])
+        return values
+
+    def results(self) -> List[TestResult]:
+        """Reads the result of each test case."""
+        return [_RESULTS[index] for index in self.column("result")]
+
+    def _read_record(self, index: int) -> TestCase:
+        values = dict()
+        for name, code in _COLUMNS:
+            values[name], = struct.unpack_from(f"<{code}", self._buffer,
+                                               self._offsets[name] + struct.calcsize(code) * index)
+        extra_json = self._read_string(values["extra"])
+        return TestCase(name=self._read_string(values["name"]) or "",
+                        result=_RESULTS[values["result"]],
+                        group=self._read_string(values["group"]),
+                        filepath=self._read_string(values["filepath"]),
+                        extra=json.loads(extra_json) if extra_json is not None else dict(),
+                        line_num=values["line_num"],
+                        runtime_s=values["runtime_s"],
+                        timestamp_s=values["timestamp_s"],
+                        stdout=self._read_string(values["stdout"]),
+                        stderr=self._read_string(values["stderr"]),
+                        result_message=self._read_string(values["result_message"]))
+
+
+def share_test_cases(test_cases: Iterable[TestCase]) -> Any:
+    """Packs test cases into a new block of shared memory, which other processes can read by
+    attaching to it by name and wrapping its buffer in :class:`PackedTestCases`.
+
+    The caller owns the shared memory, and must close and unlink it once it is no longer
+    needed.
+
+    :param test_cases: The test cases to share.
+    :returns: The :class:`multiprocessing.shared_memory.SharedMemory` holding the data.
+    """
+    # only available from python 3.8
+    from multiprocessing import shared_memory
+
+    data = pack_test_cases(test_cases)
+    memory = shared_memory.SharedMemory(create=True, size=len(data))
+    memory.buf[:len(data)] = data
+    return memory
@@ -1,10 +1,15 @@
+import dataclasses
 import logging
 import re
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from dataclasses import dataclass, field
 from enum import IntEnum
-from typing import Optional, List
+from typing import Optional, List, Callable, Dict, Tuple, Any, Mapping, Sequence
 
-from pyetta.parser_data import TestCase, TestResult
+from pyetta.parser_data import TestCase, TestResult, pack_test_cases, PackedTestCases
 
 log = logging.getLogger('pyetta.parsers')
 
@@ -50,6 +55,15 @@ class Parser(ABC):
                   the test suites).
         """
 
+    def is_final_chunk(self, data_chunk: bytes) -> bool:
+        """Checks if a chunk is the final output of the test runner, without parsing it. Used by
+        :class:`ParallelParser` to detect completion as soon as the final chunk arrives.
+
+        :param data_chunk: The chunk to check.
+        :returns: True if the chunk ends the output. Defaults to False if unknown.
+        """
+        return False
+
     @property
     def test_cases(self) -> List[TestCase]:
         """The parsed test cases up to this point. Note this may be incomplete
@@ -74,6 +88,73 @@ class Parser(ABC):
         self._test_cases.append(test_case)
 
 
+class OutputContext:
+    """Ring buffer of the most recent output lines, bounded by both a number of lines and a
+    number of bytes, so chatty firmware cannot grow it without limit. Lines are kept undecoded
+    until they are taken."""
+
+    def __init__(self, max_lines: int, max_bytes: int) -> None:
+        """
+        :param max_lines: Maximum number of lines kept.
+        :param max_bytes: Maximum total size of the lines kept. A single longer line only keeps
+                          its end.
+        """
+        if max_lines < 1 or max_bytes < 1:
+            raise ValueError("OutputContext requires at least 1 line and 1 byte.")
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self._lines: "deque[bytes]" = deque()
+        self._size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    @property
+    def size_bytes(self) -> int:
+        """Total size of the lines kept."""
+        return self._size_bytes
+
+    def append(self, line: bytes) -> None:
+        """Adds a line, evicting the oldest lines beyond the bounds.
+
+        :param line: The line, without its line ending.
+        """
+        if len(line) > self.max_bytes:
+            line = line[-self.max_bytes:]
+        while len(self._lines) >= self.max_lines or \
+                (len(self._lines) > 0 and self._size_bytes + len(line) > self.max_bytes):
+            self._size_bytes -= len(self._lines.popleft())
+        self._lines.append(line)
+        self._size_bytes += len(line)
+
+    def clear(self) -> None:
+        """Discards the lines kept."""
+        self._lines.clear()
+        self._size_bytes = 0
+
+    def take(self, encoding: str) -> Optional[str]:
+        """Takes the lines kept, clearing the buffer.
+
+        :param encoding: Encoding of the lines, invalid bytes are replaced.
+        :returns: The decoded lines joined by line feeds, or None if there are none.
+        """
+        if len(self._lines) == 0:
+            return None
+        text = "\n".join(line.decode(encoding, "replace").strip() for line in self._lines)
+        self.clear()
+        return text
+
+
+def _is_ascii_compatible(encoding: str) -> bool:
+    """Checks if an encoding encodes ASCII characters as their ASCII bytes, allowing the raw bytes
+    to be matched against ASCII patterns before decoding."""
+    sample = "/:_ azAZ09"
+    try:
+        return sample.encode(encoding) == sample.encode("ascii")
+    except (LookupError, UnicodeError):
+        return False
+
+
 class UnityParser(Parser):
 
     REGEX_TEST = re.compile(r"^(?P<file_path>.*?):"
@@ -82,26 +163,53 @@ class UnityParser(Parser):
                             r"(?P<test_result>FAIL|IGNORE|PASS)"
                             r"(?::(?P<test_message>.*?))?$")
     REGEX_FINAL_LINE = re.compile(r"^(OK|FAIL)")
+    REGEX_TEST_BYTES = re.compile(REGEX_TEST.pattern.encode("ascii"))
+    REGEX_FINAL_LINE_BYTES = re.compile(REGEX_FINAL_LINE.pattern.encode("ascii"))
+
+    ERROR_MODES = ("strict", "replace", "skip")
+    """Supported handling of lines which cannot be decoded."""
 
     class _ParserState(IntEnum):
         """Tracks the state of the unity parser."""
         STARTING = 0
         DONE = 1
 
-    def __init__(self, name: Optional[str] = None, encoding: str = 'ascii'):
+    def __init__(self, name: Optional[str] = None, encoding: str = 'ascii',
+                 errors: str = 'strict', context_lines: int = 0, context_bytes: int = 4096):
         """A basic parser for the unity unit testing program.
 
+        For encodings which are a superset of ASCII, such as UTF-8, lines are matched as bytes and
+        only the lines containing test results are decoded. Other encodings decode every line.
+
         :param name: Name of the test suite to create if test cases are found outside test suites.
         :param encoding: The encoding the input is in (allows for correct decoding).
+        :param errors: How lines which cannot be decoded are handled, one of
+                       :attr:`ERROR_MODES`. ``strict`` stops the parser with a parser error,
+                       ``replace`` replaces the invalid bytes and ``skip`` discards the line. The
+                       number of lines replaced or skipped is logged as a warning once the
+                       parser is done.
+        :param context_lines: Maximum number of output lines preceding a failed test's result
+                              kept in its ``stdout``, before the result line. The output
+                              preceding other results is dropped. Set to 0 to only keep the
+                              result line.
+        :param context_bytes: Maximum total size of the output lines kept for a failed test.
         """
         super(UnityParser, self).__init__()
+        if errors not in UnityParser.ERROR_MODES:
+            raise ValueError(f"Unsupported decode error handling '{errors}'.")
         self._name = name
         self._encoding = encoding
+        self._errors = errors
+        self._match_bytes = _is_ascii_compatible(encoding)
         self._state = UnityParser._ParserState.STARTING
         self._default_test_group = name
+        self._context = OutputContext(context_lines, context_bytes) if context_lines > 0 \
+            else None
+        self.decode_errors = 0
+        """Number of lines which were replaced or skipped due to decode errors."""
 
     def __str__(self):
-        return f"{self.__name__}"
+        return self.__class__.__name__
 
     @property
     def done(self) -> bool:
@@ -119,23 +227,83 @@ class UnityParser(Parser):
 
     def feed_data(self, data_chunk: bytes) -> None:
         try:
-            line = data_chunk.decode(self._encoding).strip()
-            if UnityParser.REGEX_TEST.match(line):
-                match_dict = UnityParser.REGEX_TEST.match(line).groupdict()
-                test_case = TestCase(name=match_dict["test_name"],
-                                     result=self._from_unity_result(match_dict["test_result"]),
-                                     filepath=match_dict["file_path"],
-                                     line_num=int(match_dict["line_no"]),
-                                     stdout=line.strip().strip('\n'),
-                                     result_message=match_dict.get("test_message", None))
-                self._test_cases.append(test_case)
-
-            elif UnityParser.REGEX_FINAL_LINE.match(line):
-                self._transition_state(UnityParser._ParserState.DONE)
+            if self._match_bytes:
+                self._feed_bytes(data_chunk.strip())
+            else:
+                self._feed_line(data_chunk)
         except Exception as ec:
             self._add_parser_error(f"{ec.__class__.__name__} raised with message: {ec}.")
             self._transition_state(UnityParser._ParserState.DONE)
 
+    def _feed_line(self, data_chunk: bytes) -> None:
+        try:
+            line = data_chunk.decode(self._encoding).strip()
+        except UnicodeDecodeError:
+            if self._errors == "strict":
+                raise
+            self.decode_errors += 1
+            if self._errors == "skip":
+                return
+            line = data_chunk.decode(self._encoding, "replace").strip()
+
+        match = UnityParser.REGEX_TEST.match(line)
+        if match is not None:
+            self._add_test_case(match.groupdict(), line)
+        elif UnityParser.REGEX_FINAL_LINE.match(line):
+            self._transition_state(UnityParser._ParserState.DONE)
+        elif self._context is not None and len(line) > 0:
+            self._context.append(data_chunk.strip())
+
+    def _feed_bytes(self, line: bytes) -> None:
+        match = UnityParser.REGEX_TEST_BYTES.match(line)
+        if match is not None:
+            try:
+                fields, stdout = self._decode_match(match, line, "strict")
+            except UnicodeDecodeError:
+                if self._errors == "strict":
+                    raise
+                self.decode_errors += 1
+                if self._errors == "skip":
+                    return
+                fields, stdout = self._decode_match(match, line, "replace")
+            self._add_test_case(fields, stdout)
+        elif UnityParser.REGEX_FINAL_LINE_BYTES.match(line):
+            self._transition_state(UnityParser._ParserState.DONE)
+        elif self._context is not None and len(line) > 0:
+            self._context.append(line)
+
+    def _decode_match(self, match: "re.Match[bytes]", line: bytes,
+                      errors: str) -> Tuple[Dict[str, Optional[str]], str]:
+        fields = {key: None if value is None else value.decode(self._encoding, errors)
+                  for key, value in match.groupdict().items()}
+        return fields, line.decode(self._encoding, errors)
+
+    def _add_test_case(self, fields: Dict[str, Optional[str]], line: str) -> None:
+        result = self._from_unity_result(fields["test_result"])
+        stdout = line
+        if self._context is not None and result == TestResult.Fail:
+            context = self._context.take(self._encoding)
+            if context is not None:
+                stdout = f"{context}\n{line}"
+        elif self._context is not None:
+            self._context.clear()
+        test_case = TestCase(name=fields["test_name"],
+                             result=result,
+                             filepath=fields["file_path"],
+                             line_num=int(fields["line_no"]),
+                             stdout=stdout,
+                             result_message=fields.get("test_message", None))
+        self._test_cases.append(test_case)
+
+    def is_final_chunk(self, data_chunk: bytes) -> bool:
+        line = data_chunk.strip()
+        if self._match_bytes:
+            return UnityParser.REGEX_FINAL_LINE_BYTES.match(line) is not None
+        try:
+            return UnityParser.REGEX_FINAL_LINE.match(line.decode(self._encoding)) is not None
+        except UnicodeDecodeError:
+            return False
+
     def stop(self, forced: bool = False) -> None:
         if self._state != UnityParser._ParserState.DONE:
             self._transition_state(UnityParser._ParserState.DONE)
@@ -148,3 +316,498 @@ class UnityParser(Parser):
             log.debug(
                 f"State transition from {self._state} -> {new_state}.")
             self._state = new_state
+            if new_state == UnityParser._ParserState.DONE and self.decode_errors > 0:
+                action = "replaced" if self._errors == "replace" else "skipped"
+                log.warning(f"{self.decode_errors} lines could not be decoded as "
+                            f"{self._encoding} and were {action}.")
+
+
+RULE_ACTIONS = ("test", "fields", "state", "error", "done")
+"""Actions of a :class:`LineRule`.
+
+- ``test`` adds a test case built from the matched fields.
+- ``fields`` stores the matched fields, which are added to the next test case.
+- ``state`` only transitions to the rule's ``next_state``.
+- ``error`` adds a parser error, with the ``result_message`` field or the line as its message.
+- ``done`` completes the parser.
+"""
+
+TEST_CASE_FIELDS = ("name", "result", "group", "filepath", "line_num", "runtime_s",
+                    "result_message")
+"""Test case fields a rule can set, by naming a group of its pattern after the field."""
+
+
+@dataclass(frozen=True)
+class LineRule:
+    """A line pattern of a :class:`TableParser`, and what to do when a line matches it."""
+
+    pattern: str
+    """Regular expression matched against the start of each line, with surrounding whitespace
+    removed. Named groups set the test case field of the same name, see
+    :data:`TEST_CASE_FIELDS` and :attr:`fields`."""
+    action: str = "test"
+    """One of :data:`RULE_ACTIONS`."""
+    states: Tuple[str, ...] = ()
+    """States in which the rule applies, all states if empty."""
+    next_state: Optional[str] = None
+    """State to transition to after the action, if any."""
+    result: Optional[TestResult] = None
+    """Result of the test cases added, if not given by a ``result`` group."""
+    results: Mapping[str, TestResult] = field(default_factory=dict)
+    """Maps the text matched by the ``result`` group to the test result. Unknown text is a
+    failure."""
+    fields: Mapping[str, str] = field(default_factory=dict)
+    """Maps the names of groups to test case fields, for groups not named after their field."""
+    time_scale: float = 1.0
+    """Multiplier converting the ``runtime_s`` group to seconds, such as 0.001 for
+    milliseconds."""
+
+
+class _RuleTable:
+    """The rules of a :class:`TableParser`, compiled into a single alternation per state."""
+
+    _GROUP_NAME = re.compile(r"\(\?P([<=])(\w+)")
+
+    def __init__(self, rules: Sequence[LineRule], match_bytes: bool) -> None:
+        for rule in rules:
+            if rule.action not in RULE_ACTIONS:
+                raise ValueError(f"Unsupported rule action '{rule.action}'.")
+        self.rules = list(rules)
+        # groups of each rule are prefixed with the rule's index, keeping them unique within
+        # the alternation, and the whole rule is wrapped in a group identifying it
+        self._alternatives: List[str] = list()
+        for idx, rule in enumerate(self.rules):
+            renamed = self._GROUP_NAME.sub(rf"(?P\1r{idx}_\2", rule.pattern)
+            self._alternatives.append(f"(?P<r{idx}>{renamed})")
+        self._fields: List[List[Tuple[str, str]]] = list()
+        for idx, rule in enumerate(self.rules):
+            names = re.compile(rule.pattern).groupindex.keys()
+            self._fields.append([(f"r{idx}_{name}", rule.fields.get(name, name))
+                                 for name in names])
+        self.match_bytes = match_bytes
+        self._patterns: Dict[str, Any] = dict()
+        self.final = self._compile([idx for idx, rule in enumerate(self.rules)
+                                    if rule.action == "done" and len(rule.states) == 0])
+
+    def _compile(self, indexes: List[int]) -> Any:
+        if len(indexes) == 0:
+            return None
+        pattern = "|".join(self._alternatives[idx] for idx in indexes)
+        return re.compile(pattern.encode("ascii") if self.match_bytes else pattern)
+
+    def pattern(self, state: str) -> Any:
+        """Gets the combined pattern of the rules applying in a state, or None if there are
+        none."""
+        if state not in self._patterns:
+            self._patterns[state] = self._compile(
+                [idx for idx, rule in enumerate(self.rules)
+                 if len(rule.states) == 0 or state in rule.states])
+        return self._patterns[state]
+
+    def dispatch(self, match: Any) -> Tuple[LineRule, Dict[str, Any]]:
+        """Gets the rule which matched, and the matched value of each of its fields."""
+        idx = int(match.lastgroup[1:])
+        return self.rules[idx], {field_name: match.group(group)
+                                 for group, field_name in self._fields[idx]}
+
+
+class TableParser(Parser):
+    """Parser driven by a table of :class:`LineRule`, for test frameworks printing one result
+    per line.
+
+    The rules applying in the current state are compiled into a single regular expression, an
+    alternation of all their patterns, so each line is dispatched to its rule in a single match.
+    Rules are tried in order, the first matching rule wins. Lines matching no rule are ignored.
+
+    Subclasses declare their :attr:`RULES`, and may override :meth:`_on_match` for behaviour
+    the rules cannot express. Rules with states rely on the lines before them, so parsers using
+    them cannot be wrapped by :class:`ParallelParser`, which parses each batch independently.
+
+    For encodings which are a superset of ASCII, and rules with ASCII patterns, lines are
+    matched as bytes and only the matched fields are decoded. Note ``\\w`` and similar classes
+    then only match ASCII characters.
+    """
+
+    RULES: Sequence[LineRule] = ()
+    """Rules of the parser."""
+    INITIAL_STATE = "start"
+    """State the parser starts in."""
+    DONE_STATE = "done"
+    """State of a completed parser, transitioned to by the ``done`` action."""
+
+    ERROR_MODES = ("strict", "replace", "skip")
+    """Supported handling of lines which cannot be decoded."""
+
+    _TABLES: Dict[Tuple[type, bool], _RuleTable] = dict()
+
+    def __init__(self, name: Optional[str] = None, encoding: str = 'ascii',
+                 errors: str = 'strict', rules: Optional[Sequence[LineRule]] = None):
+        """
+        :param name: Group of the test cases whose rule does not match a group.
+        :param encoding: The encoding the input is in.
+        :param errors: How lines which cannot be decoded are handled, see
+                       :class:`UnityParser`.
+        :param rules: Rules used instead of the class's :attr:`RULES`.
+        """
+        super(TableParser, self).__init__()
+        if errors not in TableParser.ERROR_MODES:
+            raise ValueError(f"Unsupported decode error handling '{errors}'.")
+        self._name = name
+        self._encoding = encoding
+        self._errors = errors
+        self._table = self._rule_table(rules, _is_ascii_compatible(encoding))
+        self._state = self.INITIAL_STATE
+        self._pending: Dict[str, Any] = dict()
+        self.decode_errors = 0
+        """Number of lines which were replaced or skipped due to decode errors."""
+
+    def __str__(self):
+        return self.__class__.__name__
+
+    def _rule_table(self, rules: Optional[Sequence[LineRule]], match_bytes: bool) -> _RuleTable:
+        if rules is not None:
+            return self._compile_rules(rules, match_bytes)
+        key = (self.__class__, match_bytes)
+        table = TableParser._TABLES.get(key)
+        if table is None:
+            table = TableParser._TABLES[key] = self._compile_rules(self.RULES, match_bytes)
+        return table
+
+    @staticmethod
+    def _compile_rules(rules: Sequence[LineRule], match_bytes: bool) -> _RuleTable:
+        if match_bytes:
+            try:
+                return _RuleTable(rules, match_bytes=True)
+            except UnicodeEncodeError:
+                log.debug("Rules are not ASCII, matching decoded lines.")
+        return _RuleTable(rules, match_bytes=False)
+
+    @property
+    def done(self) -> bool:
+        return self._state == self.DONE_STATE
+
+    @property
+    def state(self) -> str:
+        """The current state of the parser."""
+        return self._state
+
+    def feed_data(self, data_chunk: bytes) -> None:
+        if self.done:
+            return
+        try:
+            self._feed_line(data_chunk.strip())
+        except Exception as ec:
+            self._add_parser_error(f"{ec.__class__.__name__} raised with message: {ec}.")
+            self._transition_state(self.DONE_STATE)
+
+    def _feed_line(self, data: bytes) -> None:
+        pattern = self._table.pattern(self._state)
+        if pattern is None:
+            return
+        if self._table.match_bytes:
+            match = pattern.match(data)
+            if match is None:
+                return
+            line = self._decode(data)
+            if line is None:
+                return
+            rule, fields = self._table.dispatch(match)
+            fields = {key: None if value is None else value.decode(self._encoding, "replace")
+                      for key, value in fields.items()}
+        else:
+            line = self._decode(data)
+            if line is None:
+                return
+            match = pattern.match(line)
+            if match is None:
+                return
+            rule, fields = self._table.dispatch(match)
+        self._on_match(rule, fields, line)
+
+    def _decode(self, data: bytes) -> Optional[str]:
+        try:
+            return data.decode(self._encoding)
+        except UnicodeDecodeError:
+            if self._errors == "strict":
+                raise
+            self.decode_errors += 1
+            if self._errors == "skip":
+                return None
+            return data.decode(self._encoding, "replace")
+
+    def _on_match(self, rule: LineRule, fields: Dict[str, Optional[str]], line: str) -> None:
+        """Performs the action of a matched rule, then transitions to its next state.
+
+        :param rule: The matched rule.
+        :param fields: The value matched by each named group of the rule, keyed by field name.
+        :param line: The matched line.
+        """
+        if rule.action == "test":
+            self._test_cases.append(self._create_test_case(rule, fields, line))
+        elif rule.action == "fields":
+            self._pending.update((key, value) for key, value in fields.items()
+                                 if value is not None)
+        elif rule.action == "error":
+            self._add_parser_error(fields.get("result_message") or line)
+        if rule.action == "done":
+            self._transition_state(self.DONE_STATE)
+        elif rule.next_state is not None:
+            self._transition_state(rule.next_state)
+
+    def _create_test_case(self, rule: LineRule, fields: Dict[str, Optional[str]],
+                          line: str) -> TestCase:
+        values: Dict[str, Any] = dict(self._pending)
+        values.update((key, value) for key, value in fields.items() if value is not None)
+        self._pending.clear()
+
+        result = values.pop("result", None)
+        if result is not None:
+            result = rule.results.get(result, TestResult.Fail)
+        else:
+            result = rule.result if rule.result is not None else TestResult.Fail
+        values = {key: value for key, value in values.items() if key in TEST_CASE_FIELDS}
+        if "line_num" in values:
+            values["line_num"] = int(values["line_num"])
+        if "runtime_s" in values:
+            values["runtime_s"] = float(values["runtime_s"]) * rule.time_scale
+        values.setdefault("group", self._name)
+        return TestCase(result=result, stdout=line, **values)
+
+    def is_final_chunk(self, data_chunk: bytes) -> bool:
+        if self._table.final is None:
+            return False
+        line = data_chunk.strip()
+        if not self._table.match_bytes:
+            try:
+                line = line.decode(self._encoding)
+            except UnicodeDecodeError:
+                return False
+        return self._table.final.match(line) is not None
+
+    def stop(self, forced: bool = False) -> None:
+        if not self.done:
+            self._transition_state(self.DONE_STATE)
+            if forced:
+                self._add_parser_error("Parser stopped before unit test output stopped.")
+
+    def _transition_state(self, new_state: str) -> None:
+        if new_state != self._state:
+            log.debug(f"State transition from {self._state} -> {new_state}.")
+            self._state = new_state
+            if new_state == self.DONE_STATE and self.decode_errors > 0:
+                action = "replaced" if self._errors == "replace" else "skipped"
+                log.warning(f"{self.decode_errors} lines could not be decoded as "
+                            f"{self._encoding} and were {action}.")
+
+
+class GoogleTestParser(TableParser):
+    """Parser for the output of GoogleTest. Test cases are grouped by their test suite, and
+    the location of the first failure within a test is kept."""
+
+    RULES = (
+        LineRule(r"\[\s*(?P<result>OK|FAILED|SKIPPED)\s*\] (?P<group>[\w/]+)\."
+                 r"(?P<name>[\w/]+)(?:, where .*?)? \((?P<runtime_s>\d+) ms\)",
+                 results={"OK": TestResult.Pass, "FAILED": TestResult.Fail,
+                          "SKIPPED": TestResult.Skip},
+                 time_scale=1e-3),
+        LineRule(r"(?P<filepath>[^\s\[].*?):(?P<line_num>\d+): Failure", action="fields"),
+        LineRule(r"\[=+\] \d+ tests? from \d+ test (?:suites?|cases?) ran", action="done"),
+    )
+
+
+class CppUTestParser(TableParser):
+    """Parser for the verbose (``-v``) output of CppUTest. Failures are taken from the failure
+    message, as the timing of a failed test is printed on a later line."""
+
+    RULES = (
+        LineRule(r"TEST\((?P<group>\w+), (?P<name>\w+)\) - (?P<runtime_s>\d+) ms$",
+                 result=TestResult.Pass, time_scale=1e-3),
+        LineRule(r"IGNORE_TEST\((?P<group>\w+), (?P<name>\w+)\)", result=TestResult.Skip),
+        LineRule(r"(?P<filepath>.+?):(?P<line_num>\d+): error: Failure in "
+                 r"TEST\((?P<group>\w+), (?P<name>\w+)\)", result=TestResult.Fail),
+        LineRule(r"(?:OK|Errors) \(\d+ (?:tests?|failures?), ", action="done"),
+    )
+
+
+class TapParser(TableParser):
+    """Parser for the Test Anything Protocol. ``SKIP`` and ``TODO`` directives are reported as
+    skipped tests. The parser completes once the number of tests in the plan have been seen, or
+    on a plan following the tests."""
+
+    RULES = (
+        LineRule(r"(?P<result>not ok|ok)\b\s*(?P<number>\d+)?\s*(?:-\s*)?"
+                 r"(?P<name>[^#]*?)\s*(?:#\s*(?P<directive>[A-Za-z]+)\b\s*"
+                 r"(?P<result_message>.*))?$",
+                 results={"ok": TestResult.Pass, "not ok": TestResult.Fail},
+                 next_state="testing"),
+        LineRule(r"1\.\.(?P<count>\d+)", action="done", states=("testing",)),
+        LineRule(r"1\.\.(?P<count>\d+)", action="state", next_state="planned"),
+        LineRule(r"Bail out!\s*(?P<result_message>.*)", action="error", next_state="done"),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(TapParser, self).__init__(*args, **kwargs)
+        self._planned: Optional[int] = None
+        self._tests = 0
+
+    def _on_match(self, rule: LineRule, fields: Dict[str, Optional[str]], line: str) -> None:
+        if rule.action == "state":
+            self._planned = int(fields["count"] or 0)
+        directive = (fields.pop("directive", None) or "").upper()
+        number = fields.pop("number", None)
+        if rule.action == "test" and not fields.get("name"):
+            # unnamed tests are identified by their number
+            fields["name"] = number or str(self._tests + 1)
+        if directive in ("SKIP", "TODO"):
+            rule = dataclasses.replace(rule, result=TestResult.Skip, results=dict())
+            fields.pop("result", None)
+        elif rule.action == "test":
+            fields["result_message"] = None
+        if rule.action == "test":
+            self._tests += 1
+        super(TapParser, self)._on_match(rule, fields, line)
+        if self._planned is not None and self._tests >= self._planned:
+            self._transition_state(self.DONE_STATE)
+
+
+def _parse_batch(parser_factory: Callable[[], Parser],
+                 chunks: List[bytes]) -> Tuple[bytes, bool]:
+    """Parses a batch of chunks within a worker process using a new parser instance.
+
+    :returns: The parsed test cases packed by :func:`pyetta.parser_data.pack_test_cases`, which
+              is far cheaper to send back than pickled test cases, and if the parser completed
+              within the batch.
+    """
+    parser = parser_factory()
+    for chunk in chunks:
+        parser.feed_data(chunk)
+        if parser.done:
+            break
+    return pack_test_cases(parser.test_cases), parser.done
+
+
+class ParallelParser(Parser):
+
+    def __init__(self, parser_factory: Callable[[], Parser], workers: int = 2,
+                 batch_size: int = 256, flush_interval_s: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic):
+        """Shards the incoming chunks across a pool of worker processes, each running its own
+        instance of a parser. Intended for CPU heavy parsers, where the parsing of a single
+        chunk would otherwise block the collection.
+
+        Chunks are grouped into batches, each tagged with a sequence number. Every batch is
+        parsed by a new parser instance, and the results are merged back in sequence order.
+        Because of this, the wrapped parser must not carry state between chunks other than its
+        test cases and completion.
+
+        The worker processes are started with the first batch, and shut down once the parser is
+        done, so parsers created for each run do not need to be closed.
+
+        A batch is sent once it is full, or once its oldest chunk has waited for
+        ``flush_interval_s``, so results keep arriving when the output is slow. When a chunk is
+        the final output, checked with :meth:`Parser.is_final_chunk` of a parser created from
+        the factory, the partial batch is sent immediately and its results are awaited, so the
+        parser completes without waiting for the collector to time out.
+
+        :param parser_factory: Picklable callable creating the parser to run in the workers.
+        :param workers: Number of worker processes.
+        :param batch_size: Maximum number of chunks sent to a worker at a time.
+        :param flush_interval_s: Maximum time a chunk waits before its batch is sent.
+        :param clock: Monotonic clock, in seconds.
+        """
+        super(ParallelParser, self).__init__()
+        if workers < 1:
+            raise ValueError("ParallelParser requires at least 1 worker.")
+        if batch_size < 1:
+            raise ValueError("ParallelParser requires a batch size of at least 1.")
+        self._parser_factory = parser_factory
+        self._final_chunk_parser = parser_factory()
+        self._workers = workers
+        self._batch_size = batch_size
+        self._flush_interval_s = flush_interval_s
+        self._clock = clock
+        self._batch_start = 0.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._batch: List[bytes] = list()
+        self._pending: Dict[int, Future] = dict()
+        self._next_sequence = 0
+        self._merge_sequence = 0
+        self._done = False
+
+    def __str__(self):
+        return f"Parallel Parser, workers={self._workers}, batch_size={self._batch_size}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Shuts down the worker processes."""
+        if self._executor is not None:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed_data(self, data_chunk: bytes) -> None:
+        if self._done:
+            return
+        if len(self._batch) == 0:
+            self._batch_start = self._clock()
+        self._batch.append(data_chunk)
+        if self._final_chunk_parser.is_final_chunk(data_chunk):
+            self._submit_batch()
+            self._merge_results(wait=True)
+            return
+        if len(self._batch) >= self._batch_size or \
+                self._clock() - self._batch_start >= self._flush_interval_s:
+            self._submit_batch()
+        self._merge_results(wait=False)
+
+    def stop(self, forced: bool = False) -> None:
+        if self._done:
+            return
+        self._submit_batch()
+        self._merge_results(wait=True)
+        if not self._done:
+            self._done = True
+            if forced:
+                self._add_parser_error("Parser stopped before unit test output stopped.")
+        self.close()
+
+    def _submit_batch(self) -> None:
+        if len(self._batch) == 0:
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        self._pending[self._next_sequence] = self._executor.submit(
+            _parse_batch, self._parser_factory, self._batch)
+        self._next_sequence += 1
+        self._batch = list()
+
+    def _merge_results(self, wait: bool) -> None:
+        while not self._done and self._merge_sequence in self._pending:
+            future = self._pending[self._merge_sequence]
+            if not wait and not future.done():
+                break
+            del self._pending[self._merge_sequence]
+            self._merge_sequence += 1
+            try:
+                packed, done = future.result()
+            except Exception as ec:
+                self._add_parser_error(f"{ec.__class__.__name__} raised with message: {ec}.")
+                done = True
+            else:
+                self._test_cases.extend(PackedTestCases(packed))
+
+            if done:
+                log.debug("Parallel parser done, discarding remaining batches.")
+                self._done = True
+                self.close()
@@ -0,0 +1,404 @@
+"""The execution engine of pyetta, which runs a loader, collector, parser and reporters as a
+pipeline. This is used by the CLI, but can also be embedded directly within other tools, such as
+test harnesses, without any of the CLI's overhead.
+"""
+import contextlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, List, Callable, Iterable, Tuple
+
+from pyetta.collectors import Collector
+from pyetta.crash import CrashDetector
+from pyetta.loaders import Loader
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.parsers import Parser
+from pyetta.reporters import Reporter
+
+log = logging.getLogger("pyetta.pipeline")
+
+
+class PipelineStageError(RuntimeError):
+    """Raised when a stage of the pipeline fails. The original exception is chained."""
+
+    def __init__(self, stage: str, message: str) -> None:
+        """
+        :param stage: The stage that failed, either ``load`` or ``collect``.
+        :param message: The error message.
+        """
+        super().__init__(message)
+        self.stage = stage
+
+
+@dataclass
+class PipelineResult:
+    """The result of a single run of a pipeline."""
+
+    test_cases: List[TestCase]
+    """Test cases produced by the parser."""
+    exit_code: int = 0
+    """Highest exit code returned by the reporters."""
+    report_errors: List[str] = field(default_factory=list)
+    """Errors of reporters that failed or timed out, each counted as an exit code of 1."""
+    load_s: float = 0.0
+    """Time spent loading the firmware, in seconds."""
+    collect_s: float = 0.0
+    """Time spent running, collecting and parsing, in seconds."""
+    report_s: float = 0.0
+    """Time spent generating reports, in seconds."""
+
+    @property
+    def total_s(self) -> float:
+        """Total time of the run, in seconds."""
+        return self.load_s + self.collect_s + self.report_s
+
+
+class _ReportTask:
+    """Generates a single report on its own thread. The thread is a daemon, so a reporter that
+    never returns cannot keep the process alive after its timeout."""
+
+    def __init__(self, reporter: Reporter, test_cases: Sequence[TestCase]) -> None:
+        self.reporter = reporter
+        self.exit_code = 0
+        self.error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, args=(test_cases,), daemon=True,
+                                        name=f"pyetta-report-{reporter.__class__.__name__}")
+        self._thread.start()
+
+    def _run(self, test_cases: Sequence[TestCase]) -> None:
+        try:
+            self.exit_code = self.reporter.generate_report(test_cases)
+        except BaseException as ec:
+            self.error = ec
+
+    def wait(self, timeout_s: Optional[float]) -> bool:
+        """Waits for the report to complete.
+
+        :param timeout_s: Maximum time to wait, or None to wait forever.
+        :returns: True if the report is complete.
+        """
+        self._thread.join(timeout_s)
+        return not self._thread.is_alive()
+
+
+def _retry_key(test_case: TestCase) -> Tuple[Optional[str], Optional[str], str]:
+    return test_case.group, test_case.filepath, test_case.name
+
+
+class PipelineListener:
+    """Receives the events of a running pipeline. All events do nothing by default, so
+    listeners only need to implement the events they are interested in."""
+
+    def on_stage(self, stage: str) -> None:
+        """Called when the pipeline enters a stage.
+
+        :param stage: The stage, one of ``load``, ``collect``, ``resume``, ``retry`` or
+                      ``report``.
+        """
+
+    def on_load_progress(self, progress: float) -> None:
+        """Called as the loader reports progress.
+
+        :param progress: The load completion, between 0 and 1.
+        """
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        """Called after a collected chunk is fed to the parser, and once more with an empty chunk
+        if stopping the parser produces test cases or a crash is recorded.
+
+        :param chunk: The raw chunk from the collector.
+        :param test_cases: Test cases the parser produced from this chunk.
+        """
+
+    def on_complete(self, result: PipelineResult) -> None:
+        """Called once the run is complete and all reports are generated.
+
+        :param result: The result of the run.
+        """
+
+
+class Pipeline:
+    """Runs the pyetta execution algorithm. The firmware is loaded onto the device, the program
+    is started, and the collected output is fed to the parser until it is done. The parsed test
+    cases are then passed to each reporter.
+
+    A pipeline can be run repeatedly while keeping its loader and collector open. As parsers
+    hold the state of a single run, a parser factory is required to run more than once.
+    """
+
+    def __init__(self, loader: Loader, collector: Collector,
+                 parser: Optional[Parser] = None,
+                 reporters: Iterable[Reporter] = (),
+                 parser_factory: Optional[Callable[[], Parser]] = None,
+                 listeners: Iterable[PipelineListener] = (),
+                 retries: int = 0,
+                 report_timeout_s: Optional[float] = None,
+                 crash_detector: Optional[CrashDetector] = None) -> None:
+        """
+        :param loader: Loader used to load and start the firmware.
+        :param collector: Collector providing the output of the device.
+        :param parser: Parser for the first run. If not given, one is created from the factory.
+        :param reporters: Reporters generating reports from the parsed test cases.
+        :param parser_factory: Callable creating a new parser for each run.
+        :param listeners: Listeners receiving the events of each run.
+        :param retries: Number of times failed tests are retried, by resetting the device and
+                        starting the program again. Only the failed tests are run if the loader
+                        supports :meth:`pyetta.loaders.Loader.set_test_filter`. Retrying
+                        requires a parser factory.
+        :param report_timeout_s: Maximum time each reporter may take. Reporters run
+                                 concurrently, so this also bounds the whole report stage.
+        :param crash_detector: Detects the device crashing during a run. The crashing test is
+                               recorded as failed, and the test runner is resumed at the next
+                               test if the loader supports
+                               :meth:`pyetta.loaders.Loader.set_resume_point`. Resuming requires
+                               a parser factory.
+        """
+        if parser is None and parser_factory is None:
+            raise ValueError("Pipeline requires either a parser or a parser factory.")
+        if retries > 0 and parser_factory is None:
+            raise ValueError("Retrying failed tests requires a parser factory.")
+        if crash_detector is not None and crash_detector.max_restarts > 0 and \
+                parser_factory is None:
+            raise ValueError("Resuming after a crash requires a parser factory.")
+        self.loader = loader
+        self.collector = collector
+        self.reporters: List[Reporter] = list(reporters)
+        self.listeners: List[PipelineListener] = list(listeners)
+        self.retries = retries
+        self.report_timeout_s = report_timeout_s
+        self.crash_detector = crash_detector
+        self._parser = parser
+        self._parser_factory = parser_factory
+        self._exit_stack: Optional[contextlib.ExitStack] = None
+
+    def __enter__(self):
+        """Enters the loader and collector if they are context managers, keeping them open
+        across runs."""
+        self._exit_stack = contextlib.ExitStack()
+        for resource in (self.loader, self.collector):
+            if hasattr(resource, "__enter__"):
+                self._exit_stack.enter_context(resource)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        exit_stack, self._exit_stack = self._exit_stack, None
+        if exit_stack is not None:
+            return exit_stack.__exit__(exc_type, exc_val, exc_tb)
+
+    @property
+    def parser(self) -> Optional[Parser]:
+        """The parser of the current or most recent run."""
+        return self._parser
+
+    def _next_parser(self) -> Parser:
+        if self._parser is None or self._parser.done:
+            if self._parser_factory is None:
+                raise ValueError("Parser has already completed, a parser factory is required to "
+                                 "run the pipeline again.")
+            self._parser = self._parser_factory()
+        return self._parser
+
+    def _notify(self, event: str, *args) -> None:
+        for listener in self.listeners:
+            getattr(listener, event)(*args)
+
+    def _collect(self, parser: Parser, detector: Optional[CrashDetector] = None) -> Optional[str]:
+        """Feeds the collected output to the parser until it is done.
+
+        :param detector: Detects the device crashing, stopping the collection.
+        :returns: The reason the device crashed, or None if the parser completed.
+        """
+        while not parser.done:
+            chunk = self.collector.read_chunk()
+
+            if chunk is not None and len(chunk) > 0:
+                if detector is not None:
+                    reason = detector.feed_data(chunk)
+                    if reason is not None:
+                        return reason
+                test_count = len(parser.test_cases)
+                parser.feed_data(chunk)
+                self._notify("on_chunk", chunk, parser.test_cases[test_count:])
+            elif detector is not None and detector.detect_silence:
+                return "device fault" if self.loader.is_faulted() else "output stopped"
+            else:
+                self._stop_parser(parser)
+        return None
+
+    def _stop_parser(self, parser: Parser) -> None:
+        # parsers may only produce some results once stopped, such as when batching
+        test_count = len(parser.test_cases)
+        parser.stop()
+        if len(parser.test_cases) > test_count:
+            self._notify("on_chunk", b"", parser.test_cases[test_count:])
+
+    def _collect_resuming(self, parser: Parser) -> List[TestCase]:
+        """Collects the output of the run, resuming the test runner after each crash. The test
+        cases of each part of the run are stitched together, with the crashing tests failed.
+
+        :returns: The test cases of the whole run.
+        """
+        detector = self.crash_detector
+        if detector is None:
+            self._collect(parser)
+            return parser.test_cases
+
+        test_cases: List[TestCase] = list()
+        tests_run = 0
+        restarts = 0
+        try:
+            while True:
+                detector.reset()
+                reason = self._collect(parser, detector)
+                if reason is None:
+                    test_cases.extend(parser.test_cases)
+                    return test_cases
+
+                self._stop_parser(parser)
+                completed = [test_case for test_case in parser.test_cases
+                             if test_case.group != Parser.RESERVED_TEST_GROUP]
+                crashed = detector.crashed_test(reason, completed)
+                log.warning(f"{crashed.result_message} Test: {crashed.name}.")
+                test_cases.extend(parser.test_cases)
+                test_cases.append(crashed)
+                self._notify("on_chunk", b"", [crashed])
+                # the runner's order includes the crashing test, which is skipped
+                tests_run += len(completed) + 1
+
+                if restarts >= detector.max_restarts:
+                    log.warning(f"Not resuming after {restarts} restarts.")
+                    return test_cases
+                if not self.loader.set_resume_point(tests_run):
+                    log.warning("Loader does not support resuming the test runner.")
+                    return test_cases
+                restarts += 1
+                log.debug(f"Resuming at test {tests_run}, restart {restarts}.")
+                self._notify("on_stage", "resume")
+                self.loader.reset_device()
+                self.loader.start_program()
+                parser = self._parser = self._parser_factory()
+        finally:
+            self.loader.set_resume_point(None)
+
+    def _retry_failures(self, test_cases: List[TestCase]) -> None:
+        """Reruns the failed tests until they pass or the retries are exhausted. Tests that pass
+        on a retry are marked as passed and flaky, the attempts of every retried test are
+        recorded in its ``extra`` under ``attempts``.
+
+        An error during a retry stops any further retries, keeping the results of the attempts
+        completed so far."""
+        retried = [test_case for test_case in test_cases
+                   if test_case.result == TestResult.Fail and
+                   test_case.group != Parser.RESERVED_TEST_GROUP]
+        for test_case in retried:
+            test_case.extra["attempts"] = 1
+            test_case.extra["flaky"] = False
+
+        try:
+            self._run_retries(retried)
+        except Exception as ec:
+            log.warning(f"Retrying failed tests stopped, keeping earlier results: {ec}")
+            log.debug("Error retrying failed tests.", exc_info=ec)
+        finally:
+            self.loader.set_test_filter(None)
+
+    def _run_retries(self, retried: List[TestCase]) -> None:
+        for attempt in range(2, self.retries + 2):
+            failed = {_retry_key(test_case): test_case for test_case in retried
+                      if test_case.result == TestResult.Fail}
+            if len(failed) == 0:
+                break
+
+            log.debug(f"Retrying {len(failed)} failed tests, attempt {attempt}.")
+            self._notify("on_stage", "retry")
+            names = sorted({test_case.name for test_case in failed.values()})
+            if not self.loader.set_test_filter(names):
+                log.debug("Loader does not support selecting tests, rerunning all tests.")
+            self.loader.reset_device()
+            self.loader.start_program()
+            parser = self._parser_factory()
+            self._collect(parser)
+
+            for retry_case in parser.test_cases:
+                test_case = failed.get(_retry_key(retry_case))
+                if test_case is None:
+                    continue
+                test_case.extra["attempts"] = attempt
+                if retry_case.result == TestResult.Pass:
+                    test_case.extra["flaky"] = True
+                    test_case.extra["first_failure"] = test_case.result_message
+                    test_case.result = TestResult.Pass
+                    test_case.result_message = retry_case.result_message
+
+    def _generate_reports(self, result: PipelineResult) -> None:
+        """Runs all reporters concurrently over the same snapshot of the test cases. A reporter
+        failing or timing out is recorded in the result, without affecting the other reporters.
+        """
+        snapshot: Tuple[TestCase, ...] = tuple(result.test_cases)
+        tasks = [_ReportTask(reporter, snapshot) for reporter in self.reporters]
+        deadline: Optional[float] = None
+        if self.report_timeout_s is not None:
+            deadline = time.monotonic() + self.report_timeout_s
+
+        for task in tasks:
+            timeout_s = None if deadline is None else max(0.0, deadline - time.monotonic())
+            error: Optional[str] = None
+            if not task.wait(timeout_s):
+                error = f"Reporter {task.reporter} timed out after {self.report_timeout_s}s."
+            elif task.error is not None:
+                log.debug(f"Error generating report with {task.reporter}.", exc_info=task.error)
+                error = f"Reporter {task.reporter} failed: {task.error}"
+
+            exit_code = task.exit_code
+            if error is not None:
+                log.warning(error)
+                result.report_errors.append(error)
+                exit_code = 1
+
+            # our logic just takes the highest exit code it can
+            result.exit_code = max(exit_code, result.exit_code)
+
+    def run(self, load: bool = True) -> PipelineResult:
+        """Runs the pipeline once.
+
+        :param load: Set to false to skip loading the firmware, such as when rerunning the same
+                     firmware.
+        :returns: The result of the run.
+        :raises PipelineStageError: If loading or collecting fails. Failing reporters are
+                                    recorded in :attr:`PipelineResult.report_errors` instead.
+        """
+        parser = self._next_parser()
+        result = PipelineResult(test_cases=parser.test_cases)
+
+        start = time.monotonic()
+        if load:
+            self._notify("on_stage", "load")
+            try:
+                self.loader.load_to_device(
+                    progress=lambda progress: self._notify("on_load_progress", progress))
+            except Exception as ec:
+                log.debug("Error loading firmware to target.", exc_info=ec)
+                raise PipelineStageError("load", str(ec)) from ec
+        collect_start = time.monotonic()
+        result.load_s = collect_start - start
+
+        self._notify("on_stage", "collect")
+        try:
+            self.loader.start_program()
+            test_cases = self._collect_resuming(parser)
+        except Exception as ec:
+            log.debug("Error collecting data from target.", exc_info=ec)
+            raise PipelineStageError("collect", str(ec)) from ec
+        if self.retries > 0:
+            self._retry_failures(test_cases)
+        report_start = time.monotonic()
+        result.collect_s = report_start - collect_start
+
+        self._notify("on_stage", "report")
+        result.test_cases = test_cases
+        self._generate_reports(result)
+        result.report_s = time.monotonic() - report_start
+
+        self._notify("on_complete", result)
+        return result
@@ -0,0 +1,193 @@
+"""Opt-in profiling of the stages of a pipeline, attributing the time or memory used by each
+call to the loader, collector, parser, reporters and listeners, and so to the plugins which
+provide them.
+
+Components are instrumented in place, by wrapping the methods the pipeline calls. In ``cpu``
+mode, the wall time and CPU time of the calling thread are measured for each call. CPU time is
+per thread, so concurrently running reporters are measured independently. In ``mem`` mode, the
+memory allocated by each call is measured with :mod:`tracemalloc`, which slows down the run
+considerably and includes allocations of other threads running at the same time.
+"""
+import functools
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+PROFILE_MODES = ("cpu", "mem")
+"""Supported profiling modes."""
+
+PROFILED_METHODS = ("load_to_device", "reset_device", "start_program", "read_chunk",
+                    "feed_data", "stop", "generate_report", "on_stage", "on_load_progress",
+                    "on_chunk", "on_complete")
+"""Methods of the pipeline components which are profiled, if the component has them."""
+
+T = TypeVar("T")
+
+
+@dataclass
+class ProfileStats:
+    """Measurements of a single method of a component."""
+
+    plugin: str
+    """Module providing the component."""
+    component: str
+    """Name of the component's class."""
+    method: str
+    calls: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    allocated_bytes: int = 0
+    """Memory allocated by the calls and not yet freed when they returned."""
+    peak_bytes: int = 0
+    """Highest memory use above the starting point during any single call."""
+
+
+class Profiler:
+    """Instruments pipeline components, accumulating measurements for each of their methods."""
+
+    def __init__(self, mode: str = "cpu") -> None:
+        """
+        :param mode: One of :data:`PROFILE_MODES`.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unsupported profile mode '{mode}'.")
+        self.mode = mode
+        self._stats: Dict[Tuple[str, str, str], ProfileStats] = dict()
+        self._lock = threading.Lock()
+        self._started_tracing = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self) -> None:
+        """Starts tracing memory allocations when profiling memory."""
+        if self.mode == "mem" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """Stops tracing memory allocations, if started by this profiler."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @property
+    def stats(self) -> List[ProfileStats]:
+        """The measurements of every profiled method, most expensive first."""
+        with self._lock:
+            stats = list(self._stats.values())
+        return sorted(stats, key=self._cost, reverse=True)
+
+    def _cost(self, stats: ProfileStats) -> float:
+        return stats.cpu_s if self.mode == "cpu" else stats.peak_bytes
+
+    def instrument(self, component: T, methods: Iterable[str] = PROFILED_METHODS) -> T:
+        """Wraps the methods of a component, in place, so each call is measured.
+
+        :param component: A loader, collector, parser, reporter or listener.
+        :param methods: Names of the methods to wrap, methods the component does not have are
+                        ignored.
+        :returns: The same component.
+        """
+        component_type = type(component)
+        for method in methods:
+            function = getattr(component, method, None)
+            if callable(function):
+                key = (component_type.__module__, component_type.__qualname__, method)
+                setattr(component, method, self._wrap(key, function))
+        return component
+
+    def instrument_factory(self, factory: Optional[Callable[[], T]]) -> Optional[Callable[[], T]]:
+        """Wraps a factory, such as a parser factory, so each component it creates is
+        instrumented.
+
+        :param factory: The factory, may be None.
+        :returns: The wrapped factory, or None if no factory was given.
+        """
+        if factory is None:
+            return None
+
+        @functools.wraps(factory)
+        def create() -> T:
+            return self.instrument(factory())
+
+        return create
+
+    def _wrap(self, key: Tuple[str, str, str], function: Callable[..., Any]) -> Callable[..., Any]:
+        with self._lock:
+            stats = self._stats.setdefault(key, ProfileStats(*key))
+        measure = self._measure_cpu if self.mode == "cpu" else self._measure_memory
+
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            return measure(stats, function, args, kwargs)
+
+        return profiled
+
+    def _measure_cpu(self, stats: ProfileStats, function: Callable[..., Any],
+                     args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            cpu_s = time.thread_time() - cpu_start
+            wall_s = time.perf_counter() - wall_start
+            with self._lock:
+                stats.calls += 1
+                stats.cpu_s += cpu_s
+                stats.wall_s += wall_s
+
+    def _measure_memory(self, stats: ProfileStats, function: Callable[..., Any],
+                        args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        wall_start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            wall_s = time.perf_counter() - wall_start
+            current, peak = tracemalloc.get_traced_memory()
+            with self._lock:
+                stats.calls += 1
+                stats.wall_s += wall_s
+                stats.allocated_bytes += current - start
+                stats.peak_bytes = max(stats.peak_bytes, peak - start)
+
+    def format_report(self) -> str:
+        """Formats the measurements as a table, grouped by the plugin module providing each
+        component, with the most expensive plugins first.
+
+        :returns: The report.
+        """
+        by_plugin: Dict[str, List[ProfileStats]] = dict()
+        for stats in self.stats:
+            if stats.calls > 0:
+                by_plugin.setdefault(stats.plugin, list()).append(stats)
+
+        if self.mode == "cpu":
+            header = f"{'calls':>10} {'wall (s)':>12} {'cpu (s)':>12}"
+        else:
+            header = f"{'calls':>10} {'wall (s)':>12} {'alloc (KiB)':>12} {'peak (KiB)':>12}"
+        lines = [f"Profile ({self.mode}):"]
+        for plugin, plugin_stats in sorted(by_plugin.items(),
+                                           key=lambda item: -sum(map(self._cost, item[1]))):
+            lines.append(f"  {plugin}")
+            lines.append(f"    {'method':<48}{header}")
+            for stats in plugin_stats:
+                name = f"{stats.component}.{stats.method}"
+                row = f"    {name:<48}{stats.calls:>10} {stats.wall_s:>12.6f}"
+                if self.mode == "cpu":
+                    row += f" {stats.cpu_s:>12.6f}"
+                else:
+                    row += f" {stats.allocated_bytes / 1024:>12.1f}" \
+                           f" {stats.peak_bytes / 1024:>12.1f}"
+                lines.append(row)
+        return "\n".join(lines)
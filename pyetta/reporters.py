@@ -1,6 +1,7 @@
 """Reporters are used to mutate the test suite outputs of the parsers
 into various formats.
 """
+import json
 import logging
 from abc import ABC, abstractmethod
 from pathlib import Path
@@ -109,3 +110,48 @@ class JUnitXmlReporter(ExitCodeReporter):
             j.to_xml_report_file(fo, test_suites=junit_tests, encoding='utf-8')
 
         return super().generate_report(test_cases)
+
+
+class JsonLinesReporter(Reporter):
+
+    def __init__(self, file_path: Path) -> None:
+        """Writes each test case as a line of JSON, as converted by
+        :func:`pyetta.parser_data.case_to_dict`. Test cases are written as they are
+        iterated, so the report is never held in memory. This reporter does not affect the exit
+        code.
+
+        :param file_path: The output file to write the test cases to.
+        """
+        self._output_filepath = file_path
+
+    def __str__(self):
+        return f"JSON Lines Reporter, file='{self._output_filepath}'"
+
+    def generate_report(self, test_cases: Iterable[p.TestCase]) -> int:
+        log.debug("Generating JSON lines for tests at %s.", self._output_filepath)
+        with open(self._output_filepath, "w", encoding="utf-8") as fo:
+            for test_case in test_cases:
+                fo.write(json.dumps(p.case_to_dict(test_case), separators=(",", ":"),
+                                    default=str))
+                fo.write("\n")
+        return 0
+
+
+class ColumnarReporter(Reporter):
+
+    def __init__(self, file_path: Path) -> None:
+        """Writes the test cases in the compact columnar format, readable with
+        :class:`pyetta.parser_data.ColumnarTestCases`. This reporter does not affect the exit
+        code.
+
+        :param file_path: The output file to write the test cases to.
+        """
+        self._output_filepath = file_path
+
+    def __str__(self):
+        return f"Columnar Reporter, file='{self._output_filepath}'"
+
+    def generate_report(self, test_cases: Iterable[p.TestCase]) -> int:
+        log.debug("Generating columnar results for tests at %s.", self._output_filepath)
+        p.write_columnar_test_cases(self._output_filepath, test_cases)
+        return 0
@@ -0,0 +1,232 @@
+"""Shards the test groups of a test runner across multiple boards running the same firmware.
+
+Shards are balanced using the historical runtime of each group, assigning the longest groups
+first to the least loaded board (longest processing time first scheduling).
+"""
+import heapq
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Sequence, List, Callable, Iterable
+
+from pyetta.collectors import Collector
+from pyetta.loaders import Loader
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.parsers import Parser
+from pyetta.pipeline import Pipeline, PipelineListener
+
+log = logging.getLogger("pyetta.sharding")
+
+
+def default_group_of(test_case: TestCase) -> str:
+    """Gets the group a test case belongs to, used when the parser does not provide groups.
+
+    :param test_case: The test case.
+    :returns: The test group, or the test's file path if the test has no group.
+    """
+    return test_case.group or test_case.filepath or test_case.name
+
+
+class RuntimeHistory:
+    """Stores the historical runtime of each test group, in seconds."""
+
+    def __init__(self, runtimes: Optional[Dict[str, float]] = None,
+                 default_runtime_s: float = 1.0, smoothing: float = 0.5) -> None:
+        """
+        :param runtimes: Initial runtimes of each group.
+        :param default_runtime_s: Runtime assumed for groups without any history.
+        :param smoothing: Weight given to a new measurement when updating a group's runtime.
+        """
+        self._runtimes: Dict[str, float] = dict(runtimes or {})
+        self._default_runtime_s = default_runtime_s
+        self._smoothing = smoothing
+
+    @classmethod
+    def load(cls, file_path: Path, **kwargs) -> "RuntimeHistory":
+        """Loads the history from a JSON file, an empty history is returned if the file does not
+        exist.
+
+        :param file_path: The history file.
+        :param kwargs: Additional arguments passed to the constructor.
+        """
+        runtimes = None
+        if file_path.exists():
+            with open(file_path, "r") as fi:
+                runtimes = json.load(fi)
+        return cls(runtimes, **kwargs)
+
+    def save(self, file_path: Path) -> None:
+        """Saves the history to a JSON file.
+
+        :param file_path: The history file.
+        """
+        with open(file_path, "w") as fo:
+            json.dump(self._runtimes, fo, indent=2, sort_keys=True)
+
+    @property
+    def runtimes(self) -> Dict[str, float]:
+        return dict(self._runtimes)
+
+    def runtime(self, group: str) -> float:
+        """Gets the expected runtime of a group.
+
+        :param group: The test group.
+        :returns: The expected runtime in seconds.
+        """
+        return self._runtimes.get(group, self._default_runtime_s)
+
+    def update(self, group: str, runtime_s: float) -> None:
+        """Records a new runtime measurement for a group.
+
+        :param group: The test group.
+        :param runtime_s: The measured runtime in seconds.
+        """
+        if group in self._runtimes:
+            runtime_s = self._smoothing * runtime_s + \
+                        (1 - self._smoothing) * self._runtimes[group]
+        self._runtimes[group] = runtime_s
+
+
+def plan_shards(groups: Iterable[str], shard_count: int,
+                history: Optional[RuntimeHistory] = None) -> List[List[str]]:
+    """Splits the test groups into shards of roughly equal runtime, using longest processing
+    time first scheduling.
+
+    :param groups: The test groups to split.
+    :param shard_count: The number of shards to create.
+    :param history: Runtime history used to balance the shards. Without it, all groups are
+                    assumed to take the same time.
+    :returns: The groups for each shard. Shards may be empty if there are fewer groups than
+              shards.
+    """
+    if shard_count < 1:
+        raise ValueError("At least 1 shard is required.")
+    history = history or RuntimeHistory()
+    shards: List[List[str]] = [list() for _ in range(shard_count)]
+    loads = [(0.0, idx) for idx in range(shard_count)]
+
+    ordered_groups = sorted(set(groups), key=lambda group: (-history.runtime(group), group))
+    for group in ordered_groups:
+        load, idx = heapq.heappop(loads)
+        shards[idx].append(group)
+        heapq.heappush(loads, (load + history.runtime(group), idx))
+    return shards
+
+
+class _ShardListener(PipelineListener):
+    """Tags each test case with its shard, and measures its runtime from the time between
+    results."""
+
+    def __init__(self, shard_idx: int) -> None:
+        self._shard_idx = shard_idx
+        self._last_result_time = time.monotonic()
+
+    def on_stage(self, stage: str) -> None:
+        if stage == "collect":
+            self._last_result_time = time.monotonic()
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        now = time.monotonic()
+        for test_case in test_cases:
+            # the first test of a chunk accounts for the time since the previous result
+            if test_case.runtime_s == 0.0:
+                test_case.runtime_s = now - self._last_result_time
+            self._last_result_time = now
+            test_case.extra["shard"] = self._shard_idx
+
+
+@dataclass
+class Board:
+    """A board able to run a shard, consisting of its own loader and collector."""
+
+    loader: Loader
+    collector: Collector
+    name: Optional[str] = None
+
+
+class ShardedRunner:
+    """Runs the test groups of a test runner sharded across multiple boards in parallel.
+
+    Each board runs the same firmware, with the groups of its shard selected through
+    :meth:`pyetta.loaders.Loader.set_group_filter`. The results of all boards are merged, and
+    the measured group runtimes are recorded into the history for balancing future runs.
+
+    The loader of each board must support selecting test groups. The built-in
+    :class:`pyetta.loaders.EmulatorLoader` does so through its command line, while
+    :class:`pyetta.loaders.PyOCDDeviceLoader` does not, so physical boards require a loader
+    subclass passing the selection to the firmware, such as by writing it into target memory.
+    """
+
+    def __init__(self, boards: Sequence[Board], parser_factory: Callable[[], Parser],
+                 history: Optional[RuntimeHistory] = None,
+                 group_of: Callable[[TestCase], str] = default_group_of) -> None:
+        """
+        :param boards: Boards to run the shards on, one shard is created per board.
+        :param parser_factory: Callable creating a new parser for each board.
+        :param history: Runtime history used to balance, and updated by, the run.
+        :param group_of: Callable returning the group a parsed test case belongs to.
+        """
+        if len(boards) == 0:
+            raise ValueError("At least 1 board is required to run shards.")
+        self._boards = list(boards)
+        self._parser_factory = parser_factory
+        self._history = history or RuntimeHistory()
+        self._group_of = group_of
+
+    @property
+    def history(self) -> RuntimeHistory:
+        return self._history
+
+    def run(self, groups: Sequence[str], load: bool = True) -> List[TestCase]:
+        """Runs the groups across all boards, blocking until every shard is complete.
+
+        :param groups: The test groups to run.
+        :param load: Set to false to skip loading the firmware onto the boards.
+        :returns: The merged test cases of all shards, with the shard index of each test case
+                  stored in its ``extra["shard"]``.
+        """
+        shards = plan_shards(groups, len(self._boards), self._history)
+        for board, shard in zip(self._boards, shards):
+            if len(shard) > 0 and not board.loader.set_group_filter(shard):
+                raise ValueError(f"Loader {board.loader} does not support selecting test groups.")
+
+        with ThreadPoolExecutor(max_workers=len(self._boards)) as executor:
+            futures = [executor.submit(self._run_shard, board, idx, load)
+                       for idx, (board, shard) in enumerate(zip(self._boards, shards))
+                       if len(shard) > 0]
+            results = [test_case for future in futures for test_case in future.result()]
+
+        group_runtimes: Dict[str, float] = dict()
+        for test_case in results:
+            if test_case.group == Parser.RESERVED_TEST_GROUP:
+                continue
+            group = self._group_of(test_case)
+            group_runtimes[group] = group_runtimes.get(group, 0.0) + test_case.runtime_s
+        for group, runtime_s in group_runtimes.items():
+            self._history.update(group, runtime_s)
+
+        return results
+
+    def _run_shard(self, board: Board, shard_idx: int, load: bool) -> List[TestCase]:
+        log.debug(f"Running shard {shard_idx} on board {board.name or board.loader}.")
+        listener = _ShardListener(shard_idx)
+        pipeline = Pipeline(board.loader, board.collector, parser_factory=self._parser_factory,
+                            listeners=[listener])
+        try:
+            return pipeline.run(load=load).test_cases
+        except Exception as ec:
+            # keep the other shards, reporting the board's failure like a parser error
+            log.debug(f"Error running shard {shard_idx} on board {board.name or board.loader}.",
+                      exc_info=ec)
+            test_cases = list(pipeline.parser.test_cases) if pipeline.parser is not None else []
+            test_cases.append(TestCase(group=Parser.RESERVED_TEST_GROUP,
+                                       name="board_error",
+                                       result=TestResult.Fail,
+                                       extra={"shard": shard_idx},
+                                       stdout=f"Board {board.name or board.loader} failed, "
+                                              f"{ec.__class__.__name__} raised with message: "
+                                              f"{ec}."))
+            return test_cases
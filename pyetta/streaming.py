@@ -0,0 +1,219 @@
+"""Publishes the results of a running pipeline as newline delimited JSON over HTTP, allowing
+dashboards to follow the progress of long runs.
+
+Clients connect with a ``GET /events`` request and receive a stream of JSON events, one per
+line. Events are batched and fanned out by a background thread, and each client has a bounded
+queue so a slow consumer only loses its own oldest events rather than blocking the collection.
+"""
+import json
+import logging
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional, Iterable, Sequence, Tuple, Deque
+
+from pyetta.parser_data import TestCase, TestResult, case_to_dict
+from pyetta.pipeline import PipelineListener
+from pyetta.reporters import Reporter
+
+log = logging.getLogger("pyetta.streaming")
+
+
+class _EventClient:
+    """Pending output of a single connected client."""
+
+    def __init__(self, max_queued_batches: int) -> None:
+        self.batches: Deque[bytes] = deque(maxlen=max_queued_batches)
+        self.dropped = 0
+
+
+class _EventRequestHandler(BaseHTTPRequestHandler):
+    server: "_EventHTTPServer"
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        log.debug(format, *args)
+
+    def do_GET(self) -> None:
+        if self.path != "/events":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.server.stream.serve_client(self.wfile)
+
+
+class _EventHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], stream: "ResultStreamServer") -> None:
+        self.stream = stream
+        super().__init__(address, _EventRequestHandler)
+
+
+class ResultStreamServer(Reporter, PipelineListener):
+    """Streams each parsed test case and the status of the run to connected HTTP clients.
+
+    This is both a pipeline listener, publishing events as the pipeline runs, and a reporter,
+    publishing a summary once the run is complete. The reporter does not affect the exit code.
+
+    Events published:
+
+    - ``{"event": "stage", "stage": ...}`` when the pipeline enters a stage.
+    - ``{"event": "test_case", "test_case": {...}}`` for each parsed test case.
+    - ``{"event": "complete", "tests": ..., "failures": ..., "skipped": ...}`` at the end.
+    - ``{"event": "dropped", "count": ...}`` when a slow client misses events.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 0,
+                 batch_interval_s: float = 0.25, max_queued_batches: int = 1000,
+                 history_size: int = 10000) -> None:
+        """
+        :param host: Host to bind the server to.
+        :param port: Port to bind the server to, 0 picks a free port.
+        :param batch_interval_s: Interval at which pending events are sent to clients.
+        :param max_queued_batches: Batches queued per client before its oldest are dropped.
+        :param history_size: Number of recent events replayed to clients when they connect.
+        """
+        self._address = (host, port)
+        self._batch_interval_s = batch_interval_s
+        self._max_queued_batches = max_queued_batches
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._history: Deque[bytes] = deque(maxlen=history_size)
+        self._clients: List[_EventClient] = list()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._finished = False
+        self._server: Optional[_EventHTTPServer] = None
+        self._threads: List[threading.Thread] = list()
+
+    def __str__(self):
+        return f"Result Stream Server, address='{self.address[0]}:{self.address[1]}'"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The address the server is bound to."""
+        if self._server is not None:
+            return self._server.server_address[0], self._server.server_address[1]
+        return self._address
+
+    def start(self) -> None:
+        """Starts the server and the batching thread."""
+        if self._server is not None:
+            return
+        self._server = _EventHTTPServer(self._address, self)
+        self._threads = [threading.Thread(target=self._server.serve_forever, daemon=True),
+                         threading.Thread(target=self._broadcast, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        log.debug(f"Streaming results on http://{self.address[0]}:{self.address[1]}/events.")
+
+    def close(self) -> None:
+        """Sends all pending events, then disconnects all clients and stops the server."""
+        if self._server is None:
+            return
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        # the broadcaster sends the remaining events before finishing
+        self._threads[1].join()
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Queues an event to be sent to all clients. This never blocks on the clients.
+
+        :param event: A JSON serialisable event.
+        """
+        self._pending.append(event)
+
+    def on_stage(self, stage: str) -> None:
+        self.publish({"event": "stage", "stage": stage})
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        for test_case in test_cases:
+            self.publish({"event": "test_case", "test_case": case_to_dict(test_case)})
+
+    def generate_report(self, test_cases: Iterable[TestCase]) -> int:
+        summary = {"event": "complete", "tests": 0, "failures": 0, "skipped": 0}
+        for test_case in test_cases:
+            summary["tests"] += 1
+            if test_case.result == TestResult.Fail:
+                summary["failures"] += 1
+            elif test_case.result == TestResult.Skip:
+                summary["skipped"] += 1
+        self.publish(summary)
+        return 0
+
+    def serve_client(self, output: Any) -> None:
+        """Streams events to a connected client until the server is closed or the client
+        disconnects. Called from the client's request handler thread.
+
+        :param output: Writable file of the client connection.
+        """
+        client = _EventClient(self._max_queued_batches)
+        with self._condition:
+            client.batches.extend(self._history)
+            self._clients.append(client)
+        try:
+            while True:
+                with self._condition:
+                    while len(client.batches) == 0 and not self._finished:
+                        self._condition.wait()
+                    batches = list(client.batches)
+                    client.batches.clear()
+                    dropped, client.dropped = client.dropped, 0
+                    finished = self._finished
+                if dropped > 0:
+                    output.write(self._encode([{"event": "dropped", "count": dropped}]))
+                for batch in batches:
+                    output.write(batch)
+                output.flush()
+                if finished:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            log.debug("Streaming client disconnected.")
+        finally:
+            with self._condition:
+                self._clients.remove(client)
+
+    @staticmethod
+    def _encode(events: List[Dict[str, Any]]) -> bytes:
+        return b"".join(json.dumps(event, default=str).encode("utf-8") + b"\n"
+                        for event in events)
+
+    def _broadcast(self) -> None:
+        closed = False
+        while not closed:
+            with self._condition:
+                self._condition.wait(timeout=self._batch_interval_s)
+                closed = self._closed
+            events = list()
+            while len(self._pending) > 0:
+                events.append(self._pending.popleft())
+            if len(events) == 0:
+                continue
+            batch = self._encode(events)
+            with self._condition:
+                self._history.extend(batch.splitlines(keepends=True))
+                for client in self._clients:
+                    if len(client.batches) == client.batches.maxlen:
+                        # the oldest batch is discarded by the append
+                        client.dropped += client.batches[0].count(b"\n")
+                    client.batches.append(batch)
+                self._condition.notify_all()
+
+        # wake clients so they can send their remaining batches and disconnect
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
@@ -0,0 +1,106 @@
+"""Watch mode, rerunning a pipeline each time the firmware is rebuilt.
+
+The pipeline's loader and collector are kept open between runs, so each rerun only pays for
+loading the new firmware and collecting its output, without reconnecting to the probe or serial
+port. A new parser is created for each run by the pipeline's parser factory.
+
+Files are watched by polling their modification time and size, so no platform specific file
+notification is needed. A change is only acted on once the file has stopped changing for a
+short time, as build tools often write the firmware in several steps.
+"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Sequence, Optional, Callable, Tuple, List
+
+from pyetta.pipeline import Pipeline, PipelineResult, PipelineStageError
+
+log = logging.getLogger("pyetta.watch")
+
+_Signature = Optional[Tuple[int, int]]
+
+
+def _signature(file_path: Path) -> _Signature:
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher:
+    """Polls files for changes."""
+
+    def __init__(self, paths: Sequence[Path], interval_s: float = 0.5, settle_s: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param paths: The files to watch.
+        :param interval_s: Time between polls of the files.
+        :param settle_s: Time the files must be unchanged before a change is reported.
+        :param clock: Monotonic clock, in seconds.
+        """
+        if len(paths) == 0:
+            raise ValueError("FileWatcher requires at least 1 file to watch.")
+        self._paths = list(paths)
+        self._interval_s = interval_s
+        self._settle_s = settle_s
+        self._clock = clock
+        self._signatures = self._read()
+
+    def _read(self) -> List[_Signature]:
+        return [_signature(path) for path in self._paths]
+
+    def wait_for_change(self, stop: Optional[threading.Event] = None) -> bool:
+        """Waits until any of the files changes and then stops changing. Files which are
+        missing, such as during a rebuild, are not reported until they exist again.
+
+        :param stop: Event which ends the wait when set.
+        :returns: True if the files changed, False if stopped.
+        """
+        stop = stop or threading.Event()
+        changed_at: Optional[float] = None
+        pending = self._signatures
+        while not stop.wait(self._interval_s):
+            current = self._read()
+            if current != pending:
+                pending = current
+                changed_at = self._clock()
+            elif changed_at is not None and None not in current and \
+                    self._clock() - changed_at >= self._settle_s:
+                self._signatures = current
+                return True
+        return False
+
+
+def watch(pipeline: Pipeline, watcher: FileWatcher,
+          on_result: Callable[[Optional[PipelineResult]], None],
+          stop: Optional[threading.Event] = None, runs: Optional[int] = None) -> None:
+    """Runs the pipeline, then reruns it each time the watched files change. The loader and
+    collector are not entered, keep them open across runs by entering the pipeline, or the
+    stages themselves, before watching.
+
+    A run which fails to load or collect is logged and reported as a None result, and watching
+    continues, as the next build may fix it.
+
+    :param pipeline: The pipeline, which must have a parser factory.
+    :param watcher: Watches the firmware files.
+    :param on_result: Called with the result of each run.
+    :param stop: Event which stops watching when set, checked between runs.
+    :param runs: Maximum number of runs, unlimited if not given.
+    """
+    stop = stop or threading.Event()
+    run = 0
+    while runs is None or run < runs:
+        if run > 0:
+            log.debug("Waiting for the firmware to change.")
+            if not watcher.wait_for_change(stop):
+                break
+        run += 1
+        try:
+            result: Optional[PipelineResult] = pipeline.run()
+        except PipelineStageError as ec:
+            log.error(f"Run {run} failed during {ec.stage}: {ec}")
+            result = None
+        on_result(result)
@@ -1,4 +1,5 @@
 import importlib
+import uuid
 from multiprocessing import Lock
 from pathlib import Path
 from typing import cast, List
@@ -57,3 +58,35 @@ def builtins_filepath(test_root: Path) -> Path:
 @pytest.fixture()
 def builtins_args(builtins_filepath) -> List[str]:
     return [f'--extras={builtins_filepath}']
+
+
+@pytest.fixture()
+def sample_file_all_pass(tmp_path) -> Path:
+    filepath = tmp_path / f"{uuid.uuid4()}.py"
+    with open(filepath, "w") as fi:
+        fi.write("""
+/mypath/foo.c:1:test_1:PASS
+/mypath/foo.c:2:test_2:PASS
+/mypath/foo.c:3:test_3:PASS
+
+-----------------------
+3 Tests 0 Failures 0 Ignored
+OK
+""")
+    yield filepath
+
+
+@pytest.fixture()
+def sample_file_ignores(tmp_path) -> Path:
+    filepath = tmp_path / f"{uuid.uuid4()}.py"
+    with open(filepath, "w") as fi:
+        fi.write("""
+/mypath/foo.c:1:test_1:PASS
+/mypath/foo.c:2:test_2:IGNORE
+/mypath/foo.c:3:test_3:PASS
+
+-----------------------
+3 Tests 0 Failures 1 Ignored
+OK
+""")
+    yield filepath
@@ -0,0 +1,102 @@
+import json
+from pathlib import Path
+from typing import List
+
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.aggregation import AggregatingParser, AGGREGATE_KEY
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.parsers import Parser, UnityParser, GoogleTestParser
+
+
+def _feed(parser: Parser, output: bytes) -> Parser:
+    for line in output.splitlines(keepends=True):
+        parser.feed_data(line)
+    return parser
+
+
+def test_aggregating_parser_should_summarise_iterations():
+    output = b"".join([b"/mypath/foo.c:1:test_1:PASS\n", b"/mypath/foo.c:5:test_2:PASS\n",
+                       b"/mypath/foo.c:1:test_1:FAIL:Expected 1 Was 2\n",
+                       b"/mypath/foo.c:5:test_2:IGNORE\n"] * 50 +
+                      [b"/mypath/foo.c:1:test_1:FAIL:Expected 1 Was 3\n", b"OK\n"])
+    parser = _feed(AggregatingParser(UnityParser()), output)
+
+    assert parser.done
+    assert [test_case.name for test_case in parser.test_cases] == ["test_1", "test_2"]
+    test_1, test_2 = parser.test_cases
+    assert test_1.result == TestResult.Fail
+    assert test_1.stdout == "/mypath/foo.c:1:test_1:FAIL:Expected 1 Was 2"
+    assert test_1.result_message == "51 of 101 iterations failed. First failure: Expected 1 " \
+                                    "Was 2 Last failure: Expected 1 Was 3"
+    assert test_1.extra[AGGREGATE_KEY]["passed"] == 50
+    assert test_1.extra[AGGREGATE_KEY]["last_failure"] == "Expected 1 Was 3"
+    assert test_2.result == TestResult.Pass
+    assert test_2.result_message is None
+    assert test_2.extra[AGGREGATE_KEY]["skipped"] == 50
+
+
+def test_aggregating_parser_should_not_keep_iterations():
+    inner = UnityParser()
+    parser = AggregatingParser(inner)
+    for _ in range(1000):
+        parser.feed_data(b"/mypath/foo.c:1:test_1:PASS\n")
+
+    assert len(inner.test_cases) == 0
+    assert len(parser.test_cases) == 1
+    assert parser.test_cases[0].extra[AGGREGATE_KEY]["iterations"] == 1000
+
+
+def test_aggregating_parser_should_key_tests_by_file_and_group():
+    output = b"[       OK ] Suite.test (3 ms)\n[       OK ] Other.test (5 ms)\n" \
+             b"[       OK ] Suite.test (1 ms)\n"
+    parser = _feed(AggregatingParser(GoogleTestParser()), output)
+
+    suite, other = parser.test_cases
+    assert (suite.group, other.group) == ("Suite", "Other")
+    assert suite.extra[AGGREGATE_KEY]["runtime_min_s"] == 0.001
+    assert suite.extra[AGGREGATE_KEY]["runtime_max_s"] == 0.003
+    assert suite.extra[AGGREGATE_KEY]["runtime_mean_s"] == 0.002
+    assert suite.runtime_s == 0.004
+
+
+def test_aggregating_parser_should_keep_parser_errors():
+    parser = _feed(AggregatingParser(UnityParser()), b"/mypath/foo.c:1:test_1:PASS\n")
+    parser.stop(forced=True)
+
+    assert [test_case.name for test_case in parser.test_cases] == ["test_1", "parser_error"]
+    assert parser.test_cases[1] == TestCase(group=Parser.RESERVED_TEST_GROUP,
+                                            name="parser_error", result=TestResult.Fail,
+                                            stdout="Parser stopped before unit test output "
+                                                   "stopped.")
+
+
+def test_cli_should_report_aggregated_tests(builtins_args: List[str],
+                                            cli_runner: CliRunner,
+                                            cli_entry: Group,
+                                            tmp_path: Path):
+    output_path = tmp_path / "stress.log"
+    output_path.write_bytes(b"/mypath/foo.c:1:test_1:PASS\n" * 20 + b"OK\n")
+    builtins_args.extend(['lnull', 'cfile', f'--file={output_path}', 'punity', 'paggregate',
+                          'rjsonl', '--file=results.jsonl', 'rexit'])
+
+    result = cli_runner.invoke(cli_entry, builtins_args)
+
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in Path("results.jsonl").read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["extra"][AGGREGATE_KEY]["iterations"] == 20
+
+
+def test_cli_should_require_parser_to_aggregate(builtins_args: List[str],
+                                                cli_runner: CliRunner,
+                                                cli_entry: Group,
+                                                sample_file_all_pass: Path):
+    builtins_args.extend(['lnull', 'cfile', f'--file={sample_file_all_pass}', 'paggregate',
+                          'rexit'])
+
+    result = cli_runner.invoke(cli_entry, builtins_args)
+
+    assert result.exit_code == 2
+    assert "requires a parser given before it" in result.output
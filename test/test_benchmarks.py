@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.benchmarks import BenchmarkParser, BenchmarkStats, BenchmarkReporter, \
+    BENCHMARK_GROUP, is_regression
+from pyetta.parser_data import TestResult
+from pyetta.parsers import UnityParser
+
+
+def _feed(parser: BenchmarkParser, output: bytes) -> BenchmarkParser:
+    for line in output.splitlines(keepends=True):
+        parser.feed_data(line)
+    return parser
+
+
+def test_benchmark_parser_should_wrap_test_parser():
+    parser = _feed(BenchmarkParser(UnityParser()),
+                   b"BENCH:fir:100:cycles\n"
+                   b"/mypath/foo.c:1:test_1:PASS\n"
+                   b"BENCH:fir:110:cycles\n"
+                   b"BENCH:fft:2.5:\xc2\xb5s\n"
+                   b"OK\n"
+                   b"BENCH:late:1\n")
+
+    assert parser.done
+    assert [(t.group, t.name) for t in parser.test_cases] == \
+        [(None, "test_1"), (BENCHMARK_GROUP, "fir"), (BENCHMARK_GROUP, "fft")]
+    fir, fft = parser.test_cases[1:]
+    assert fir.extra == {"samples": [100.0, 110.0], "unit": "cycles"}
+    assert fft.extra == {"samples": [2.5], "unit": "µs"}
+    assert fir.result == TestResult.Pass
+
+
+def test_benchmark_parser_should_complete_on_done_line_without_parser():
+    parser = _feed(BenchmarkParser(), b"BENCH:fir:1e3\nBENCH:DONE\n")
+
+    assert parser.done
+    assert parser.is_final_chunk(b"BENCH:DONE\n")
+    assert parser.test_cases[0].extra["samples"] == [1000.0]
+
+
+def test_benchmark_stats_should_summarise_samples():
+    stats = BenchmarkStats.from_samples("fir", "cycles", [4, 1, 3, 2, 5])
+
+    assert (stats.count, stats.mean, stats.median) == (5, 3.0, 3.0)
+    assert stats.variance == pytest.approx(2.5)
+    assert (stats.minimum, stats.maximum) == (1, 5)
+    assert stats.p90 == pytest.approx(4.6)
+    assert stats.key == "fir[cycles]"
+
+
+def test_is_regression_should_require_significant_increase():
+    baseline = BenchmarkStats.from_samples("fir", "cycles", [100, 101, 99, 100])
+    noisy = BenchmarkStats.from_samples("fir", "cycles", [90, 130, 95, 135])
+    slower = BenchmarkStats.from_samples("fir", "cycles", [120, 121, 119, 120])
+    exact = BenchmarkStats.from_samples("fir", "cycles", [100])
+
+    assert is_regression(slower, baseline, threshold=0.05)
+    assert not is_regression(noisy, baseline, threshold=0.05)
+    assert not is_regression(baseline, slower, threshold=0.05)
+    assert is_regression(BenchmarkStats.from_samples("fir", "cycles", [106]), exact, 0.05)
+    assert not is_regression(BenchmarkStats.from_samples("fir", "cycles", [104]), exact, 0.05)
+
+
+def test_benchmark_reporter_should_fail_on_regression(tmp_path: Path):
+    parser = _feed(BenchmarkParser(), b"BENCH:fir:100\nBENCH:fft:50\nBENCH:DONE\n")
+    baseline_path = tmp_path / "baseline.json"
+    assert BenchmarkReporter(file_path=baseline_path).generate_report(parser.test_cases) == 0
+
+    parser = _feed(BenchmarkParser(), b"BENCH:fir:150\nBENCH:fft:50\nBENCH:new:1\nBENCH:DONE\n")
+    reporter = BenchmarkReporter(baseline_path=baseline_path)
+
+    assert reporter.generate_report(parser.test_cases) == 1
+    assert reporter.regressions == ["fir"]
+    assert json.loads(baseline_path.read_text())["benchmarks"]["fir"]["mean"] == 100
+
+
+def test_cli_should_report_benchmarks(builtins_args: List[str],
+                                      cli_runner: CliRunner,
+                                      cli_entry: Group,
+                                      tmp_path: Path):
+    output_path = tmp_path / "bench.log"
+    output_path.write_bytes(b"BENCH:fir:100:cycles\n/mypath/foo.c:1:test_1:PASS\nOK\n")
+    builtins_args.extend(['lnull', 'cfile', f'--file={output_path}', 'punity', 'pbench',
+                          'rbench', '--file=stats.json', 'rexit', '--fail-on-empty'])
+
+    result = cli_runner.invoke(cli_entry, builtins_args)
+
+    assert result.exit_code == 0
+    assert "fir[cycles]" in json.loads(Path("stats.json").read_text())["benchmarks"]
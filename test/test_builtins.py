@@ -1,42 +1,12 @@
-import uuid
 from pathlib import Path
 from typing import List
 
-import pytest
+import click
 from click import Group
 from click.testing import CliRunner
 
-
-@pytest.fixture()
-def sample_file_all_pass(tmp_path) -> Path:
-    filepath = tmp_path / f"{uuid.uuid4()}.py"
-    with open(filepath, "w") as fi:
-        fi.write("""
-/mypath/foo.c:1:test_1:PASS
-/mypath/foo.c:2:test_2:PASS
-/mypath/foo.c:3:test_3:PASS
-
------------------------
-3 Tests 0 Failures 0 Ignored
-OK
-""")
-    yield filepath
-
-
-@pytest.fixture()
-def sample_file_ignores(tmp_path) -> Path:
-    filepath = tmp_path / f"{uuid.uuid4()}.py"
-    with open(filepath, "w") as fi:
-        fi.write("""
-/mypath/foo.c:1:test_1:PASS
-/mypath/foo.c:2:test_2:IGNORE
-/mypath/foo.c:3:test_3:PASS
-
------------------------
-3 Tests 0 Failures 1 Ignored
-OK
-""")
-    yield filepath
+from pyetta.cli.utils import CliState, ExecutionPipeline
+from pyetta.parsers import ParallelParser
 
 
 def test_cli_should_load_builtins(builtins_args: List[str],
@@ -92,3 +62,16 @@ def test_ignored_tests_should_return_fail(sample_file_ignores: Path,
     result = cli_runner.invoke(cli_entry, builtins_args)
 
     assert result.exit_code != 0
+
+
+def test_punity_workers_should_parse_reruns_in_parallel():
+    from pyetta._builtins import punity
+
+    context = click.Context(click.Command("pyetta"), obj=CliState())
+    plan = ExecutionPipeline()
+    with context:
+        punity.callback(workers=2)(context, plan)
+        rerun_parser = plan.parser_factory()
+
+        assert isinstance(plan.parser, ParallelParser)
+        assert isinstance(rerun_parser, ParallelParser)
@@ -0,0 +1,130 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.capture import CaptureWriter, CaptureReader, index_path_for
+
+
+def test_capture_segments_should_be_readable_individually(tmp_path: Path):
+    capture_file = tmp_path / "capture.gz"
+
+    with CaptureWriter(capture_file) as writer:
+        writer.write(b"booting\n")
+        writer.write(b"/mypath/foo.c:1:test_1:PASS\n")
+        writer.mark("test_1")
+        writer.write(b"some log output\n")
+        writer.write(b"/mypath/foo.c:2:test_2:FAIL\n")
+        writer.mark("test_2")
+        writer.mark("test_2_duplicate")
+        writer.write(b"OK\n")
+
+    reader = CaptureReader(capture_file)
+
+    assert [segment.label for segment in reader.segments] == \
+           ["test_1", "test_2", "test_2_duplicate", None]
+    assert reader.read_segment(reader.find("test_2")[0]) == \
+           b"some log output\n/mypath/foo.c:2:test_2:FAIL\n"
+    assert reader.find("test_2")[0].offset == reader.find("test_2_duplicate")[0].offset
+    assert reader.read_all() == b"booting\n/mypath/foo.c:1:test_1:PASS\n" \
+                                b"some log output\n/mypath/foo.c:2:test_2:FAIL\nOK\n"
+
+
+def test_capture_lines_should_stream_across_segments(tmp_path: Path):
+    capture_file = tmp_path / "capture.gz"
+    lines = [f"/mypath/foo.c:{idx}:test_{idx}:PASS {'x' * 100}\n".encode()
+             for idx in range(30000)]
+
+    with CaptureWriter(capture_file) as writer:
+        for idx, line in enumerate(lines):
+            # split lines across segments to exercise partial lines
+            writer.write(line[:10])
+            if idx % 1000 == 0:
+                writer.mark(f"test_{idx}")
+            writer.write(line[10:])
+
+    reader = CaptureReader(capture_file)
+
+    assert list(reader.iter_lines()) == lines
+
+
+def test_capture_is_a_standard_gzip_stream(tmp_path: Path):
+    import gzip
+
+    capture_file = tmp_path / "capture.gz"
+    with CaptureWriter(capture_file) as writer:
+        writer.write(b"line 1\n")
+        writer.mark("a")
+        writer.write(b"line 2\n")
+
+    with gzip.open(capture_file, "rb") as fi:
+        assert fi.read() == b"line 1\nline 2\n"
+
+
+def test_capture_zstd_round_trip(tmp_path: Path):
+    pytest.importorskip("zstandard")
+    capture_file = tmp_path / "capture.zst"
+
+    with CaptureWriter(capture_file, compression="zstd") as writer:
+        writer.write(b"line 1\n")
+        writer.mark("a")
+        writer.write(b"line 2\n")
+
+    reader = CaptureReader(capture_file)
+    assert reader.read_segment(reader.find("a")[0]) == b"line 1\n"
+    assert reader.read_all() == b"line 1\nline 2\n"
+
+
+def test_cli_capture_can_be_replayed_per_test(sample_file_all_pass: Path,
+                                              builtins_args: List[str],
+                                              cli_runner: CliRunner,
+                                              cli_entry: Group,
+                                              tmp_path: Path):
+    capture_file = tmp_path / "capture.gz"
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        f'--capture={capture_file}',
+        'lnull',
+        'cfile',
+        f'--file={sample_file_all_pass}',
+        'punity',
+        'rexit',
+    ])
+
+    assert result.exit_code == 0
+    assert index_path_for(capture_file).exists()
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        'lnull',
+        'ccapture',
+        f'--file={capture_file}',
+        '--label=/mypath/foo.c::test_2',
+        'punity',
+        'rexit',
+        '--fail-on-empty'
+    ])
+
+    assert result.exit_code == 0
+    assert "test_2:PASS" in result.output
+    assert "test_1:PASS" not in result.output
+
+
+def test_cli_capture_should_reject_parallel_parsing(sample_file_all_pass: Path,
+                                                    builtins_args: List[str],
+                                                    cli_runner: CliRunner,
+                                                    cli_entry: Group,
+                                                    tmp_path: Path):
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        f'--capture={tmp_path / "capture.gz"}',
+        'lnull',
+        'cfile',
+        f'--file={sample_file_all_pass}',
+        'punity',
+        '--workers=2',
+        'rexit',
+    ])
+
+    assert result.exit_code == 2
+    assert "--workers cannot be used with --capture." in result.output
@@ -0,0 +1,78 @@
+import socket
+import threading
+from types import SimpleNamespace
+from typing import List, Iterator
+
+import pytest
+
+from pyetta.collectors import SocketCollector, RTTCollector
+
+
+@pytest.fixture()
+def socket_server() -> Iterator[SimpleNamespace]:
+    """Local stand-in for a device streaming output over TCP. Sends everything queued in
+    ``server.data`` to the first client, then closes the connection."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("localhost", 0))
+    listener.listen(1)
+    server = SimpleNamespace(port=listener.getsockname()[1], data=[])
+    ready = threading.Event()
+
+    def serve():
+        connection, _ = listener.accept()
+        with connection:
+            ready.wait()
+            for data in server.data:
+                connection.sendall(data)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    server.ready = ready
+    yield server
+    ready.set()
+    thread.join(timeout=5)
+    listener.close()
+
+
+def test_socket_collector_should_split_stream_into_lines(socket_server: SimpleNamespace):
+    socket_server.data.extend([b"/mypath/foo.c:1:test_1:PA",
+                               b"SS\n/mypath/foo.c:2:test_2:PASS\nOK"])
+    socket_server.ready.set()
+
+    with SocketCollector("localhost", socket_server.port, timeout_s=2) as collector:
+        chunks = [collector.read_chunk() for _ in range(4)]
+
+    assert chunks == [b"/mypath/foo.c:1:test_1:PASS\n", b"/mypath/foo.c:2:test_2:PASS\n",
+                      b"OK", b""]
+
+
+def test_socket_collector_should_return_empty_on_timeout(socket_server: SimpleNamespace):
+    with SocketCollector("localhost", socket_server.port, timeout_s=0.1) as collector:
+        assert collector.read_chunk() == b""
+
+
+class FakeUpChannel:
+    def __init__(self, reads: List[bytes]):
+        self._reads = reads
+
+    def read(self) -> bytes:
+        return self._reads.pop(0) if self._reads else b""
+
+
+def test_rtt_collector_should_read_from_loader_session(monkeypatch):
+    from pyocd.debug import rtt
+
+    target = object()
+    channel = FakeUpChannel([b"/mypath/foo.c:1:test_1:PASS\nOK", b"", b"\n"])
+
+    def from_target(given_target, address=None, size=None):
+        assert given_target is target
+        return SimpleNamespace(start=lambda: None, up_channels=[channel])
+
+    monkeypatch.setattr(rtt.RTTControlBlock, "from_target", from_target)
+    loader = SimpleNamespace(session=SimpleNamespace(target=target))
+
+    collector = RTTCollector(loader, channel=0, timeout_s=1)
+
+    assert collector.read_chunk() == b"/mypath/foo.c:1:test_1:PASS\n"
+    assert collector.read_chunk() == b"OK\n"
@@ -0,0 +1,244 @@
+import json
+import shlex
+import sys
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List
+
+from click import Group
+from click.testing import CliRunner
+
+import pyetta.cli.cli as cli_module
+from pyetta.cli.config import PipelineConfig, StageConfig
+
+PIPELINE_TOML = """
+[[stages]]
+stage = "lnull"
+
+[[stages]]
+stage = "cfile"
+file = "{{sample[file]}}"
+
+[[stages]]
+stage = "punity"
+name = "suite_{{sample[name]}}"
+
+[[stages]]
+stage = "rjunitxml"
+file = "{{sample[name]}}.xml"
+
+[[stages]]
+stage = "rexit"
+fail-on-skipped = true
+
+[matrix]
+sample = [{samples}]
+"""
+
+
+def _write_config(tmp_path: Path, samples: List[Path]) -> Path:
+    entries = ", ".join(f'{{ name = "{idx}", file = "{sample.as_posix()}" }}'
+                        for idx, sample in enumerate(samples))
+    config_path = tmp_path / "pipeline.toml"
+    config_path.write_text(PIPELINE_TOML.format(samples=entries))
+    return config_path
+
+
+def test_config_should_run_single_plan(sample_file_all_pass: Path,
+                                       builtins_args: List[str],
+                                       cli_runner: CliRunner,
+                                       cli_entry: Group,
+                                       tmp_path: Path):
+    config_path = _write_config(tmp_path, [sample_file_all_pass])
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [f"--config={config_path}"])
+
+    assert result.exit_code == 0
+    assert Path("0.xml").exists()
+
+
+def test_config_matrix_should_run_each_plan(sample_file_all_pass: Path,
+                                            sample_file_ignores: Path,
+                                            builtins_args: List[str],
+                                            cli_runner: CliRunner,
+                                            cli_entry: Group,
+                                            tmp_path: Path):
+    config_path = _write_config(tmp_path, [sample_file_all_pass, sample_file_ignores])
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [f"--config={config_path}"])
+
+    # the skipped test of the second sample fails the run
+    assert result.exit_code == 1
+    assert Path("0.xml").exists()
+    assert Path("1.xml").exists()
+
+
+def test_config_should_reject_unknown_options(sample_file_all_pass: Path,
+                                              builtins_args: List[str],
+                                              cli_runner: CliRunner,
+                                              cli_entry: Group,
+                                              tmp_path: Path):
+    config_path = tmp_path / "pipeline.yaml"
+    config_path.write_text("stages:\n"
+                           "  - stage: lnull\n"
+                           "  - stage: cfile\n"
+                           "    path: foo.txt\n")
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [f"--config={config_path}"])
+
+    assert result.exit_code != 0
+    assert "Unknown options for stage 'cfile': path." in result.output
+
+
+def test_config_should_not_combine_with_stages(sample_file_all_pass: Path,
+                                               builtins_args: List[str],
+                                               cli_runner: CliRunner,
+                                               cli_entry: Group,
+                                               tmp_path: Path):
+    config_path = _write_config(tmp_path, [sample_file_all_pass])
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [f"--config={config_path}", "lnull"])
+
+    assert result.exit_code == 2
+
+
+def test_config_without_stages_should_be_a_usage_error(builtins_args: List[str],
+                                                       cli_runner: CliRunner,
+                                                       cli_entry: Group):
+    result = cli_runner.invoke(cli_entry, builtins_args + ["-v"])
+
+    assert result.exit_code == 2
+    assert "No stages given" in result.output
+
+
+def test_config_matrix_should_run_plans_of_a_board_one_at_a_time(sample_file_all_pass: Path,
+                                                                 builtins_args: List[str],
+                                                                 cli_runner: CliRunner,
+                                                                 cli_entry: Group,
+                                                                 tmp_path: Path,
+                                                                 monkeypatch):
+    config_path = tmp_path / "pipeline.toml"
+    config_path.write_text(f"""
+[[stages]]
+stage = "lnull"
+
+[[stages]]
+stage = "cfile"
+file = "{sample_file_all_pass.as_posix()}"
+
+[[stages]]
+stage = "punity"
+
+[[stages]]
+stage = "rjunitxml"
+file = "{{board}}-{{firmware}}.xml"
+
+[matrix]
+firmware = ["app", "bootloader"]
+board = ["a", "b"]
+""")
+    lock = threading.Lock()
+    running: Dict[str, int] = {"a": 0, "b": 0}
+    overlaps: List[str] = list()
+    current = threading.local()
+
+    def build_config_plan(context, stages, variables):
+        with lock:
+            running[variables["board"]] += 1
+            if running[variables["board"]] > 1:
+                overlaps.append(variables["board"])
+        current.board = variables["board"]
+        return original_build(context, stages, variables)
+
+    def run_plan(context, plan, interactive=True):
+        try:
+            time.sleep(0.05)
+            return original_run(context, plan, interactive=interactive)
+        finally:
+            with lock:
+                running[current.board] -= 1
+
+    original_build = cli_module.build_config_plan
+    original_run = cli_module._run_plan
+    monkeypatch.setattr(cli_module, "build_config_plan", build_config_plan)
+    monkeypatch.setattr(cli_module, "_run_plan", run_plan)
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [f"--config={config_path}"])
+
+    assert result.exit_code == 0
+    assert overlaps == []
+    for name in ("a-app", "a-bootloader", "b-app", "b-bootloader"):
+        assert Path(f"{name}.xml").exists()
+
+
+def test_pipeline_config_should_group_sequential_entries():
+    config = PipelineConfig(stages=[StageConfig("lnull")],
+                            matrix={"firmware": ["x", "y"], "board": [{"n": 1}, {"n": 2}]})
+
+    assert config.sequential_groups() == [
+        [{"firmware": "x", "board": {"n": 1}}, {"firmware": "y", "board": {"n": 1}}],
+        [{"firmware": "x", "board": {"n": 2}}, {"firmware": "y", "board": {"n": 2}}],
+    ]
+    assert len(replace(config, sequential=[]).sequential_groups()) == 4
+
+
+LEMU_TOML = """
+sequential = []
+
+[[stages]]
+stage = "lemu"
+firmware = "{{image}}"
+command = {command}
+
+[[stages]]
+stage = "cemu"
+
+[[stages]]
+stage = "punity"
+name = "{suite}"
+
+[[stages]]
+stage = "rexit"
+
+[matrix]
+image = {images}
+"""
+
+
+def _write_lemu_config(tmp_path: Path, suite: str) -> Path:
+    image = tmp_path / "image.txt"
+    image.write_text("/mypath/foo.c:1:test_1:PASS\nOK\n")
+    command = [sys.executable, "-c", "import sys; sys.stdout.write(open(sys.argv[1]).read())",
+               "{firmware}", "--filter={filter}", "--groups={groups}", "--resume={resume}"]
+    config_path = tmp_path / "pipeline.toml"
+    # JSON strings and arrays are valid TOML values
+    config_path.write_text(LEMU_TOML.format(
+        command=json.dumps(" ".join(shlex.quote(arg) for arg in command)),
+        suite=suite, images=json.dumps([image.as_posix()])))
+    return config_path
+
+
+def test_config_should_keep_emulator_placeholders(builtins_args: List[str],
+                                                  cli_runner: CliRunner,
+                                                  cli_entry: Group,
+                                                  tmp_path: Path):
+    config_path = _write_lemu_config(tmp_path, "suite_{{image}}")
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [f"--config={config_path}"])
+
+    assert result.exit_code == 0, result.output
+    assert "test_1:PASS" in result.output
+
+
+def test_config_invalid_placeholder_should_be_a_usage_error(builtins_args: List[str],
+                                                            cli_runner: CliRunner,
+                                                            cli_entry: Group,
+                                                            tmp_path: Path):
+    config_path = _write_lemu_config(tmp_path, "suite_{image[0]:>x}")
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [f"--config={config_path}"])
+
+    assert result.exit_code == 2
+    assert "Option 'name' of stage 'punity': Invalid placeholder {image[0]:>x}" in result.output
@@ -0,0 +1,106 @@
+import time
+from pathlib import Path
+from typing import List
+
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.cli.console import SampledEcho, BufferedEcho
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def test_buffered_echo_should_only_flush_on_interval(capsys):
+    clock = FakeClock()
+    echo = BufferedEcho(interval_s=1.0, clock=clock)
+
+    echo.on_chunk(b"line 1\n", [])
+    echo.on_chunk(b"line 2\n", [])
+    assert capsys.readouterr().out == ""
+
+    clock.time = 1.0
+    echo.on_chunk(b"line 3\n", [])
+    assert capsys.readouterr().out == "line 1\nline 2\nline 3\n"
+
+
+def test_sampled_echo_should_drop_lines_over_rate(capsys):
+    clock = FakeClock()
+    echo = SampledEcho(interval_s=1.0, rate=2, clock=clock)
+
+    for idx in range(5):
+        echo.on_chunk(f"line {idx}\n".encode(), [])
+    echo.flush()
+
+    assert capsys.readouterr().out == "line 0\nline 1\n[pyetta] 3 lines not shown.\n"
+
+
+def test_cli_echo_failures_should_only_show_failures(builtins_args: List[str],
+                                                     cli_runner: CliRunner,
+                                                     cli_entry: Group,
+                                                     tmp_path: Path):
+    sample_file = tmp_path / "sample.txt"
+    sample_file.write_text("/mypath/foo.c:1:test_1:PASS\n"
+                           "/mypath/foo.c:2:test_2:FAIL:Expected 1 Was 2\n"
+                           "FAIL\n")
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        '--echo=failures',
+        'lnull',
+        'cfile',
+        f'--file={sample_file}',
+        'punity',
+        'rexit',
+    ])
+
+    assert result.exit_code == 1
+    assert "test_2:FAIL" in result.output
+    assert "test_1:PASS" not in result.output
+
+
+def test_cli_echo_off_should_not_show_output(sample_file_all_pass: Path,
+                                             builtins_args: List[str],
+                                             cli_runner: CliRunner,
+                                             cli_entry: Group):
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        '--echo=off',
+        'lnull',
+        'cfile',
+        f'--file={sample_file_all_pass}',
+        'punity',
+        'rexit',
+    ])
+
+    assert result.exit_code == 0
+    assert "PASS" not in result.output
+
+
+def test_buffered_echo_should_flush_held_output_without_new_chunks(capsys):
+    clock = FakeClock()
+    echo = BufferedEcho(interval_s=1.0, clock=clock)
+
+    echo.on_chunk(b"Running test_hang...\n", [])
+    echo.flush_due()
+    assert capsys.readouterr().out == ""
+
+    clock.time = 5.0
+    echo.flush_due()
+    assert capsys.readouterr().out == "Running test_hang...\n"
+
+
+def test_buffered_echo_should_flush_in_background(capsys):
+    with BufferedEcho(interval_s=0.2) as echo:
+        echo.on_chunk(b"Running test_hang...\n", [])
+        assert capsys.readouterr().out == ""
+        deadline = time.monotonic() + 5
+        output = ""
+        while "test_hang" not in output and time.monotonic() < deadline:
+            time.sleep(0.01)
+            output += capsys.readouterr().out
+
+    assert output == "Running test_hang...\n"
@@ -0,0 +1,162 @@
+import io
+import shlex
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Optional, Callable, Sequence, List
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.collectors import IOBaseCollector
+from pyetta.crash import CrashDetector, CRASH_KEY
+from pyetta.loaders import Loader
+from pyetta.parser_data import TestResult
+from pyetta.parsers import UnityParser, Parser
+from pyetta.pipeline import Pipeline
+from pyetta.reporters import ExitCodeReporter
+
+TESTS = ["test_a", "test_b", "test_c", "test_d", "test_e"]
+
+
+class CrashingDevice(Loader):
+    """Simulates a test runner whose device resets when running some of its tests."""
+
+    def __init__(self, collector_io: io.BytesIO, crashing: Sequence[str],
+                 resumable: bool = True, banner: bool = True):
+        self._collector_io = collector_io
+        self._crashing = set(crashing)
+        self._resumable = resumable
+        self._banner = banner
+        self._skip: Optional[int] = None
+        self.starts: List[Optional[int]] = list()
+
+    def load_to_device(self, progress: Optional[Callable[[int], None]] = None) -> None:
+        pass
+
+    def reset_device(self) -> None:
+        pass
+
+    def set_resume_point(self, skip: Optional[int]) -> bool:
+        self._skip = skip
+        return self._resumable
+
+    def start_program(self) -> None:
+        self.starts.append(self._skip)
+        output = [b"BOOT v1.0"] if self._banner else []
+        for idx, name in enumerate(TESTS[self._skip or 0:], self._skip or 0):
+            output.append(f"START:{name}".encode())
+            if name in self._crashing:
+                # the device resets, printing its banner and running from the first test
+                if self._banner:
+                    output.extend([b"BOOT v1.0", f"START:{TESTS[0]}".encode()])
+                break
+            output.append(f"/mypath/foo.c:{idx}:{name}:PASS".encode())
+        else:
+            output.append(b"OK")
+        self._collector_io.seek(0)
+        self._collector_io.truncate()
+        self._collector_io.write(b"\n".join(output) + b"\n")
+        self._collector_io.seek(0)
+
+
+def _create_pipeline(loader: CrashingDevice, collector_io: io.BytesIO,
+                     detector: CrashDetector) -> Pipeline:
+    return Pipeline(loader, IOBaseCollector(collector_io), parser_factory=partial(UnityParser),
+                    reporters=[ExitCodeReporter()], crash_detector=detector)
+
+
+def test_pipeline_should_resume_after_crash():
+    collector_io = io.BytesIO()
+    loader = CrashingDevice(collector_io, crashing=["test_b", "test_d"])
+    detector = CrashDetector(boot_pattern=rb"^BOOT", test_start_pattern=rb"^START:(?P<name>\w+)")
+
+    result = _create_pipeline(loader, collector_io, detector).run()
+
+    assert [(test_case.name, test_case.result) for test_case in result.test_cases] == [
+        ("test_a", TestResult.Pass), ("test_b", TestResult.Fail),
+        ("test_c", TestResult.Pass), ("test_d", TestResult.Fail),
+        ("test_e", TestResult.Pass)]
+    assert result.test_cases[1].extra[CRASH_KEY] == "device reset"
+    assert loader.starts == [None, 2, 4]
+    assert result.exit_code == 1
+
+
+def test_pipeline_should_stop_resuming_after_max_restarts():
+    collector_io = io.BytesIO()
+    loader = CrashingDevice(collector_io, crashing=["test_b", "test_d"])
+    detector = CrashDetector(boot_pattern=rb"^BOOT", test_start_pattern=rb"^START:(?P<name>\w+)",
+                             max_restarts=1)
+
+    result = _create_pipeline(loader, collector_io, detector).run()
+
+    assert [test_case.name for test_case in result.test_cases] == \
+           ["test_a", "test_b", "test_c", "test_d"]
+    assert loader.starts == [None, 2]
+
+
+def test_pipeline_should_record_crash_without_resume_support():
+    collector_io = io.BytesIO()
+    loader = CrashingDevice(collector_io, crashing=["test_c"], resumable=False)
+    detector = CrashDetector(boot_pattern=rb"^BOOT")
+
+    result = _create_pipeline(loader, collector_io, detector).run()
+
+    assert [test_case.name for test_case in result.test_cases] == \
+           ["test_a", "test_b", "device_crash"]
+    assert result.test_cases[-1].group == Parser.RESERVED_TEST_GROUP
+    assert result.test_cases[-1].result_message == \
+           "Device crashed after test 'test_b' (device reset)."
+    assert loader.starts == [None]
+
+
+def test_pipeline_should_detect_output_stopping():
+    collector_io = io.BytesIO()
+    loader = CrashingDevice(collector_io, crashing=["test_a"], banner=False)
+
+    result = _create_pipeline(loader, collector_io, CrashDetector()).run()
+
+    assert [test_case.name for test_case in result.test_cases] == \
+           ["device_crash", "test_b", "test_c", "test_d", "test_e"]
+    assert result.test_cases[0].extra[CRASH_KEY] == "output stopped"
+
+
+def test_pipeline_resume_without_factory_should_raise():
+    with pytest.raises(ValueError):
+        Pipeline(CrashingDevice(io.BytesIO(), crashing=[]), IOBaseCollector(io.BytesIO()),
+                 parser=UnityParser(), crash_detector=CrashDetector())
+
+
+# the "emulator" runs the tests listed in the firmware, exiting on tests named "crash"
+EMULATOR_SCRIPT = """
+import sys
+tests = open(sys.argv[1]).read().split()
+skip = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+for idx, name in enumerate(tests[skip:], skip):
+    print("START:" + name, flush=True)
+    if name.startswith("crash"):
+        sys.exit(3)
+    print(f"/mypath/foo.c:{idx}:{name}:PASS", flush=True)
+print("OK")
+"""
+
+
+def test_cli_should_resume_emulator_after_crash(builtins_args: List[str],
+                                                cli_runner: CliRunner,
+                                                cli_entry: Group,
+                                                tmp_path: Path):
+    firmware = tmp_path / "firmware.txt"
+    firmware.write_text("test_a crash_b test_c")
+    command = [sys.executable, "-c", EMULATOR_SCRIPT, "{firmware}", "{resume}"]
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        '--detect-crashes', '--test-start=^START:(?P<name>\\w+)',
+        'lemu', f'--firmware={firmware}',
+        f'--command={" ".join(shlex.quote(arg) for arg in command)}',
+        'cemu', 'punity', 'rexit',
+    ])
+
+    assert "resuming test runner" in result.output
+    assert "test_c:PASS" in result.output
+    assert result.exit_code == 1
@@ -0,0 +1,168 @@
+import json
+import threading
+from pathlib import Path
+from typing import List
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+import pyetta.discovery as discovery
+from pyetta.discovery import Board, DiscoveryCache, pair_boards, read_aliases
+
+BOARDS = [Board("000683012345", "J-Link nRF52", ("/dev/ttyACM0",)),
+          Board("000683054321", "J-Link nRF52", ("/dev/ttyACM2",)),
+          Board("0240000034", "DAPLink K64F")]
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Discover:
+    def __init__(self, boards: List[Board]) -> None:
+        self.boards = boards
+        self.calls = 0
+
+    def __call__(self) -> List[Board]:
+        self.calls += 1
+        return list(self.boards)
+
+
+def test_pair_boards_should_match_ports_by_serial_number():
+    boards = pair_boards(
+        [("000683012345", "J-Link"), ("0240000034", "DAPLink"), ("ABC", "ST-Link")],
+        [("/dev/ttyACM1", "683012345"), ("/dev/ttyACM0", "000683012345"),
+         ("/dev/ttyACM2", "0240000034"), ("/dev/ttyS0", None), ("/dev/ttyACM3", "abc")])
+
+    assert boards == [Board("000683012345", "J-Link", ("/dev/ttyACM0", "/dev/ttyACM1")),
+                      Board("0240000034", "DAPLink", ("/dev/ttyACM2",)),
+                      Board("ABC", "ST-Link", ("/dev/ttyACM3",))]
+    assert boards[0].port == "/dev/ttyACM0"
+    assert Board("1").port is None
+
+
+def test_discovery_cache_should_rediscover_after_ttl(tmp_path: Path):
+    clock = _Clock()
+    discover = _Discover(BOARDS)
+    cache = DiscoveryCache(tmp_path / "boards.json", ttl_s=10, discover=discover, clock=clock)
+
+    assert cache.boards() == BOARDS
+    clock.now += 9
+    assert cache.boards() == BOARDS
+    assert discover.calls == 1
+    clock.now += 1
+    cache.boards()
+    assert discover.calls == 2
+    cache.boards(refresh=True)
+    assert discover.calls == 3
+
+
+def test_discovery_cache_should_share_boards_through_file(tmp_path: Path):
+    clock = _Clock()
+    first = _Discover(BOARDS)
+    second = _Discover([])
+    DiscoveryCache(tmp_path / "boards.json", ttl_s=10, discover=first, clock=clock).boards()
+
+    cache = DiscoveryCache(tmp_path / "boards.json", ttl_s=10, discover=second, clock=clock)
+    assert cache.boards() == BOARDS
+    assert second.calls == 0
+
+    clock.now += 10
+    assert cache.boards() == []
+    assert second.calls == 1
+    cache.invalidate()
+    assert not (tmp_path / "boards.json").exists()
+
+
+def test_discovery_cache_should_ignore_corrupt_file(tmp_path: Path):
+    (tmp_path / "boards.json").write_text("{not json")
+    discover = _Discover(BOARDS)
+    cache = DiscoveryCache(tmp_path / "boards.json", discover=discover)
+
+    assert cache.boards() == BOARDS
+    assert json.loads((tmp_path / "boards.json").read_text())["boards"][0]["unique_id"] == \
+        BOARDS[0].unique_id
+
+
+def test_discovery_cache_should_discover_once_across_threads():
+    discover = _Discover(BOARDS)
+    cache = DiscoveryCache(None, discover=discover)
+    threads = [threading.Thread(target=cache.boards) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert discover.calls == 1
+
+
+def test_discovery_cache_should_resolve_aliases_and_prefixes():
+    cache = DiscoveryCache(None, aliases={"nrf52_b": "000683054321"},
+                           discover=_Discover(BOARDS))
+
+    assert cache.resolve("nrf52_b") is BOARDS[1]
+    assert cache.resolve("000683012345") is BOARDS[0]
+    assert cache.resolve("0240") is BOARDS[2]
+    with pytest.raises(ValueError, match="matches 2 boards"):
+        cache.resolve("000683")
+
+
+def test_discovery_cache_should_rediscover_unknown_board():
+    clock = _Clock()
+    discover = _Discover(BOARDS[:1])
+    cache = DiscoveryCache(None, discover=discover, clock=clock)
+    cache.boards()
+
+    discover.boards = BOARDS
+    assert cache.resolve("0240000034") is BOARDS[2]
+    assert discover.calls == 2
+    with pytest.raises(ValueError, match="No connected board matches 'missing'"):
+        cache.resolve("missing")
+    assert discover.calls == 3
+
+
+def test_read_aliases_should_reject_invalid_file(tmp_path: Path):
+    aliases = tmp_path / "aliases.json"
+    aliases.write_text('{"nrf52_a": "000683012345"}')
+    assert read_aliases(aliases) == {"nrf52_a": "000683012345"}
+
+    aliases.write_text('["000683012345"]')
+    with pytest.raises(ValueError):
+        read_aliases(aliases)
+
+
+def test_cli_should_report_board_without_serial_port(builtins_args: List[str],
+                                                     cli_runner: CliRunner,
+                                                     cli_entry: Group,
+                                                     tmp_path: Path,
+                                                     monkeypatch):
+    aliases = tmp_path / "aliases.json"
+    aliases.write_text('{"k64f": "0240000034"}')
+    monkeypatch.setattr(discovery, "DEFAULT_CACHE_PATH", tmp_path / "boards.json")
+    monkeypatch.setattr(discovery, "discover_boards", lambda: list(BOARDS))
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        f'--board-aliases={aliases}', 'lnull', 'cserial', '--board=k64f', 'punity', 'rexit'])
+
+    assert result.exit_code == 1
+    assert "Board 'k64f' has no serial port." in result.output
+
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        'lnull', 'cserial', '--board=missing', 'punity', 'rexit'])
+
+    assert result.exit_code == 1
+    assert "No connected board matches 'missing'." in result.output
+
+
+def test_cli_should_require_serial_port_or_board(builtins_args: List[str],
+                                                 cli_runner: CliRunner,
+                                                 cli_entry: Group):
+    result = cli_runner.invoke(cli_entry, builtins_args + ['lnull', 'cserial', 'punity', 'rexit'])
+
+    assert result.exit_code == 2
+    assert "Exactly one of --port and --board must be given." in result.output
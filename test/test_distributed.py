@@ -0,0 +1,245 @@
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Iterator, Tuple
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.distributed import AgentServer, AgentClient, Coordinator, Job, JobResult, \
+    AgentError, AGENT_KEY, parse_address
+from pyetta.parser_data import TestCase, TestResult
+
+EMULATOR_COMMAND = [sys.executable, "-c",
+                    "import sys; sys.stdout.write(open(sys.argv[1]).read())",
+                    "{firmware}"]
+
+
+def _fake_job(job: Job, on_test_case) -> int:
+    on_test_case(TestCase(name=f"test_{job.variables['firmware']}", result=TestResult.Pass))
+    return 0
+
+
+def _serve(name: str, stages=None, run_job=_fake_job, token=None) -> AgentServer:
+    server = AgentServer(name, stages or {"Loaders": ["lemu"], "Collectors": ["cemu"]}, run_job,
+                         port=0, token=token)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server
+
+
+@pytest.fixture()
+def agents() -> Iterator[List[AgentServer]]:
+    servers = [_serve("a"), _serve("b"), _serve("serial_only", {"Collectors": ["cserial"]})]
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.close()
+
+
+def test_parse_address():
+    assert parse_address("lab1:9000") == ("lab1", 9000)
+    assert parse_address("lab1") == ("lab1", 7420)
+    assert parse_address("[::1]:9000") == ("::1", 9000)
+    with pytest.raises(ValueError):
+        parse_address("lab1:port")
+
+
+def test_coordinator_should_run_jobs_on_capable_agents(agents: List[AgentServer]):
+    clients = [AgentClient(server.address) for server in agents]
+    groups = [[Job(stages=[{"stage": "lemu"}, {"stage": "cemu"}],
+                   variables={"firmware": idx})] for idx in range(6)]
+    results: List[Tuple[Job, JobResult]] = list()
+
+    Coordinator(clients).run(groups, lambda job, result: results.append((job, result)))
+
+    assert sorted(job.variables["firmware"] for job, _ in results) == list(range(6))
+    assert all(result.test_cases[0].name == f"test_{job.variables['firmware']}"
+               for job, result in results)
+    assert {result.test_cases[0].extra[AGENT_KEY] for _, result in results} <= {"a", "b"}
+
+
+def test_coordinator_should_fail_jobs_no_agent_can_run(agents: List[AgentServer]):
+    clients = [AgentClient(server.address) for server in agents]
+    pinned = Job(stages=[{"stage": "cemu"}], variables={"firmware": 0, "agent": "b"})
+    unknown = Job(stages=[{"stage": "lpyocd"}], variables={"firmware": 1})
+    results = dict()
+
+    Coordinator(clients).run([[pinned], [unknown]], lambda job, result: results.update(
+        {job.variables["firmware"]: result}))
+
+    assert results[0].test_cases[0].extra[AGENT_KEY] == "b"
+    assert results[1].exit_code == 1
+    assert results[1].error == "No agent available to run the job."
+
+
+class _LostClient(AgentClient):
+    """Client whose agent is lost once the other agent has finished its group, and is idle."""
+
+    def __init__(self, address, other_done: threading.Event) -> None:
+        super(_LostClient, self).__init__(address)
+        self.other_done = other_done
+
+    def run(self, job: Job, on_test_case=None) -> JobResult:
+        self.other_done.wait(timeout=10)
+        time.sleep(0.2)
+        raise ConnectionResetError("Connection reset by peer")
+
+
+def test_coordinator_should_requeue_group_of_lost_agent_to_idle_agent():
+    other_done = threading.Event()
+    jobs_run = list()
+
+    def job_done(job: Job, on_test_case) -> int:
+        jobs_run.append(job)
+        if len(jobs_run) == 2:
+            other_done.set()
+        return _fake_job(job, on_test_case)
+
+    lost, idle = _serve("lost"), _serve("idle", run_job=job_done)
+    try:
+        groups = [[Job(stages=[{"stage": "lemu"}], variables={"firmware": idx})
+                   for idx in range(first, first + 2)] for first in (0, 2)]
+        results = dict()
+        Coordinator([_LostClient(lost.address, other_done), AgentClient(idle.address)]).run(
+            groups, lambda job, result: results.update({job.variables["firmware"]: result}))
+
+        assert sorted(results) == [0, 1, 2, 3]
+        assert all(result.exit_code == 0 and result.test_cases[0].extra[AGENT_KEY] == "idle"
+                   for result in results.values())
+    finally:
+        for server in (lost, idle):
+            server.shutdown()
+            server.close()
+
+
+def test_agent_should_reject_invalid_token():
+    server = _serve("secure", token="secret")
+    try:
+        with pytest.raises(AgentError):
+            AgentClient(server.address, token="wrong").hello()
+        assert AgentClient(server.address, token="secret").hello().name == "secure"
+    finally:
+        server.shutdown()
+        server.close()
+
+
+def test_agent_should_require_token_beyond_local_host():
+    with pytest.raises(ValueError, match="agent token is required"):
+        AgentServer("open", {"Loaders": ["lemu"]}, _fake_job, host="0.0.0.0", port=0)
+
+
+def test_agent_should_reject_stages_it_does_not_allow(agents: List[AgentServer]):
+    client = AgentClient(agents[0].address)
+    for stages in ([{"stage": "lemu"}, {"stage": "rjunitxml", "file": "out.xml"}],
+                   [{"stage": "cserial", "port": "/dev/ttyACM0"}]):
+        with pytest.raises(AgentError, match="not allowed on agent 'a'"):
+            client.run(Job(stages=stages, variables={"firmware": 0}))
+
+
+def test_cli_serve_should_refuse_unsafe_agents(builtins_args: List[str],
+                                               cli_runner: CliRunner,
+                                               cli_entry: Group):
+    result = cli_runner.invoke(cli_entry, builtins_args + ["--serve=0.0.0.0:0"])
+    assert result.exit_code == 2
+    assert "Give one with --agent-token." in result.output
+
+    result = cli_runner.invoke(cli_entry, builtins_args + ["--serve=127.0.0.1:0",
+                                                           "--agent-stages=rexit"])
+    assert result.exit_code == 2
+    assert "--agent-stages rexit are not loader, collector or parser stages." in result.output
+
+
+def test_agent_job_error_should_fail_job():
+    def failing_job(job: Job, on_test_case) -> int:
+        raise RuntimeError("Probe not found.")
+
+    server = _serve("broken", run_job=failing_job)
+    try:
+        results: List[JobResult] = list()
+        Coordinator([AgentClient(server.address)]).run(
+            [[Job(stages=[{"stage": "lemu"}])]], lambda job, result: results.append(result))
+        assert results[0].exit_code == 1
+        assert "Probe not found." in results[0].error
+    finally:
+        server.shutdown()
+        server.close()
+
+
+@pytest.fixture()
+def agent_processes(builtins_filepath: Path) -> Iterator[List[str]]:
+    """Runs agents as separate pyetta processes on the local host."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(Path(__file__).parent.parent.resolve()),
+                                         env.get("PYTHONPATH", "")])
+    processes = [subprocess.Popen([sys.executable, "-m", "pyetta",
+                                   f"--extras={builtins_filepath}", "--serve=127.0.0.1:0",
+                                   f"--agent-name=agent_{idx}", "--agent-token=lab"],
+                                  stderr=subprocess.PIPE, env=env)
+                 for idx in range(3)]
+    addresses = list()
+    try:
+        for process in processes:
+            banner = process.stderr.readline().decode()
+            assert "listening on" in banner, banner
+            addresses.append(banner.split("listening on ")[1].split(",")[0])
+        yield addresses
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+            process.stderr.close()
+
+
+def test_cli_should_distribute_plans_across_agents(agent_processes: List[str],
+                                                   builtins_args: List[str],
+                                                   cli_runner: CliRunner,
+                                                   cli_entry: Group,
+                                                   tmp_path: Path):
+    firmware = list()
+    for idx in range(4):
+        image = tmp_path / f"image_{idx}.txt"
+        result = "FAIL" if idx == 3 else "PASS"
+        image.write_text(f"/mypath/foo.c:1:test_{idx}:{result}\nOK\n")
+        firmware.append(image.as_posix())
+    command = " ".join(shlex.quote(arg) for arg in EMULATOR_COMMAND)
+    config_path = tmp_path / "pipeline.toml"
+    # JSON strings and arrays are valid TOML values
+    config_path.write_text(f"""
+sequential = []
+
+[[stages]]
+stage = "lemu"
+firmware = "{{firmware}}"
+command = {json.dumps(command)}
+
+[[stages]]
+stage = "cemu"
+
+[[stages]]
+stage = "punity"
+
+[[stages]]
+stage = "rjunitxml"
+file = "{{firmware}}.xml"
+
+[[stages]]
+stage = "rexit"
+
+[matrix]
+firmware = {json.dumps(firmware)}
+""")
+    agents = [f"--agents={address}" for address in agent_processes]
+
+    result = cli_runner.invoke(cli_entry, builtins_args + agents + [
+        "--agent-token=lab", f"--config={config_path}"])
+
+    assert result.exit_code == 1, result.output
+    for image in firmware:
+        assert f"test_{Path(image).stem[-1]}" in Path(f"{image}.xml").read_text()
+    assert result.output.count("ran 1 tests") == 4
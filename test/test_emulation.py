@@ -0,0 +1,70 @@
+import shlex
+import sys
+from functools import partial
+from pathlib import Path
+from typing import List
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.emulation import EmulatorPool
+from pyetta.parser_data import TestResult
+from pyetta.parsers import UnityParser, Parser
+
+# the "emulator" used for testing just prints the firmware file, which contains unity output.
+EMULATOR_COMMAND = [sys.executable, "-c",
+                    "import sys; sys.stdout.write(open(sys.argv[1]).read())",
+                    "{firmware}"]
+
+
+@pytest.fixture()
+def firmware_images(tmp_path: Path) -> List[Path]:
+    images = []
+    for idx in range(4):
+        image = tmp_path / f"image_{idx}.txt"
+        image.write_text(f"/mypath/foo.c:1:test_{idx}_a:PASS\n"
+                         f"/mypath/foo.c:2:test_{idx}_b:FAIL\n"
+                         "OK\n")
+        images.append(image)
+    return images
+
+
+def test_emulator_pool_should_run_all_images(firmware_images: List[Path]):
+    pool = EmulatorPool(EMULATOR_COMMAND, partial(UnityParser), max_instances=2)
+
+    results = pool.run(firmware_images)
+
+    assert list(results.keys()) == firmware_images
+    for idx, image in enumerate(firmware_images):
+        assert [test_case.name for test_case in results[image]] == \
+               [f"test_{idx}_a", f"test_{idx}_b"]
+        assert results[image][1].result == TestResult.Fail
+
+
+def test_emulator_pool_failed_image_should_not_stop_others(firmware_images: List[Path],
+                                                           tmp_path: Path):
+    missing_image = tmp_path / "missing.txt"
+    pool = EmulatorPool(EMULATOR_COMMAND, partial(UnityParser), max_instances=2)
+
+    results = pool.run([missing_image] + firmware_images)
+
+    assert results[missing_image][0].group == Parser.RESERVED_TEST_GROUP
+    assert all(len(results[image]) == 2 for image in firmware_images)
+
+
+def test_cli_emulator_stages(firmware_images: List[Path],
+                             builtins_args: List[str],
+                             cli_runner: CliRunner,
+                             cli_entry: Group):
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        'lemu',
+        f'--firmware={firmware_images[0]}',
+        f'--command={" ".join(shlex.quote(arg) for arg in EMULATOR_COMMAND)}',
+        'cemu',
+        'punity',
+        'rexit',
+    ])
+
+    assert "test_0_a:PASS" in result.output
+    assert result.exit_code == 1
@@ -0,0 +1,136 @@
+import threading
+from pathlib import Path
+from typing import List, Optional
+from unittest import mock
+
+import pytest
+from intelhex import IntelHex
+
+import pyetta.flash_cache as flash_cache
+from pyetta.flash_cache import FlashImageCache, merge_segments, plan_image, \
+    read_firmware_segments
+from pyetta.loaders import PyOCDDeviceLoader
+
+
+class _Region:
+    def __init__(self, start: int, length: int, sector_size: Optional[int]) -> None:
+        self.start = start
+        self.end = start + length - 1
+        self.sector_size = sector_size
+        self.is_flash = sector_size is not None
+
+
+class _MemoryMap:
+    def __init__(self, regions: List[_Region]) -> None:
+        self.regions = regions
+
+    def get_region_for_address(self, address: int) -> Optional[_Region]:
+        for region in self.regions:
+            if region.start <= address <= region.end:
+                return region
+        return None
+
+
+MEMORY_MAP = _MemoryMap([_Region(0x0, 0x10000, 0x1000), _Region(0x20000000, 0x1000, None)])
+
+
+def _write_hex(file_path: Path, segments) -> Path:
+    hex_file = IntelHex()
+    for address, data in segments:
+        hex_file.puts(address, data)
+    hex_file.write_hex_file(str(file_path))
+    return file_path
+
+
+def test_read_firmware_segments_should_read_hex(tmp_path: Path):
+    file_path = _write_hex(tmp_path / "app.hex", [(0x0, b"\x01\x02"), (0x2000, b"\x03")])
+
+    assert read_firmware_segments(file_path) == [(0x0, b"\x01\x02"), (0x2000, b"\x03")]
+
+
+def test_read_firmware_segments_should_reject_binaries(tmp_path: Path):
+    with pytest.raises(ValueError):
+        read_firmware_segments(tmp_path / "app.bin")
+
+
+def test_merge_segments_should_merge_adjacent_and_keep_later_data():
+    merged = merge_segments([(0x10, b"bbbb"), (0x0, b"a" * 0x10), (0x12, b"CC"), (0x40, b"d")])
+
+    assert merged == [(0x0, b"a" * 0x10 + b"bbCC"), (0x40, b"d")]
+
+
+def test_plan_image_should_list_touched_sectors():
+    image = plan_image([(0x0FFE, b"\x00" * 4), (0x3000, b"\x00"), (0x20000000, b"\x00")],
+                       MEMORY_MAP)
+
+    assert image.sectors == (0x0, 0x1000, 0x3000)
+    assert image.size_bytes == 6
+
+
+def test_cache_should_prepare_each_image_once(tmp_path: Path):
+    file_path = _write_hex(tmp_path / "app.hex", [(0x0, b"\x01" * 16)])
+    cache = FlashImageCache()
+
+    first = cache.get(file_path, "nrf52840", MEMORY_MAP)
+    assert cache.get(file_path, "nrf52840", MEMORY_MAP) is first
+    assert cache.get(file_path, "stm32f4", MEMORY_MAP) is not first
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # the key is the contents of the file, so rebuilt firmware is prepared again
+    _write_hex(file_path, [(0x0, b"\x02" * 16)])
+    assert cache.get(file_path, "nrf52840", MEMORY_MAP).segments == ((0x0, b"\x02" * 16),)
+
+
+def test_cache_should_evict_least_recently_used(tmp_path: Path):
+    paths = [_write_hex(tmp_path / f"{idx}.hex", [(0x0, bytes([idx]) * 100)]) for idx in range(3)]
+    cache = FlashImageCache(max_bytes=250)
+
+    cache.get(paths[0], "t", MEMORY_MAP)
+    cache.get(paths[1], "t", MEMORY_MAP)
+    cache.get(paths[0], "t", MEMORY_MAP)
+    cache.get(paths[2], "t", MEMORY_MAP)
+
+    assert len(cache) == 2
+    assert cache.size_bytes == 200
+    cache.get(paths[0], "t", MEMORY_MAP)
+    assert cache.misses == 3
+
+
+def test_cache_should_prepare_once_for_concurrent_loads(tmp_path: Path, monkeypatch):
+    file_path = _write_hex(tmp_path / "app.hex", [(0x0, b"\x01" * 16)])
+    cache = FlashImageCache()
+    prepared = list()
+    read_segments = flash_cache.read_firmware_segments
+
+    def slow_read(path: Path):
+        prepared.append(path)
+        threading.Event().wait(0.05)
+        return read_segments(path)
+
+    monkeypatch.setattr(flash_cache, "read_firmware_segments", slow_read)
+    threads = [threading.Thread(target=cache.get, args=(file_path, "t", MEMORY_MAP))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(prepared) == 1
+    assert cache.hits == 3
+
+
+def test_pyocd_loader_should_program_cached_image(tmp_path: Path):
+    file_path = _write_hex(tmp_path / "app.hex", [(0x0, b"\x01" * 16)])
+    cache = FlashImageCache()
+    loader = PyOCDDeviceLoader(file_path, image_cache=cache)
+    loader._session = mock.Mock()
+    loader._session.target.memory_map = MEMORY_MAP
+    loader._board = mock.Mock(target_type="nrf52840")
+
+    with mock.patch("pyetta.loaders.FlashLoader") as flash_loader:
+        loader.load_to_device()
+        loader.load_to_device()
+
+    flash_loader.return_value.add_data.assert_called_with(0x0, b"\x01" * 16)
+    assert flash_loader.return_value.commit.call_count == 2
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -84,3 +84,22 @@ def test_should_output_correct_xml_format(tmp_path: Path,
             elem.tail = elem.tail.strip()
 
     assert tostring(actual_xml) == tostring(test_cases_xml)
+
+
+def test_cli_should_write_failure_context_to_system_out(builtins_args,
+                                                        cli_runner,
+                                                        cli_entry,
+                                                        tmp_path: Path):
+    output_path = tmp_path / "output.log"
+    output_path.write_bytes(b"log: pass\n/mypath/foo.c:1:test_1:PASS\nlog: sensor timeout\n"
+                            b"/mypath/foo.c:2:test_2:FAIL\nFAIL\n")
+    builtins_args.extend(['lnull', 'cfile', f'--file={output_path}', 'punity',
+                          '--context-lines=5', 'rjunitxml', '--file=out.xml'])
+
+    result = cli_runner.invoke(cli_entry, builtins_args)
+
+    assert result.exit_code == 1
+    outputs = {test_case.get("name"): test_case.findtext("system-out")
+               for test_case in parse("out.xml").getroot().iter("testcase")}
+    assert outputs == {"test_1": "/mypath/foo.c:1:test_1:PASS",
+                       "test_2": "log: sensor timeout\n/mypath/foo.c:2:test_2:FAIL"}
@@ -0,0 +1,135 @@
+import json
+import xml.etree.ElementTree as ET
+
+from click.testing import CliRunner
+
+from pyetta.cli.merge import merge_cli
+from pyetta.merge import JUnitMerger, MergeReporter, read_results, merge_results
+from pyetta.parser_data import TestCase, TestResult, case_to_dict, write_packed_test_cases
+from pyetta.reporters import JUnitXmlReporter, JsonLinesReporter, ColumnarReporter
+
+JUNIT_XML = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites>
+    <testsuite name="foo" hostname="board_a" tests="2">
+        <testcase name="test_1" file="/src/foo.c" line="10" time="0.5">
+            <system-out>/src/foo.c:10:test_1:PASS</system-out>
+        </testcase>
+        <testcase name="test_2" file="/src/foo.c" line="20">
+            <failure message="Expected 1 Was 2" />
+        </testcase>
+    </testsuite>
+</testsuites>
+"""
+
+
+def _write_json_lines(file_path, test_cases):
+    with open(file_path, "w") as fo:
+        for test_case in test_cases:
+            fo.write(json.dumps(case_to_dict(test_case)) + "\n")
+
+
+def test_read_results_should_read_junit_xml(tmp_path):
+    file_path = tmp_path / "a.xml"
+    file_path.write_text(JUNIT_XML)
+
+    test_cases = list(read_results(file_path))
+
+    assert [(tc.group, tc.name, tc.result) for tc in test_cases] == [
+        ("foo", "test_1", TestResult.Pass), ("foo", "test_2", TestResult.Fail)]
+    assert test_cases[0].extra == {"board": "board_a"}
+    assert test_cases[0].runtime_s == 0.5
+    assert test_cases[0].stdout == "/src/foo.c:10:test_1:PASS"
+    assert test_cases[1].result_message == "Expected 1 Was 2"
+
+
+def test_read_results_should_detect_pyetta_formats(tmp_path):
+    test_cases = [TestCase(name="test_1", result=TestResult.Skip, group="foo")]
+    _write_json_lines(tmp_path / "a.jsonl", test_cases)
+    write_packed_test_cases(tmp_path / "a.bin", test_cases)
+
+    assert list(read_results(tmp_path / "a.jsonl")) == test_cases
+    assert list(read_results(tmp_path / "a.bin")) == test_cases
+
+
+def test_read_results_should_read_reporter_outputs(tmp_path):
+    test_cases = [TestCase(name="test_1", result=TestResult.Pass, group="foo", runtime_s=0.5),
+                  TestCase(name="test_2", result=TestResult.Fail, extra={"board": "a"},
+                           result_message="Expected 1 Was 2")]
+    assert JsonLinesReporter(tmp_path / "a.jsonl").generate_report(iter(test_cases)) == 0
+    assert ColumnarReporter(tmp_path / "a.col").generate_report(iter(test_cases)) == 0
+
+    assert list(read_results(tmp_path / "a.jsonl")) == test_cases
+    assert list(read_results(tmp_path / "a.col")) == test_cases
+
+
+def test_merger_should_dedupe_by_group_name_and_board(tmp_path):
+    with JUnitMerger() as merger:
+        assert merger.add(TestCase(name="test_1", result=TestResult.Fail, group="foo",
+                                   extra={"board": "a"}))
+        assert not merger.add(TestCase(name="test_1", result=TestResult.Pass, group="foo",
+                                       extra={"board": "a"}))
+        assert merger.add(TestCase(name="test_1", result=TestResult.Pass, group="foo",
+                                   extra={"board": "b"}))
+        assert merger.add(TestCase(name="test_2", result=TestResult.Skip, group="foo",
+                                   extra={"board": "a"}))
+        with open(tmp_path / "merged.xml", "wb") as fo:
+            merger.write(fo)
+
+    assert merger.duplicates == 1
+    root = ET.parse(tmp_path / "merged.xml").getroot()
+    assert (root.get("tests"), root.get("failures"), root.get("skipped")) == ("3", "1", "1")
+    suites = {suite.get("hostname"): suite for suite in root.iter("testsuite")}
+    assert suites["a"].get("tests") == "2"
+    assert [tc.get("name") for tc in suites["a"].iter("testcase")] == ["test_1", "test_2"]
+    assert suites["a"].find("testcase/failure") is not None
+    assert suites["b"].get("tests") == "1"
+
+
+def test_merge_results_should_round_trip_junit_xml(tmp_path):
+    (tmp_path / "a.xml").write_text(JUNIT_XML)
+    _write_json_lines(tmp_path / "b.jsonl",
+                      [TestCase(name="test_1", result=TestResult.Fail, group="foo",
+                                extra={"board": "board_a"}),
+                       TestCase(name="test_3", result=TestResult.Pass, group="bar")])
+
+    merger = merge_results([tmp_path / "a.xml", tmp_path / "b.jsonl"], tmp_path / "merged.xml")
+
+    assert merger.duplicates == 1
+    test_cases = list(read_results(tmp_path / "merged.xml"))
+    assert [(tc.group, tc.name, tc.result) for tc in test_cases] == [
+        ("foo", "test_1", TestResult.Pass), ("foo", "test_2", TestResult.Fail),
+        ("bar", "test_3", TestResult.Pass)]
+
+
+def test_merge_reporter_should_prefer_run_results(tmp_path):
+    (tmp_path / "a.xml").write_text(JUNIT_XML)
+    test_cases = (TestCase(name="test_2", result=TestResult.Pass, group="foo"),)
+    reporter = MergeReporter(tmp_path / "merged.xml", [tmp_path / "a.xml"], board="board_a")
+
+    assert reporter.generate_report(test_cases) == 0
+
+    merged = {tc.name: tc.result for tc in read_results(tmp_path / "merged.xml")}
+    assert merged == {"test_2": TestResult.Pass, "test_1": TestResult.Pass}
+    assert test_cases[0].extra == {}
+
+
+def test_merge_cli_should_write_report(tmp_path):
+    (tmp_path / "a.xml").write_text(JUNIT_XML)
+
+    result = CliRunner().invoke(merge_cli, ["-o", str(tmp_path / "merged.xml"),
+                                            str(tmp_path / "a.xml")])
+
+    assert result.exit_code == 0
+    assert "Merged 2 tests from 1 files" in result.output
+    assert len(list(read_results(tmp_path / "merged.xml"))) == 2
+
+
+def test_merge_reporter_should_dedupe_junit_xml_reporter_output(tmp_path):
+    test_cases = (TestCase(name="test_1", result=TestResult.Pass, filepath="/src/foo.c"),
+                  TestCase(name="test_2", result=TestResult.Pass, group="foo"))
+    JUnitXmlReporter(tmp_path / "a.xml").generate_report(test_cases)
+
+    MergeReporter(tmp_path / "merged.xml", [tmp_path / "a.xml"]).generate_report(test_cases)
+
+    merged = list(read_results(tmp_path / "merged.xml"))
+    assert [(tc.group, tc.name) for tc in merged] == [(None, "test_1"), ("foo", "test_2")]
@@ -0,0 +1,90 @@
+import sys
+
+import pytest
+
+from pyetta.parser_data import TestCase, TestResult, PackedTestCases, pack_test_cases, \
+    write_packed_test_cases, share_test_cases, ColumnarTestCases, pack_test_cases_columnar, \
+    write_columnar_test_cases
+
+TEST_CASES = [
+    TestCase(name="test_1", result=TestResult.Pass, group="foo", filepath="/src/foo.c",
+             line_num=10, runtime_s=0.25, stdout="/src/foo.c:10:test_1:PASS"),
+    TestCase(name="test_2", result=TestResult.Fail, group="foo", filepath="/src/foo.c",
+             line_num=20, extra={"attempts": 2, "flaky": False},
+             result_message="Expected 1 Was 2"),
+    TestCase(name="test_3", result=TestResult.Skip, stderr="µs timer unavailable"),
+]
+
+
+def test_packed_test_cases_should_round_trip():
+    packed = PackedTestCases(pack_test_cases(TEST_CASES))
+
+    assert len(packed) == 3
+    assert list(packed) == TEST_CASES
+    assert packed[-1] == TEST_CASES[-1]
+    assert packed[1:] == TEST_CASES[1:]
+    with pytest.raises(IndexError):
+        packed[3]
+
+
+def test_packed_test_cases_should_deduplicate_strings():
+    single = pack_test_cases(TEST_CASES[:1])
+    repeated = pack_test_cases(TEST_CASES[:1] * 100)
+
+    # each repeat only adds a fixed width record
+    assert (len(repeated) - len(single)) % 99 == 0
+    assert (len(repeated) - len(single)) // 99 < 64
+
+
+def test_packed_test_cases_should_reject_other_data():
+    with pytest.raises(ValueError):
+        PackedTestCases(b"JUNK" + bytes(64))
+
+
+def test_packed_test_cases_should_read_mapped_file(tmp_path):
+    file_path = tmp_path / "results.bin"
+    write_packed_test_cases(file_path, TEST_CASES)
+
+    with PackedTestCases.from_file(file_path) as packed:
+        assert list(packed) == TEST_CASES
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="shared memory requires python 3.8")
+def test_packed_test_cases_should_read_shared_memory():
+    from multiprocessing import shared_memory
+
+    memory = share_test_cases(TEST_CASES)
+    try:
+        attached = shared_memory.SharedMemory(name=memory.name)
+        with PackedTestCases(attached.buf) as packed:
+            assert list(packed) == TEST_CASES
+        attached.close()
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def test_columnar_test_cases_should_round_trip():
+    columnar = ColumnarTestCases(pack_test_cases_columnar(TEST_CASES))
+
+    assert len(columnar) == 3
+    assert list(columnar) == TEST_CASES
+    assert columnar[-1] == TEST_CASES[-1]
+
+
+def test_columnar_test_cases_should_read_columns(tmp_path):
+    file_path = tmp_path / "results.col"
+    write_columnar_test_cases(file_path, TEST_CASES * 1000)
+
+    with ColumnarTestCases.from_file(file_path) as columnar:
+        assert columnar.column("line_num").tolist() == [10, 20, 0] * 1000
+        assert sum(columnar.column("runtime_s")) == 250.0
+        assert columnar.results().count(TestResult.Fail) == 1000
+        assert columnar.string_column("group")[:3] == ["foo", "foo", None]
+        with pytest.raises(ValueError):
+            columnar.string_column("runtime_s")
+
+
+def test_columnar_test_cases_should_reject_packed_data():
+    with pytest.raises(ValueError):
+        ColumnarTestCases(pack_test_cases(TEST_CASES))
@@ -0,0 +1,252 @@
+import io
+import threading
+from functools import partial
+from typing import Optional, Callable, List, Sequence
+
+import pytest
+
+from pyetta.collectors import IOBaseCollector
+from pyetta.loaders import Loader
+from pyetta.parser_data import TestCase, TestResult
+from pyetta.parsers import UnityParser
+from pyetta.pipeline import Pipeline, PipelineListener, PipelineStageError, PipelineResult
+from pyetta.reporters import ExitCodeReporter, Reporter
+
+SAMPLE_OUTPUT = b"/mypath/foo.c:1:test_1:PASS\n/mypath/foo.c:2:test_2:FAIL\nFAIL\n"
+
+
+class FakeLoader(Loader):
+    def __init__(self, collector_io: Optional[io.BytesIO] = None, fail_load: bool = False):
+        self.loads = 0
+        self.starts = 0
+        self._collector_io = collector_io
+        self._fail_load = fail_load
+
+    def load_to_device(self, progress: Optional[Callable[[int], None]] = None) -> None:
+        if self._fail_load:
+            raise RuntimeError("Probe not found.")
+        self.loads += 1
+        if progress is not None:
+            progress(1.0)
+
+    def reset_device(self) -> None:
+        pass
+
+    def start_program(self) -> None:
+        self.starts += 1
+        if self._collector_io is not None:
+            self._collector_io.seek(0)
+
+
+class RecordingListener(PipelineListener):
+    def __init__(self):
+        self.events: List[str] = []
+
+    def on_stage(self, stage: str) -> None:
+        self.events.append(stage)
+
+    def on_load_progress(self, progress: float) -> None:
+        self.events.append(f"progress {progress}")
+
+    def on_chunk(self, chunk: bytes, test_cases: Sequence[TestCase]) -> None:
+        self.events.append(f"chunk {len(test_cases)}")
+
+    def on_complete(self, result: PipelineResult) -> None:
+        self.events.append("complete")
+
+
+def test_pipeline_should_run_all_stages():
+    listener = RecordingListener()
+    pipeline = Pipeline(FakeLoader(), IOBaseCollector(io.BytesIO(SAMPLE_OUTPUT)),
+                        parser=UnityParser(), reporters=[ExitCodeReporter()],
+                        listeners=[listener])
+
+    result = pipeline.run()
+
+    assert [test_case.name for test_case in result.test_cases] == ["test_1", "test_2"]
+    assert result.exit_code == 1
+    assert result.total_s >= 0
+    assert listener.events == ["load", "progress 1.0", "collect", "chunk 1", "chunk 1",
+                               "chunk 0", "report", "complete"]
+
+
+def test_pipeline_should_rerun_with_warm_resources():
+    collector_io = io.BytesIO(SAMPLE_OUTPUT)
+    loader = FakeLoader(collector_io)
+
+    with Pipeline(loader, IOBaseCollector(collector_io),
+                  parser_factory=partial(UnityParser)) as pipeline:
+        first = pipeline.run()
+        second = pipeline.run(load=False)
+
+    assert loader.loads == 1
+    assert loader.starts == 2
+    assert first.test_cases == second.test_cases
+    assert first.test_cases is not second.test_cases
+
+
+def test_pipeline_rerun_without_factory_should_raise():
+    pipeline = Pipeline(FakeLoader(), IOBaseCollector(io.BytesIO(SAMPLE_OUTPUT)),
+                        parser=UnityParser())
+    pipeline.run()
+
+    with pytest.raises(ValueError):
+        pipeline.run()
+
+
+def test_pipeline_stage_error_should_report_stage():
+    pipeline = Pipeline(FakeLoader(fail_load=True), IOBaseCollector(io.BytesIO(SAMPLE_OUTPUT)),
+                        parser=UnityParser())
+
+    with pytest.raises(PipelineStageError) as error:
+        pipeline.run()
+
+    assert error.value.stage == "load"
+    assert str(error.value) == "Probe not found."
+
+
+class ScriptedLoader(FakeLoader):
+    """Loader whose program produces a different output on each start."""
+
+    def __init__(self, collector_io: io.BytesIO, outputs: List[bytes]):
+        super().__init__(collector_io)
+        self.filters: List[Optional[Sequence[str]]] = []
+        self._outputs = outputs
+
+    def set_test_filter(self, tests: Optional[Sequence[str]]) -> bool:
+        self.filters.append(tests)
+        return True
+
+    def start_program(self) -> None:
+        self._collector_io.seek(0)
+        self._collector_io.truncate()
+        self._collector_io.write(self._outputs[self.starts])
+        self._collector_io.seek(0)
+        self.starts += 1
+
+
+def test_pipeline_should_retry_only_failed_tests():
+    collector_io = io.BytesIO()
+    loader = ScriptedLoader(collector_io, [
+        b"/mypath/foo.c:1:test_1:PASS\n/mypath/foo.c:2:test_2:FAIL:Timeout\n"
+        b"/mypath/foo.c:3:test_3:FAIL:Bad\nFAIL\n",
+        b"/mypath/foo.c:2:test_2:FAIL:Timeout\n/mypath/foo.c:3:test_3:FAIL:Bad\nFAIL\n",
+        b"/mypath/foo.c:2:test_2:PASS\n/mypath/foo.c:3:test_3:FAIL:Bad\nFAIL\n",
+        b"/mypath/foo.c:3:test_3:FAIL:Bad\nFAIL\n",
+    ])
+    pipeline = Pipeline(loader, IOBaseCollector(collector_io), parser_factory=partial(UnityParser),
+                        reporters=[ExitCodeReporter()], retries=3)
+
+    result = pipeline.run()
+
+    test_1, test_2, test_3 = result.test_cases
+    assert "attempts" not in test_1.extra
+    assert test_2.result == TestResult.Pass
+    assert test_2.extra == {"attempts": 3, "flaky": True, "first_failure": "Timeout"}
+    assert test_3.result == TestResult.Fail
+    assert test_3.extra == {"attempts": 4, "flaky": False}
+    assert loader.filters == [["test_2", "test_3"], ["test_2", "test_3"], ["test_3"], None]
+    assert result.exit_code == 1
+
+
+def test_pipeline_retry_error_should_keep_earlier_results():
+    collector_io = io.BytesIO()
+    # the program cannot be started for the second retry
+    loader = ScriptedLoader(collector_io, [
+        b"/mypath/foo.c:1:test_1:FAIL:Timeout\n/mypath/foo.c:2:test_2:FAIL:Bad\nFAIL\n",
+        b"/mypath/foo.c:1:test_1:PASS\n/mypath/foo.c:2:test_2:FAIL:Bad\nFAIL\n",
+    ])
+    pipeline = Pipeline(loader, IOBaseCollector(collector_io), parser_factory=partial(UnityParser),
+                        reporters=[ExitCodeReporter()], retries=3)
+
+    result = pipeline.run()
+
+    assert [test_case.result for test_case in result.test_cases] == [TestResult.Pass,
+                                                                     TestResult.Fail]
+    assert result.test_cases[1].extra == {"attempts": 2, "flaky": False}
+    assert loader.filters[-1] is None
+    assert result.exit_code == 1
+
+
+def test_pipeline_retries_without_factory_should_raise():
+    with pytest.raises(ValueError):
+        Pipeline(FakeLoader(), IOBaseCollector(io.BytesIO(SAMPLE_OUTPUT)), parser=UnityParser(),
+                 retries=1)
+
+
+class _BlockingReporter(Reporter):
+    def __init__(self, release: threading.Event, exit_code: int = 0):
+        self.release = release
+        self.exit_code = exit_code
+        self.test_cases: Optional[Sequence[TestCase]] = None
+
+    def generate_report(self, test_cases: Sequence[TestCase]) -> int:
+        self.release.wait(timeout=5.0)
+        self.test_cases = test_cases
+        return self.exit_code
+
+
+class _FailingReporter(Reporter):
+    def generate_report(self, test_cases: Sequence[TestCase]) -> int:
+        raise OSError("Database unavailable.")
+
+
+def test_pipeline_reporters_should_run_concurrently_on_snapshot():
+    release = threading.Event()
+    # the first reporter only finishes once the second has started
+    first = _BlockingReporter(release, exit_code=2)
+    second = _BlockingReporter(threading.Event())
+    second.generate_report = lambda test_cases: release.set() or 0
+    pipeline = Pipeline(FakeLoader(), IOBaseCollector(io.BytesIO(SAMPLE_OUTPUT)),
+                        parser=UnityParser(), reporters=[first, second], report_timeout_s=5.0)
+
+    result = pipeline.run()
+
+    assert result.exit_code == 2
+    assert result.report_errors == []
+    assert isinstance(first.test_cases, tuple)
+    assert list(first.test_cases) == result.test_cases
+
+
+def test_pipeline_reporter_failures_should_not_stop_other_reporters():
+    written = _BlockingReporter(threading.Event())
+    written.release.set()
+    hung = _BlockingReporter(threading.Event())
+    pipeline = Pipeline(FakeLoader(), IOBaseCollector(io.BytesIO(SAMPLE_OUTPUT)),
+                        parser=UnityParser(), reporters=[_FailingReporter(), hung, written],
+                        report_timeout_s=0.1)
+
+    result = pipeline.run()
+    hung.release.set()
+
+    assert written.test_cases is not None
+    assert result.exit_code == 1
+    assert len(result.report_errors) == 2
+    assert "Database unavailable." in result.report_errors[0]
+    assert "timed out" in result.report_errors[1]
+
+
+class _StopOnlyParser(UnityParser):
+    """Only parses its output once stopped, like a batching parser."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def feed_data(self, data_chunk: bytes) -> None:
+        self._chunks.append(data_chunk)
+
+    def stop(self, forced: bool = False) -> None:
+        for chunk in self._chunks:
+            super().feed_data(chunk)
+        super().stop(forced)
+
+
+def test_pipeline_should_notify_test_cases_produced_on_stop():
+    listener = RecordingListener()
+    pipeline = Pipeline(FakeLoader(), IOBaseCollector(io.BytesIO(SAMPLE_OUTPUT)),
+                        parser=_StopOnlyParser(), listeners=[listener])
+
+    pipeline.run()
+
+    assert listener.events[-3:] == ["chunk 2", "report", "complete"]
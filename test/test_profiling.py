@@ -0,0 +1,59 @@
+import io
+from pathlib import Path
+from typing import List
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.collectors import IOBaseCollector
+from pyetta.parsers import UnityParser
+from pyetta.profiling import Profiler
+
+
+def test_profiler_should_measure_instrumented_methods():
+    collector = IOBaseCollector(io.BytesIO(b"a\nb\n"))
+    with Profiler("cpu") as profiler:
+        profiler.instrument(collector)
+        while len(collector.read_chunk()) > 0:
+            pass
+
+    stats = {(s.component, s.method): s for s in profiler.stats}
+    read_chunk = stats[("IOBaseCollector", "read_chunk")]
+    assert read_chunk.plugin == "pyetta.collectors"
+    assert read_chunk.calls == 3
+    assert read_chunk.wall_s > 0
+    assert read_chunk.cpu_s >= 0
+
+
+def test_profiler_memory_mode_should_measure_allocations():
+    with Profiler("mem") as profiler:
+        parser = profiler.instrument_factory(UnityParser)()
+        for idx in range(100):
+            parser.feed_data(f"/mypath/foo.c:{idx}:test_{idx}:PASS".encode())
+
+    stats = {(s.component, s.method): s for s in profiler.stats}
+    feed_data = stats[("UnityParser", "feed_data")]
+    assert feed_data.calls == 100
+    assert feed_data.allocated_bytes > 0
+    assert "pyetta.parsers" in profiler.format_report()
+
+
+def test_profiler_should_reject_unknown_mode():
+    with pytest.raises(ValueError):
+        Profiler("io")
+
+
+def test_cli_profile_should_report_per_plugin(sample_file_all_pass: Path,
+                                              builtins_args: List[str],
+                                              cli_runner: CliRunner,
+                                              cli_entry: Group):
+    builtins_args.extend(['--profile=cpu', 'lnull', 'cfile', f'--file={sample_file_all_pass}',
+                          'punity', 'rexit'])
+
+    result = cli_runner.invoke(cli_entry, builtins_args)
+
+    assert result.exit_code == 0
+    assert "Profile (cpu):" in result.output
+    assert "IOBaseCollector.read_chunk" in result.output
+    assert "ExitCodeReporter.generate_report" in result.output
@@ -0,0 +1,90 @@
+import sys
+from functools import partial
+from pathlib import Path
+
+from pyetta.collectors import EmulatorCollector
+from pyetta.loaders import EmulatorLoader
+from pyetta.parsers import UnityParser
+from pyetta.sharding import plan_shards, RuntimeHistory, ShardedRunner, Board
+
+# prints the lines of the firmware file belonging to the filtered groups (the file path).
+FILTERED_EMULATOR_COMMAND = [
+    sys.executable, "-c",
+    "import sys\n"
+    "groups = sys.argv[2].split(',')\n"
+    "for line in open(sys.argv[1]):\n"
+    "    if line.split(':')[0] in groups: sys.stdout.write(line)\n"
+    "print('OK')\n",
+    "{firmware}", "{groups}"
+]
+
+
+def test_plan_shards_should_balance_by_runtime():
+    history = RuntimeHistory({"a": 10.0, "b": 6.0, "c": 5.0, "d": 4.0, "e": 1.0})
+
+    shards = plan_shards(["a", "b", "c", "d", "e"], 2, history)
+
+    assert shards == [["a", "d"], ["b", "c", "e"]]
+
+
+def test_plan_shards_without_history_should_split_evenly():
+    shards = plan_shards([f"group_{idx}" for idx in range(7)], 3)
+
+    assert sorted(len(shard) for shard in shards) == [2, 2, 3]
+
+
+def test_runtime_history_should_round_trip(tmp_path: Path):
+    history_file = tmp_path / "history.json"
+    history = RuntimeHistory.load(history_file)
+    history.update("a", 2.0)
+    history.update("a", 4.0)
+    history.save(history_file)
+
+    assert RuntimeHistory.load(history_file).runtime("a") == 3.0
+
+
+def test_sharded_runner_should_merge_all_shards(tmp_path: Path):
+    firmware = tmp_path / "firmware.txt"
+    firmware.write_text("".join(f"group_{group}:{idx}:test_{group}_{idx}:PASS\n"
+                                for group in range(5) for idx in range(3)))
+    groups = [f"group_{group}" for group in range(5)]
+
+    boards = []
+    for _ in range(3):
+        loader = EmulatorLoader(FILTERED_EMULATOR_COMMAND, firmware)
+        boards.append(Board(loader=loader, collector=EmulatorCollector(loader)))
+
+    runner = ShardedRunner(boards, partial(UnityParser))
+    try:
+        test_cases = runner.run(groups)
+    finally:
+        for board in boards:
+            board.loader.reset_device()
+
+    assert sorted(test_case.name for test_case in test_cases) == \
+           sorted(f"test_{group}_{idx}" for group in range(5) for idx in range(3))
+    assert {test_case.extra["shard"] for test_case in test_cases} == {0, 1, 2}
+    assert set(runner.history.runtimes.keys()) == set(groups)
+
+
+def test_sharded_runner_should_keep_shards_of_other_boards(tmp_path: Path):
+    firmware = tmp_path / "firmware.txt"
+    firmware.write_text("".join(f"group_{group}:1:test_{group}:PASS\n" for group in range(2)))
+
+    working = EmulatorLoader(FILTERED_EMULATOR_COMMAND, firmware)
+    broken = EmulatorLoader(FILTERED_EMULATOR_COMMAND, tmp_path / "missing.txt")
+    boards = [Board(loader=working, collector=EmulatorCollector(working), name="working"),
+              Board(loader=broken, collector=EmulatorCollector(broken), name="broken")]
+
+    runner = ShardedRunner(boards, partial(UnityParser))
+    try:
+        test_cases = runner.run(["group_0", "group_1"])
+    finally:
+        working.reset_device()
+
+    assert len([test_case for test_case in test_cases if test_case.name.startswith("test_")]) == 1
+    errors = [test_case for test_case in test_cases if test_case.name == "board_error"]
+    assert len(errors) == 1
+    assert errors[0].group == UnityParser.RESERVED_TEST_GROUP
+    assert "Board broken failed" in errors[0].stdout
+    assert UnityParser.RESERVED_TEST_GROUP not in runner.history.runtimes
@@ -0,0 +1,63 @@
+import io
+import json
+import threading
+import time
+import urllib.request
+from typing import List, Dict, Any
+
+from pyetta.collectors import IOBaseCollector
+from pyetta.parsers import UnityParser
+from pyetta.pipeline import Pipeline
+from pyetta.streaming import ResultStreamServer
+
+from .test_pipeline import FakeLoader, SAMPLE_OUTPUT
+
+
+def read_events(url: str, events: List[Dict[str, Any]], connected: threading.Event) -> None:
+    with urllib.request.urlopen(url, timeout=5) as response:
+        connected.set()
+        for line in response:
+            events.append(json.loads(line))
+
+
+def test_stream_server_should_publish_run_events():
+    events: List[Dict[str, Any]] = []
+    connected = threading.Event()
+
+    with ResultStreamServer(port=0, batch_interval_s=0.01) as server:
+        host, port = server.address
+        client = threading.Thread(target=read_events,
+                                  args=(f"http://{host}:{port}/events", events, connected))
+        client.start()
+        assert connected.wait(timeout=5)
+
+        pipeline = Pipeline(FakeLoader(), IOBaseCollector(io.BytesIO(SAMPLE_OUTPUT)),
+                            parser=UnityParser(), reporters=[server], listeners=[server])
+        pipeline.run()
+
+    client.join(timeout=5)
+
+    assert [event["event"] for event in events] == \
+           ["stage", "stage", "test_case", "test_case", "stage", "complete"]
+    assert events[3]["test_case"]["name"] == "test_2"
+    assert events[3]["test_case"]["result"] == "Fail"
+    assert events[-1] == {"event": "complete", "tests": 2, "failures": 1, "skipped": 0}
+
+
+def test_stream_server_should_replay_history_to_late_clients():
+    events: List[Dict[str, Any]] = []
+    connected = threading.Event()
+
+    with ResultStreamServer(port=0, batch_interval_s=0.01) as server:
+        server.publish({"event": "stage", "stage": "collect"})
+        # let the event be broadcast before any client connects
+        time.sleep(0.1)
+        host, port = server.address
+        client = threading.Thread(target=read_events,
+                                  args=(f"http://{host}:{port}/events", events, connected))
+        client.start()
+        assert connected.wait(timeout=5)
+
+    client.join(timeout=5)
+
+    assert events == [{"event": "stage", "stage": "collect"}]
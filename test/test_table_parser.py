@@ -0,0 +1,151 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.parser_data import TestResult
+from pyetta.parsers import TableParser, LineRule, GoogleTestParser, CppUTestParser, TapParser, \
+    Parser
+
+GOOGLE_TEST_OUTPUT = b"""[==========] Running 3 tests from 1 test suite.
+[ RUN      ] Foo.Bar
+[       OK ] Foo.Bar (0 ms)
+[ RUN      ] Foo.Baz
+foo.cc:12: Failure
+Expected equality of these values:
+[  FAILED  ] Foo.Baz (3 ms)
+[  SKIPPED ] Foo/Qux.Skip/0, where GetParam() = 1 (0 ms)
+[==========] 3 tests from 1 test suite ran. (3 ms total)
+[  PASSED  ] 1 test.
+[  FAILED  ] 1 test, listed below:
+[  FAILED  ] Foo.Baz
+"""
+
+CPPUTEST_OUTPUT = b"""TEST(Grp, A) - 0 ms
+TEST(Grp, B)
+foo.cpp:12: error: Failure in TEST(Grp, B)
+\texpected <1>
+ - 1 ms
+IGNORE_TEST(Grp, C) - 0 ms
+Errors (1 failures, 3 tests, 2 ran, 3 checks, 1 ignored, 0 filtered out, 1 ms)
+"""
+
+TAP_OUTPUT = b"""TAP version 13
+1..4
+ok 1 - first
+not ok 2 - second
+ok 3 - third # SKIP no hardware
+not ok 4 # TODO later
+ok 5 - after the plan
+"""
+
+
+def _feed(parser: Parser, output: bytes) -> Parser:
+    for line in output.splitlines(keepends=True):
+        parser.feed_data(line)
+    return parser
+
+
+@pytest.mark.parametrize("encoding", ["ascii", "utf-16-le"])
+def test_google_test_parser_should_parse_results(encoding: str):
+    output = GOOGLE_TEST_OUTPUT.decode("ascii").encode(encoding)
+    lines = [line.encode(encoding) for line in output.decode(encoding).splitlines()]
+    parser = GoogleTestParser(encoding=encoding)
+    for line in lines:
+        parser.feed_data(line)
+
+    assert parser.done
+    results = [(t.group, t.name, t.result) for t in parser.test_cases]
+    assert results == [("Foo", "Bar", TestResult.Pass),
+                       ("Foo", "Baz", TestResult.Fail),
+                       ("Foo/Qux", "Skip/0", TestResult.Skip)]
+    failure = parser.test_cases[1]
+    assert (failure.filepath, failure.line_num, failure.runtime_s) == ("foo.cc", 12, 0.003)
+
+
+def test_google_test_parser_should_detect_final_chunk():
+    parser = GoogleTestParser()
+
+    assert parser.is_final_chunk(b"[==========] 3 tests from 1 test suite ran. (3 ms total)\n")
+    assert not parser.is_final_chunk(b"[       OK ] Foo.Bar (0 ms)\n")
+
+
+def test_cpputest_parser_should_parse_results():
+    parser = _feed(CppUTestParser(), CPPUTEST_OUTPUT)
+
+    assert parser.done
+    results = [(t.group, t.name, t.result) for t in parser.test_cases]
+    assert results == [("Grp", "A", TestResult.Pass),
+                       ("Grp", "B", TestResult.Fail),
+                       ("Grp", "C", TestResult.Skip)]
+    assert parser.test_cases[1].line_num == 12
+
+
+def test_tap_parser_should_complete_after_planned_tests():
+    parser = _feed(TapParser(name="tap"), TAP_OUTPUT)
+
+    assert parser.done
+    results = [(t.group, t.name, t.result, t.result_message) for t in parser.test_cases]
+    assert results == [("tap", "first", TestResult.Pass, None),
+                       ("tap", "second", TestResult.Fail, None),
+                       ("tap", "third", TestResult.Skip, "no hardware"),
+                       ("tap", "4", TestResult.Skip, "later")]
+
+
+def test_tap_parser_should_complete_on_trailing_plan():
+    parser = _feed(TapParser(), b"ok 1 - first\n1..1\nok 2 - ignored\n")
+
+    assert parser.done
+    assert [t.name for t in parser.test_cases] == ["first"]
+
+
+def test_tap_parser_should_fail_on_bail_out():
+    parser = _feed(TapParser(), b"1..2\nok 1 - first\nBail out! board lost power\n")
+
+    assert parser.done
+    assert parser.test_cases[-1].group == Parser.RESERVED_TEST_GROUP
+    assert parser.test_cases[-1].stdout == "board lost power"
+
+
+def test_table_parser_should_dispatch_rules_by_state():
+    rules = [LineRule(r"begin (?P<group>\w+)", action="fields", next_state="suite"),
+             LineRule(r"(?P<name>\w+) (?P<result>ok|bad)", states=("suite",),
+                      results={"ok": TestResult.Pass}),
+             LineRule(r"end", action="done", states=("suite",))]
+    parser = _feed(TableParser(rules=rules),
+                   b"outside ok\nbegin suite_a\ntest_1 ok\ntest_2 bad\nend\n")
+
+    assert parser.done
+    results = [(t.group, t.name, t.result) for t in parser.test_cases]
+    assert results == [("suite_a", "test_1", TestResult.Pass),
+                       (None, "test_2", TestResult.Fail)]
+
+
+def test_table_parser_should_reject_unknown_action():
+    with pytest.raises(ValueError):
+        TableParser(rules=[LineRule(r"x", action="jump")])
+
+
+def test_table_parser_should_skip_undecodable_lines():
+    parser = _feed(GoogleTestParser(errors="skip"),
+                   b"f\xffo.cc:3: Failure\n[  FAILED  ] Foo.Bar (0 ms)\n")
+
+    assert [(t.name, t.filepath) for t in parser.test_cases] == [("Bar", None)]
+    assert parser.decode_errors == 1
+
+
+def test_cli_should_parse_google_test_output(builtins_args: List[str],
+                                             cli_runner: CliRunner,
+                                             cli_entry: Group,
+                                             tmp_path: Path):
+    output_path = tmp_path / "gtest.log"
+    output_path.write_bytes(GOOGLE_TEST_OUTPUT)
+    builtins_args.extend(['lnull', 'cfile', f'--file={output_path}', 'pgtest',
+                          'rjunitxml', '--file=out.xml'])
+
+    result = cli_runner.invoke(cli_entry, builtins_args)
+
+    assert result.exit_code == 1
+    assert 'name="Baz"' in Path("out.xml").read_text()
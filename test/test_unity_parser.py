@@ -1,7 +1,10 @@
+import logging
+from functools import partial
+
 import pytest
 from pyetta.parser_data import TestCase, TestResult
 
-from pyetta.parsers import UnityParser
+from pyetta.parsers import UnityParser, ParallelParser, OutputContext
 
 
 def assert_test_case_equivalent(a: TestCase, b: TestCase) -> None:
@@ -124,3 +127,145 @@ def test_parse_test_output():
 
     for idx, test_case in enumerate(parser.test_cases):
         assert expected_test_cases[idx] == test_case
+
+
+def test_parallel_parse_should_match_serial_parse():
+    test_output = [f"/mypath/foo.c:{idx}:test_{idx}:{'PASS' if idx % 3 else 'FAIL'}".encode()
+                   for idx in range(100)]
+    test_output.extend([b"-----------------------", b"OK", b"/mypath/foo.c:1:test_late:PASS"])
+
+    serial_parser = UnityParser()
+    for line in test_output:
+        if not serial_parser.done:
+            serial_parser.feed_data(line)
+
+    with ParallelParser(partial(UnityParser), workers=2, batch_size=7) as parser:
+        for line in test_output:
+            parser.feed_data(line)
+        parser.stop()
+
+    assert parser.done
+    assert len(parser.test_cases) == 100
+    assert parser.test_cases == serial_parser.test_cases
+
+
+def test_parallel_parse_forced_stop_should_add_parser_error():
+    with ParallelParser(partial(UnityParser), workers=1) as parser:
+        parser.feed_data(b"/mypath/foo.c:1:test_1:PASS")
+        parser.stop(forced=True)
+
+    assert [test_case.name for test_case in parser.test_cases] == ["test_1", "parser_error"]
+
+
+NOISY_OUTPUT = [
+    b"\xfe\xff boot noise",
+    b"/mypath/foo.c:1:test_1:PASS",
+    b"/mypath/foo.c:2:test_2:FAIL:Expected \xff",
+    b"/mypath/foo.c:3:test_3:PASS",
+    b"OK",
+]
+
+
+def test_parse_noisy_output_strict_should_stop_on_corrupt_result():
+    parser = UnityParser()
+    for line in NOISY_OUTPUT:
+        if not parser.done:
+            parser.feed_data(line)
+
+    # noise outside of test results is never decoded
+    assert [test_case.name for test_case in parser.test_cases] == ["test_1", "parser_error"]
+
+
+def test_parse_noisy_output_should_replace_invalid_bytes():
+    parser = UnityParser(errors="replace")
+    for line in NOISY_OUTPUT:
+        parser.feed_data(line)
+
+    assert parser.done
+    assert [test_case.name for test_case in parser.test_cases] == ["test_1", "test_2", "test_3"]
+    assert parser.decode_errors == 1
+    assert parser.test_cases[1].result_message == "Expected \ufffd"
+
+
+def test_parse_non_ascii_compatible_encoding_should_decode_lines():
+    parser = UnityParser(encoding="utf-16-le", errors="skip")
+    for line in [b"\x00\xd8", "/mypath/foo.c:1:test_1:PASS".encode("utf-16-le"),
+                 "OK".encode("utf-16-le")]:
+        parser.feed_data(line)
+
+    assert parser.done
+    assert [test_case.name for test_case in parser.test_cases] == ["test_1"]
+    assert parser.decode_errors == 1
+
+
+def test_parse_noisy_output_should_skip_invalid_lines(caplog):
+    caplog.set_level(logging.WARNING, logger="pyetta.parsers")
+    parser = UnityParser(errors="skip")
+    for line in NOISY_OUTPUT:
+        parser.feed_data(line)
+
+    assert parser.done
+    assert [test_case.name for test_case in parser.test_cases] == ["test_1", "test_3"]
+    assert parser.decode_errors == 1
+    assert "1 lines could not be decoded as ascii and were skipped." in caplog.text
+
+
+def test_parallel_parse_should_complete_on_final_line_without_stop():
+    with ParallelParser(partial(UnityParser), workers=1, batch_size=1000) as parser:
+        parser.feed_data(b"/mypath/foo.c:1:test_1:PASS")
+        assert not parser.done
+        parser.feed_data(b"OK")
+
+        assert parser.done
+        assert [test_case.name for test_case in parser.test_cases] == ["test_1"]
+
+
+def test_parallel_parse_should_send_partial_batch_after_interval():
+    now = [0.0]
+    with ParallelParser(partial(UnityParser), workers=1, batch_size=1000,
+                        flush_interval_s=1.0, clock=lambda: now[0]) as parser:
+        parser.feed_data(b"/mypath/foo.c:1:test_1:PASS")
+        now[0] = 2.0
+        parser.feed_data(b"/mypath/foo.c:2:test_2:PASS")
+        # both chunks were sent as a single batch once the interval passed
+        assert parser._next_sequence == 1
+        parser.stop()
+
+        assert [test_case.name for test_case in parser.test_cases] == ["test_1", "test_2"]
+
+
+def test_output_context_should_bound_lines_and_bytes():
+    context = OutputContext(max_lines=3, max_bytes=10)
+    for line in [b"a", b"bb", b"ccc", b"dddd"]:
+        context.append(line)
+    assert (len(context), context.size_bytes) == (3, 9)
+
+    context.append(b"eeeeee")
+    assert context.take("ascii") == "dddd\neeeeee"
+    assert context.take("ascii") is None
+
+    context.append(b"0123456789abc")
+    assert context.take("ascii") == "3456789abc"
+
+
+@pytest.mark.parametrize("encoding", ["ascii", "utf-16-le"])
+def test_parse_should_keep_output_context_of_failures(encoding: str):
+    parser = UnityParser(encoding=encoding, context_lines=2)
+    for line in ["boot", "step 1", "/mypath/foo.c:1:test_1:PASS", "step 2", "step 3",
+                 "step 4", "", "/mypath/foo.c:2:test_2:FAIL:Expected 1", "OK"]:
+        parser.feed_data(line.encode(encoding))
+
+    assert parser.done
+    test_1, test_2 = parser.test_cases
+    assert test_1.stdout == "/mypath/foo.c:1:test_1:PASS"
+    assert test_2.stdout == "step 3\nstep 4\n/mypath/foo.c:2:test_2:FAIL:Expected 1"
+
+
+def test_parallel_parse_should_shut_down_workers_once_done():
+    parser = ParallelParser(partial(UnityParser), workers=1, batch_size=1000)
+    parser.feed_data(b"/mypath/foo.c:1:test_1:PASS")
+    parser.feed_data(b"OK")
+
+    assert parser.done
+    assert parser._executor is None
+    assert [test_case.name for test_case in parser.test_cases] == ["test_1"]
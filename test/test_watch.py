@@ -0,0 +1,128 @@
+import os
+import shlex
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from click import Group
+from click.testing import CliRunner
+
+from pyetta.collectors import IOBaseCollector
+from pyetta.loaders import Loader
+from pyetta.parsers import UnityParser
+from pyetta.pipeline import Pipeline, PipelineResult
+from pyetta.reporters import ExitCodeReporter
+from pyetta.watch import FileWatcher, watch
+
+EMULATOR_COMMAND = [sys.executable, "-c",
+                    "import sys; sys.stdout.write(open(sys.argv[1]).read())",
+                    "{firmware}"]
+
+
+def _touch(file_path: Path, content: str) -> None:
+    file_path.write_text(content)
+    # keep the change visible on file systems with a coarse modification time
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_file_watcher_should_report_settled_change(tmp_path: Path):
+    firmware = tmp_path / "app.hex"
+    firmware.write_text("a")
+    watcher = FileWatcher([firmware], interval_s=0.01, settle_s=0.05)
+
+    timer = threading.Timer(0.05, _touch, args=(firmware, "b"))
+    timer.start()
+    assert watcher.wait_for_change()
+    timer.join()
+
+
+def test_file_watcher_should_stop_when_requested(tmp_path: Path):
+    firmware = tmp_path / "app.hex"
+    firmware.write_text("a")
+    stop = threading.Event()
+    stop.set()
+
+    assert not FileWatcher([firmware], interval_s=0.01).wait_for_change(stop)
+
+
+class _FileLoader(Loader):
+    """Loads the firmware by opening it for the collector, as a stand in for a board."""
+
+    def __init__(self, firmware: Path) -> None:
+        self.firmware = firmware
+        self.collector = IOBaseCollector(open(firmware, "rb"))
+        self.loads = 0
+
+    def load_to_device(self, progress=None) -> None:
+        self.loads += 1
+        self.collector._io.close()
+        self.collector._io = open(self.firmware, "rb")
+
+    def reset_device(self) -> None:
+        pass
+
+    def start_program(self) -> None:
+        pass
+
+
+def test_watch_should_rerun_pipeline_on_change(tmp_path: Path):
+    firmware = tmp_path / "app.txt"
+    firmware.write_text("/mypath/foo.c:1:test_1:FAIL\nOK\n")
+    loader = _FileLoader(firmware)
+    pipeline = Pipeline(loader, loader.collector, parser_factory=UnityParser,
+                        reporters=[ExitCodeReporter()])
+    results: List[Optional[PipelineResult]] = list()
+
+    def on_result(result: Optional[PipelineResult]) -> None:
+        results.append(result)
+        if len(results) == 1:
+            threading.Timer(0.05, _touch,
+                            args=(firmware, "/mypath/foo.c:1:test_1:PASS\nOK\n")).start()
+
+    watch(pipeline, FileWatcher([firmware], interval_s=0.01, settle_s=0.05), on_result, runs=2)
+
+    assert loader.loads == 2
+    assert [result.exit_code for result in results] == [1, 0]
+
+
+def test_cli_watch_should_rerun_until_interrupted(builtins_args: List[str],
+                                                  cli_runner: CliRunner,
+                                                  cli_entry: Group,
+                                                  tmp_path: Path,
+                                                  monkeypatch):
+    firmware = tmp_path / "app.txt"
+    firmware.write_text("/mypath/foo.c:1:test_1:FAIL\nOK\n")
+    waits = list()
+    wait_for_change = FileWatcher.wait_for_change
+
+    def rebuild_once(watcher: FileWatcher, stop=None) -> bool:
+        waits.append(watcher)
+        if len(waits) > 1:
+            raise KeyboardInterrupt()
+        _touch(firmware, "/mypath/foo.c:1:test_1:PASS\nOK\n")
+        return wait_for_change(watcher, stop)
+
+    monkeypatch.setattr(FileWatcher, "wait_for_change", rebuild_once)
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        '--watch', '--watch-interval=0.01',
+        'lemu', f'--firmware={firmware}',
+        f'--command={" ".join(shlex.quote(arg) for arg in EMULATOR_COMMAND)}',
+        'cemu', 'punity', 'rexit',
+    ])
+
+    assert result.output.count("test_1:") == 2
+    assert "Run 2 completed with exit code 0" in result.output
+    assert result.exit_code == 0
+
+
+def test_cli_watch_should_require_firmware_file(sample_file_all_pass: Path,
+                                                builtins_args: List[str],
+                                                cli_runner: CliRunner,
+                                                cli_entry: Group):
+    result = cli_runner.invoke(cli_entry, builtins_args + [
+        '--watch', 'lnull', 'cfile', f'--file={sample_file_all_pass}', 'punity', 'rexit'])
+
+    assert result.exit_code == 2
+    assert "no firmware file to watch" in result.output